@@ -0,0 +1,155 @@
+"""
+Per-command latency harness.
+
+Instantiates the real Tip, Soak, Balance, Withdraw, Deposit and Airdrop cogs
+against fake interactions, a scratch database and the simulated wallet, then
+fires each slash command callback --iterations times with --concurrency in
+flight. Reports p50/p95/p99 latency, event-loop blocked time, and SQL
+statements and wallet RPCs per call.
+
+    python benchmarks/bench_commands.py --users 1000 --wallet-deposits 10000 --concurrency 8
+
+Command checks (app_commands.check) are not run; the callbacks are invoked
+directly. Needs a local MySQL/MariaDB.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import traceback
+
+from common import summarize, write_results, print_table
+from harness import COMMAND_CHANNEL, Environment, LoopMonitor, add_environment_args, statement_count
+import fakes
+from utils.amount import Amount
+
+FIRST_USER_ID = 400000000000000000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="Guild members, all seeded with a balance")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--commands", help="Comma-separated subset of scenarios to run")
+    parser.add_argument("--out", default="bench_commands.json")
+    add_environment_args(parser)
+    return parser.parse_args()
+
+
+def build_scenarios(cogs: dict, guild, channel, users: list, rng: random.Random, external_address: str):
+    """name -> function(interaction) returning the command coroutine."""
+    from cogs.deposit import DepositType
+    from cogs.soak import SoakType
+
+    tip, soak, balance = cogs["Tip"], cogs["Soak"], cogs["Balance"]
+    withdraw, deposit, airdrop = cogs["Withdraw"], cogs["Deposit"], cogs["Airdrop"]
+
+    def others(interaction, n):
+        return [m for m in rng.sample(users, n + 1) if m.id != interaction.user.id][:n]
+
+    return {
+        "balance": lambda i: balance.balance.callback(balance, i),
+        "deposit": lambda i: deposit.deposit.callback(deposit, i, DepositType.normal),
+        "deposit_history": lambda i: deposit.deposit.callback(deposit, i, DepositType.history),
+        "tip": lambda i: tip.tip.callback(tip, i, Amount.from_coins("0.001"), user=others(i, 1)[0]),
+        "tip_multi": lambda i: tip.tip.callback(
+            tip, i, Amount.from_coins("0.005"), users=",".join(m.mention for m in others(i, 5))
+        ),
+        "soak_online": lambda i: soak.soak.callback(soak, i, SoakType.online, Amount.from_coins("0.01")),
+        "soakme": lambda i: soak.soakme.callback(soak, i, True),
+        "withdraw_send": lambda i: withdraw.withdraw_send.callback(withdraw, i, external_address, "0.5"),
+        "withdraw_history": lambda i: withdraw.withdraw_history.callback(withdraw, i),
+        "airdrop": lambda i: airdrop.airdrop.callback(airdrop, i, Amount.from_coins(1), 60),
+        "airdrop_list": lambda i: airdrop.airdrop_list.callback(airdrop, i),
+    }
+
+
+async def run_scenario(env, name: str, make_call, guild, channel, users, args, rng) -> dict:
+    from utils import metrics
+
+    latencies = []
+    errors = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            interaction = fakes.FakeInteraction(rng.choice(users), guild, channel)
+            metrics.current_command.set(name)
+            start = time.perf_counter()
+            try:
+                await make_call(interaction)
+            except Exception:
+                errors.append(traceback.format_exc())
+            latencies.append(time.perf_counter() - start)
+
+    statements_before, rpc_before = statement_count(), env.rpc_calls()
+    with LoopMonitor() as monitor:
+        await asyncio.gather(*(one() for _ in range(args.iterations)))
+
+    if errors:
+        print(f"  {name}: {len(errors)} errors, first:\n{errors[0]}")
+    return summarize(
+        latencies,
+        errors=len(errors),
+        statements_per_call=(statement_count() - statements_before) / args.iterations,
+        rpc_per_call=(env.rpc_calls() - rpc_before) / args.iterations,
+        **monitor.result()
+    )
+
+
+async def run(env, args, external_address: str) -> dict:
+    from cogs.tip import Tip
+    from cogs.soak import Soak
+    from cogs.balance import Balance
+    from cogs.withdraw import Withdraw
+    from cogs.deposit import Deposit
+    from cogs.airdrop import Airdrop
+
+    rng = random.Random(args.seed)
+    guild, channel = fakes.make_guild(args.users, FIRST_USER_ID, channel_name=COMMAND_CHANNEL)
+    users = guild.members
+    bot = fakes.FakeBot([guild])
+
+    cogs = {cls.__name__: cls(bot) for cls in (Tip, Soak, Balance, Withdraw, Deposit, Airdrop)}
+
+    scenarios = build_scenarios(cogs, guild, channel, users, rng, external_address)
+    if args.commands:
+        wanted = set(args.commands.split(","))
+        scenarios = {k: v for k, v in scenarios.items() if k in wanted}
+
+    results = {}
+    try:
+        for name, make_call in scenarios.items():
+            results[name] = await run_scenario(env, name, make_call, guild, channel, users, args, rng)
+            r = results[name]
+            print(f"  {name:<18} p50={r['p50_ms']:.1f}ms p99={r['p99_ms']:.1f}ms "
+                  f"blocked={r['loop_blocked_ms']:.0f}ms rpc/call={r['rpc_per_call']:.1f}")
+    finally:
+        cogs["Withdraw"].withdrawal_worker.cancel()
+        cogs["Airdrop"].check_airdrops.cancel()
+    return results
+
+
+def main():
+    args = parse_args()
+    env = Environment(args)
+    env.seed_users(range(FIRST_USER_ID, FIRST_USER_ID + args.users))
+    # Well-formed and accepted by validateaddress, but owned by neither the wallet nor a user
+    external_address = env.wallet.new_address()
+    env.wallet.addresses.pop(external_address)
+    env.start_wallet()
+    print(f"Wallet: {env.wallet.stats()}")
+
+    try:
+        results = asyncio.run(run(env, args, external_address))
+    finally:
+        env.close()
+
+    print_table(results)
+    write_results(args.out, "commands", {k: v for k, v in vars(args).items() if k != "db_pass"}, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Deposit scanner benchmark against the simulated wallet.
+
+Starts benchmarks/fake_wallet.py in-process, seeds a scratch database with a
+user for every wallet address, then times the scanner passes the bot runs:
+
+    cold_recover         recover_missed_deposits() with every deposit new
+    scan_unconfirmed     check_for_updated_balance() while deposits are still confirming
+    scan_confirming      check_for_updated_balance() right after they reach MIN_CONFIRMATIONS
+    scan_idle            check_for_updated_balance() with nothing new
+    scan_incremental     check_for_updated_balance() after --new-deposits more arrive
+
+    python benchmarks/bench_deposits.py --addresses 100000 --deposits-per-address 2 --latency-ms 1
+
+Needs a local MySQL/MariaDB, like bench_mysql.py.
+"""
+import argparse
+import sys
+import time
+
+from common import prepare_config, write_results
+from bench_mysql import create_database, drop_database, insert_chunks, mysql_overrides
+import fake_wallet
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--addresses", type=int, default=10000)
+    parser.add_argument("--deposits-per-address", type=float, default=1.0)
+    parser.add_argument("--outputs-per-tx", type=int, default=1)
+    parser.add_argument("--new-deposits", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--port", type=int, default=19332)
+    parser.add_argument("--database", default="mwcbot_bench")
+    parser.add_argument("--db-host")
+    parser.add_argument("--db-port", type=int)
+    parser.add_argument("--db-user")
+    parser.add_argument("--db-pass")
+    parser.add_argument("--keep", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_deposits.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    prepare_config({
+        "mysql": mysql_overrides(args),
+        "rpc": {
+            "rpc_host": "127.0.0.1", "rpc_port": str(args.port),
+            # Scanner passes make many calls; keep the breaker from tripping on injected errors
+            "circuit_breaker": {"min_calls": 10 ** 9},
+        },
+    })
+
+    wallet = fake_wallet.FakeWallet(seed=args.seed, latency_ms=args.latency_ms)
+    for _ in range(args.addresses):
+        wallet.new_address()
+    wallet.random_deposits(int(args.addresses * args.deposits_per_address), args.outputs_per_tx)
+    wallet.mine(1)
+    loop = fake_wallet.start_in_thread(wallet, port=args.port)
+    print(f"Fake wallet: {wallet.stats()}")
+
+    from utils import parsing
+    create_database(parsing.parse_json("config.json")["mysql"], args.database)
+    import database
+    database.run()
+    insert_chunks(
+        database.cursor, database.connection,
+        "INSERT INTO users (snowflake_pk, balance, balance_unconfirmed, address, allow_soak) "
+        "VALUES (%s, 0, 0, %s, 1)",
+        ((300000000000000000 + i, address) for i, address in enumerate(wallet.addresses))
+    )
+
+    from utils import mysql_module
+    from utils.query_log import query_log
+    mysql = mysql_module.Mysql()
+
+    def configure(**settings):
+        fake_wallet.call_in_loop(loop, lambda: [setattr(wallet, k, v) for k, v in settings.items()])
+
+    def phase(name: str, func) -> dict:
+        calls_before = dict(wallet.calls)
+        statements_before = sum(s.count for s in query_log.stats.values())
+        deposits_before = database_count("deposit")
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        calls = {m: n - calls_before.get(m, 0) for m, n in wallet.calls.items() if n - calls_before.get(m, 0)}
+        result = {
+            "seconds": seconds,
+            "rpc_calls": calls,
+            "statements": sum(s.count for s in query_log.stats.values()) - statements_before,
+            "new_deposit_rows": database_count("deposit") - deposits_before,
+        }
+        print(f"  {name:<20} {seconds:8.2f}s rpc={sum(calls.values())} statements={result['statements']}")
+        return result
+
+    def database_count(table: str) -> int:
+        database.connection.ping(reconnect=True)
+        database.cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+        database.connection.commit()
+        return database.cursor.fetchone()["n"]
+
+    results = {}
+    try:
+        configure(error_rate=args.error_rate)
+        results["cold_recover"] = phase("cold_recover", mysql.recover_missed_deposits)
+        results["scan_unconfirmed"] = phase("scan_unconfirmed", mysql.check_for_updated_balance)
+
+        fake_wallet.call_in_loop(loop, wallet.mine, mysql_module.MIN_CONFIRMATIONS_FOR_DEPOSIT)
+        results["scan_confirming"] = phase("scan_confirming", mysql.check_for_updated_balance)
+        results["scan_idle"] = phase("scan_idle", mysql.check_for_updated_balance)
+
+        fake_wallet.call_in_loop(loop, wallet.random_deposits, args.new_deposits, args.outputs_per_tx)
+        fake_wallet.call_in_loop(loop, wallet.mine, 1)
+        results["scan_incremental"] = phase("scan_incremental", mysql.check_for_updated_balance)
+    finally:
+        if not args.keep:
+            drop_database(args.database)
+
+    transactions = len(wallet.transactions)
+    for result in results.values():
+        result["tx_per_second"] = transactions / result["seconds"] if result["seconds"] else 0.0
+    params = {k: v for k, v in vars(args).items() if k != "db_pass"}
+    params["wallet_transactions"] = transactions
+    write_results(args.out, "deposits", params, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
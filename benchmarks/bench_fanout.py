@@ -0,0 +1,221 @@
+"""
+Fan-out scaling benchmark for soak and airdrop.
+
+Runs Soak.soak (online) and Airdrop.check_airdrops (reaction airdrop)
+against synthetic guilds of increasing size, with recipient limits lifted. For each size it records wall
+time, event-loop blocked time, SQL statements, wallet RPCs and peak Python
+memory, then checks the results against a per-recipient budget.
+
+    python benchmarks/bench_fanout.py --sizes 10,100,1000,10000,100000 \
+        --max-ms-per-recipient 2 --plot fanout.png
+
+Exits with status 1 if any run exceeds --max-ms-per-recipient or
+--max-stall-ms. --plot needs matplotlib; without it a text chart is printed.
+Needs a local MySQL/MariaDB.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from common import REPO_ROOT, write_results
+from harness import COMMAND_CHANNEL, Environment, LoopMonitor, add_environment_args, statement_count
+import fakes
+from utils.amount import Amount, ZERO
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
+FIRST_USER_ID = 500000000000000000
+SENDER_ID = FIRST_USER_ID - 1
+CASES = ("soak_online", "check_airdrops")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000")
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--skip-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--max-ms-per-recipient", type=float, default=0, help="Fail above this (0 = no check)")
+    parser.add_argument("--max-stall-ms", type=float, default=0, help="Fail if one loop stall exceeds this")
+    parser.add_argument("--plot", help="Write a PNG chart here")
+    parser.add_argument("--out", default="bench_fanout.json")
+    add_environment_args(parser)
+    return parser.parse_args()
+
+
+# =====================
+# CASES
+# =====================
+async def soak_online(ctx, guild, channel, sender):
+    from cogs.soak import SoakType
+    interaction = fakes.FakeInteraction(sender, guild, channel)
+    await ctx["soak"].soak.callback(ctx["soak"], interaction, SoakType.online, Amount.from_coins(1))
+
+
+async def check_airdrops(ctx, guild, channel, sender):
+    message = await channel.send("airdrop")
+    message.reactions.append(fakes.FakeReaction("💸", [m for m in guild.members if m.id != sender.id]))
+    airdrop_id = ctx["mysql"].create_airdrop(
+        guild.id, channel.id, sender.id, Amount.from_coins("1"), True, None,
+        datetime.now(timezone.utc) - timedelta(seconds=1)
+    )
+    ctx["mysql"].set_airdrop_message(airdrop_id, message.id)
+    await ctx["airdrop"].check_airdrops()
+
+
+async def measure(env, ctx, case, size: int, trace_memory: bool) -> dict:
+    guild, channel = fakes.make_guild(size, FIRST_USER_ID, channel_name=COMMAND_CHANNEL)
+    sender = fakes.FakeMember(SENDER_ID)
+    guild._members[sender.id] = sender
+    ctx["bot"].guilds[guild.id] = guild
+
+    statements_before, rpc_before = statement_count(), env.rpc_calls()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with LoopMonitor() as monitor:
+        await case(ctx, guild, channel, sender)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    del ctx["bot"].guilds[guild.id]
+    result = {
+        "recipients": size,
+        "seconds": seconds,
+        "ms_per_recipient": seconds * 1000 / size,
+        "statements": statement_count() - statements_before,
+        "rpc_calls": env.rpc_calls() - rpc_before,
+        "messages_sent": channel.sent,
+        **monitor.result(),
+    }
+    if peak is not None:
+        result["peak_mb"] = peak / 1024 / 1024
+    return result
+
+
+async def run(env, args, sizes: list) -> dict:
+    from utils import mysql_module
+    from cogs.soak import Soak
+    from cogs.airdrop import Airdrop
+    from utils.leader import leadership
+
+    leadership.renew()  # check_airdrops only runs under the airdrops lease
+    bot = fakes.FakeBot()
+    ctx = {
+        "bot": bot,
+        "mysql": mysql_module.Mysql(),
+        "soak": Soak(bot),
+        "airdrop": Airdrop(bot),
+    }
+    cases = {name: globals()[name] for name in args.cases.split(",")}
+
+    results = {}
+    try:
+        for name, case in cases.items():
+            for size in sizes:
+                key = f"{name}[{size}]"
+                results[key] = await measure(env, ctx, case, size, trace_memory=False)
+                if not args.skip_memory:
+                    memory = await measure(env, ctx, case, size, trace_memory=True)
+                    results[key]["peak_mb"] = memory["peak_mb"]
+                r = results[key]
+                print(f"  {key:<28} {r['seconds']:8.2f}s {r['ms_per_recipient']:7.3f}ms/recipient "
+                      f"statements={r['statements']} stall={r['loop_max_stall_ms']:.0f}ms "
+                      f"peak={r.get('peak_mb', 0):.1f}MB")
+    finally:
+        ctx["airdrop"].check_airdrops.cancel()
+    return results
+
+
+# =====================
+# REPORTING
+# =====================
+def check_thresholds(results: dict, args) -> list:
+    failures = []
+    for key, r in results.items():
+        if args.max_ms_per_recipient and r["ms_per_recipient"] > args.max_ms_per_recipient:
+            failures.append(f"{key}: {r['ms_per_recipient']:.3f}ms/recipient > {args.max_ms_per_recipient}")
+        if args.max_stall_ms and r["loop_max_stall_ms"] > args.max_stall_ms:
+            failures.append(f"{key}: loop stall {r['loop_max_stall_ms']:.0f}ms > {args.max_stall_ms}")
+    return failures
+
+
+def by_case(results: dict) -> dict:
+    grouped = {}
+    for key, r in results.items():
+        grouped.setdefault(key.split("[")[0], []).append(r)
+    return grouped
+
+
+def plot(results: dict, path: str):
+    metrics = (("seconds", "Time (s)"), ("statements", "SQL statements"), ("peak_mb", "Peak memory (MB)"))
+    figure, axes = plt.subplots(1, len(metrics), figsize=(15, 4.5))
+    for axis, (metric, label) in zip(axes, metrics):
+        for name, rows in by_case(results).items():
+            points = [(r["recipients"], r[metric]) for r in rows if metric in r]
+            if points:
+                axis.plot(*zip(*points), marker="o", label=name)
+        axis.set_xscale("log")
+        axis.set_yscale("log")
+        axis.set_xlabel("Recipients")
+        axis.set_ylabel(label)
+        axis.grid(True, which="both", alpha=0.3)
+    axes[0].legend()
+    figure.tight_layout()
+    figure.savefig(path)
+    print(f"Chart written to {path}")
+
+
+def text_chart(results: dict, width: int = 50):
+    longest = max((r["seconds"] for r in results.values()), default=0) or 1
+    for name, rows in by_case(results).items():
+        print(name)
+        for r in rows:
+            bar = "█" * max(1, round(r["seconds"] / longest * width))
+            print(f"  {r['recipients']:>8} {bar} {r['seconds']:.2f}s")
+
+
+def main():
+    args = parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    env = Environment(args, {
+        "soak": {"use_max_recipients": False, "use_min_received": False},
+        "airdrop": {"enabled": True, "use_max_recipients": False},
+    })
+    env.seed_users([SENDER_ID], balance=Amount.from_coins("100000000"))
+    env.seed_users(range(FIRST_USER_ID, FIRST_USER_ID + sizes[-1]), balance=ZERO)
+    env.start_wallet()
+
+    try:
+        results = asyncio.run(run(env, args, sizes))
+    finally:
+        env.close()
+
+    if args.plot and plt is not None:
+        plot(results, args.plot if os.path.isabs(args.plot) else os.path.join(REPO_ROOT, args.plot))
+    else:
+        if args.plot:
+            print("matplotlib is not installed; printing a text chart instead")
+        text_chart(results)
+
+    failures = check_thresholds(results, args)
+    params = {k: v for k, v in vars(args).items() if k != "db_pass"}
+    params["failures"] = failures
+    write_results(args.out, "fanout", params, results)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Mysql data layer benchmark.
+
+Seeds a scratch database on a local MySQL/MariaDB server with synthetic
+users, tips, deposits and withdrawals, then times every Mysql method and
+the multi-recipient tip paths used by soak and airdrop.
+
+    python benchmarks/bench_mysql.py --users 100000 --tips 1000000 --out mysql.json
+
+The scratch database (--database) is created, and dropped afterwards unless
+--keep is given. Connection settings default to the mysql section of the
+repo's config.json.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import prepare_config, summarize, time_calls, write_results, print_table
+from utils.amount import Amount, pay_each
+
+SEED_CHUNK = 10000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tips", type=int, default=10000)
+    parser.add_argument("--deposits", type=int, default=1000)
+    parser.add_argument("--withdrawals", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per single-user method")
+    parser.add_argument("--recipients", default="10,100,1000", help="Fan-out sizes for the soak/airdrop paths")
+    parser.add_argument("--database", default="mwcbot_bench")
+    parser.add_argument("--db-host")
+    parser.add_argument("--db-port", type=int)
+    parser.add_argument("--db-user")
+    parser.add_argument("--db-pass")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_mysql.json")
+    return parser.parse_args()
+
+
+def mysql_overrides(args) -> dict:
+    overrides = {"db": args.database, "slow_query_ms": 10 ** 9}
+    for key, value in (("db_host", args.db_host), ("db_port", args.db_port),
+                       ("db_user", args.db_user), ("db_pass", args.db_pass)):
+        if value is not None:
+            overrides[key] = value
+    return overrides
+
+
+# =====================
+# SEEDING
+# =====================
+def create_database(config: dict, name: str):
+    import pymysql
+    connection = pymysql.connect(
+        host=config["db_host"], port=int(config.get("db_port", 3306)),
+        user=config["db_user"], password=config["db_pass"]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+        cursor.execute(f"CREATE DATABASE `{name}`")
+    connection.close()
+
+
+def drop_database(name: str):
+    import database
+    database.cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+
+
+def insert_chunks(cursor, connection, statement: str, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= SEED_CHUNK:
+            cursor.executemany(statement, chunk)
+            connection.commit()
+            chunk.clear()
+    if chunk:
+        cursor.executemany(statement, chunk)
+        connection.commit()
+
+
+def seed(args, rng: random.Random) -> float:
+    """Create the schema and bulk-load synthetic rows. Returns seconds taken."""
+    import database
+    start = time.perf_counter()
+    database.run()
+    cursor, connection = database.cursor, database.connection
+
+    insert_chunks(
+        cursor, connection,
+        "INSERT INTO users (snowflake_pk, balance, balance_unconfirmed, address, allow_soak) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        ((user_id(i), Amount.from_coins(1000000).sats, 0, address(i), 1) for i in range(args.users))
+    )
+    insert_chunks(
+        cursor, connection,
+        "INSERT INTO tip (snowflake_from_fk, snowflake_to_fk, amount, created_at) VALUES (%s, %s, %s, %s)",
+        (
+            (user_id(rng.randrange(args.users)), user_id(rng.randrange(args.users)), Amount.from_coins("0.01").sats,
+             datetime.now() - timedelta(minutes=rng.randrange(60 * 24 * 30)))
+            for _ in range(args.tips)
+        )
+    )
+    insert_chunks(
+        cursor, connection,
+        "INSERT INTO deposit (snowflake_fk, amount, txid, status) VALUES (%s, %s, %s, %s)",
+        (
+            (user_id(rng.randrange(args.users)), Amount.from_coins("1.5").sats, f"seed-deposit-{i:064d}",
+             "CONFIRMED" if rng.random() < 0.9 else "UNCONFIRMED")
+            for i in range(args.deposits)
+        )
+    )
+    insert_chunks(
+        cursor, connection,
+        "INSERT INTO withdrawal (idempotency_key, snowflake_fk, amount, address, txid, status) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        (
+            (f"seed-{i}", user_id(rng.randrange(args.users)), Amount.from_coins(1).sats, address(i), f"seed-withdraw-{i:064d}",
+             "CONFIRMED" if rng.random() < 0.95 else "BROADCAST")
+            for i in range(args.withdrawals)
+        )
+    )
+    cursor.execute("INSERT INTO server (server_id, enable_soak) VALUES (%s, 1)", (GUILD_ID,))
+    connection.commit()
+    return time.perf_counter() - start
+
+
+GUILD_ID = 100000000000000000
+
+
+def user_id(i: int) -> int:
+    return 200000000000000000 + i
+
+
+def address(i: int) -> str:
+    return f"Mbench{i:028d}"
+
+
+# =====================
+# CASES
+# =====================
+def statement_count() -> int:
+    from utils.query_log import query_log
+    return sum(s.count for s in query_log.stats.values())
+
+
+def run_case(results: dict, name: str, func, iterations: int):
+    before = statement_count()
+    samples = time_calls(func, iterations)
+    results[name] = summarize(samples, statements_per_call=(statement_count() - before) / max(1, iterations))
+    print(f"  {name:<40} p50={results[name]['p50_ms']:.2f}ms p95={results[name]['p95_ms']:.2f}ms")
+
+
+def single_user_cases(mysql, args, rng: random.Random) -> dict:
+    def any_user(_):
+        return user_id(rng.randrange(args.users))
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    jobs = []
+
+    def create_job(i):
+        job = mysql.create_withdrawal_job(f"bench-{time.time_ns()}-{i}", any_user(i), address(i), Amount.from_coins("0.1"))
+        jobs.append(job["id"])
+
+    cases = {
+        "get_user": lambda i: mysql.get_user(any_user(i)),
+        "get_user_by_address": lambda i: mysql.get_user_by_address(address(rng.randrange(args.users))),
+        "check_for_user(existing)": lambda i: mysql.check_for_user(any_user(i)),
+        "get_address": lambda i: mysql.get_address(any_user(i)),
+        "is_bot_address": lambda i: mysql.is_bot_address(address(rng.randrange(args.users))),
+        "get_balance": lambda i: mysql.get_balance(any_user(i)),
+        "get_confirmed_balance": lambda i: mysql.get_confirmed_balance(any_user(i)),
+        "get_unconfirmed_balance": lambda i: mysql.get_unconfirmed_balance(any_user(i)),
+        "set_balance": lambda i: mysql.set_balance(any_user(i), Amount.from_coins("1000000")),
+        "add_to_balance": lambda i: mysql.add_to_balance(any_user(i), Amount.from_coins("0.1")),
+        "remove_from_balance": lambda i: mysql.remove_from_balance(any_user(i), Amount.from_coins("0.1")),
+        "add_to_balance_unconfirmed": lambda i: mysql.add_to_balance_unconfirmed(any_user(i), Amount.from_coins("0.1")),
+        "remove_from_balance_unconfirmed": lambda i: mysql.remove_from_balance_unconfirmed(any_user(i), Amount.from_coins("0.1")),
+        "add_tip": lambda i: mysql.add_tip(any_user(i), any_user(i), Amount.from_coins("0.01")),
+        "debit_if_sufficient": lambda i: mysql.debit_if_sufficient(any_user(i), Amount.from_coins("0.01")),
+        "transfer(1)": lambda i: mysql.transfer(any_user(i), pay_each(Amount.from_coins("0.01"), [any_user(i)])),
+        "transfer_batch(50x1)": lambda i: mysql.transfer_batch(
+            [(any_user(i), pay_each(Amount.from_coins("0.01"), [any_user(i)])) for _ in range(50)]
+        ),
+        "check_soak": lambda i: mysql.check_soak(GUILD_ID),
+        "set_soak": lambda i: mysql.set_soak(GUILD_ID, True),
+        "check_soakme": lambda i: mysql.check_soakme(any_user(i)),
+        "set_soakme": lambda i: mysql.set_soakme(any_user(i), True),
+        "get_active_users(24h)": lambda i: mysql.get_active_users(24),
+        "list_deposits_for_user": lambda i: mysql.list_deposits_for_user(any_user(i)),
+        "get_deposit_history": lambda i: mysql.get_deposit_history(any_user(i)),
+        "get_transaction_status_by_txid": lambda i: mysql.get_transaction_status_by_txid(
+            f"seed-deposit-{rng.randrange(max(1, args.deposits)):064d}"
+        ),
+        "add_deposit": lambda i: mysql.add_deposit(any_user(i), Amount.from_coins("1"), f"bench-{time.time_ns()}-{i}", "UNCONFIRMED"),
+        "confirm_deposit": lambda i: mysql.confirm_deposit(f"seed-deposit-{rng.randrange(max(1, args.deposits)):064d}"),
+        "add_withdrawal": lambda i: mysql.add_withdrawal(any_user(i), Amount.from_coins("0.1"), f"bench-{time.time_ns()}-{i}"),
+        "create_withdrawal_job": create_job,
+        "reserve_withdrawal": lambda i: mysql.reserve_withdrawal(jobs[i % len(jobs)]),
+        "get_withdrawal_job": lambda i: mysql.get_withdrawal_job(jobs[i % len(jobs)]),
+        "fetch_withdrawal_jobs(RESERVED)": lambda i: mysql.fetch_withdrawal_jobs("RESERVED", 50, due_only=True),
+        "fetch_broadcast_txids": lambda i: mysql.fetch_broadcast_txids(50),
+        "get_withdrawal_history": lambda i: mysql.get_withdrawal_history(any_user(i)),
+        "create_airdrop": lambda i: mysql.create_airdrop(
+            GUILD_ID, 1, any_user(i), Amount.from_coins("1"), True, None, now + timedelta(days=1)
+        ),
+        "fetch_pending_airdrops": lambda i: mysql.fetch_pending_airdrops(now),
+        "fetch_airdrops_by_creator": lambda i: mysql.fetch_airdrops_by_creator(any_user(i)),
+        "fetch_airdrop_by_id": lambda i: mysql.fetch_airdrop_by_id(i + 1),
+        "mark_airdrop_executed": lambda i: mysql.mark_airdrop_executed(i + 1),
+    }
+
+    results = {}
+    for name, func in cases.items():
+        run_case(results, name, func, args.iterations)
+    return results
+
+
+def fanout_cases(mysql, args, rng: random.Random) -> dict:
+    """The per-recipient statements soak and check_airdrops issue, at several fan-out sizes."""
+    results = {}
+    for size in (int(s) for s in args.recipients.split(",")):
+        size = min(size, args.users)
+        iterations = max(1, min(args.iterations, 10000 // max(1, size)))
+
+        def fanout(_):
+            sender = user_id(rng.randrange(args.users))
+            for recipient in rng.sample(range(args.users), size):
+                mysql.check_for_user(user_id(recipient))
+                mysql.add_tip(sender, user_id(recipient), Amount.from_coins("0.001"))
+
+        run_case(results, f"fanout_tip[{size}]", fanout, iterations)
+
+        def fanout_transfer(_):
+            sender = user_id(rng.randrange(args.users))
+            recipients = [user_id(r) for r in rng.sample(range(args.users), size)]
+            mysql.check_for_users(recipients)
+            mysql.transfer(sender, pay_each(Amount.from_coins("0.001"), recipients))
+
+        run_case(results, f"fanout_transfer[{size}]", fanout_transfer, iterations)
+    return results
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    # Point RPC at a closed port: the cases here are DB-only
+    prepare_config({"mysql": mysql_overrides(args), "rpc": {"rpc_host": "127.0.0.1", "rpc_port": "1"}})
+
+    from utils import parsing
+    create_database(parsing.parse_json("config.json")["mysql"], args.database)
+
+    print(f"Seeding {args.users} users, {args.tips} tips, {args.deposits} deposits, {args.withdrawals} withdrawals...")
+    seed_seconds = seed(args, rng)
+    print(f"Seeded in {seed_seconds:.1f}s")
+
+    from utils import mysql_module
+    mysql = mysql_module.Mysql()
+    try:
+        results = single_user_cases(mysql, args, rng)
+        results.update(fanout_cases(mysql, args, rng))
+    finally:
+        if not args.keep:
+            drop_database(args.database)
+
+    print_table(results)
+    params = {k: v for k, v in vars(args).items() if k != "db_pass"}
+    params["seed_seconds"] = seed_seconds
+    write_results(args.out, "mysql", params, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
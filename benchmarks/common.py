@@ -0,0 +1,113 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The bot's modules read config.json from the working directory at import
+time, so every benchmark calls prepare_config() first: it writes a config
+built from the repo's config.json (or config.json.sample) plus overrides
+into a scratch directory and changes into it. Import utils/cogs afterwards.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from utils import parsing  # noqa: E402  (no config is read at import)
+
+
+def merge(base: dict, overrides: dict) -> dict:
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def prepare_config(overrides: dict = None) -> str:
+    """Write a merged config.json to a scratch directory and chdir into it."""
+    source = os.path.join(REPO_ROOT, "config.json")
+    if not os.path.exists(source):
+        source = os.path.join(REPO_ROOT, "config.json.sample")
+
+    config = merge(parsing.parse_json(source), overrides or {})
+    config.setdefault("logging", {}).update(print_level=1, file="bench_log.txt")
+
+    workdir = tempfile.mkdtemp(prefix="mwcbot-bench-")
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.chdir(workdir)
+    return workdir
+
+
+def percentile(sorted_samples: list, q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(q * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples: list, **extra) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ordered = sorted(samples)
+    summary = {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+    summary.update(extra)
+    return summary
+
+
+def time_calls(func, iterations: int) -> list:
+    """Run func(i) for i in range(iterations) and return each call's duration."""
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "-C", REPO_ROOT, "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(path: str, benchmark: str, params: dict, results: dict):
+    """Write results as JSON; compare runs with benchmarks/compare.py."""
+    document = {
+        "benchmark": benchmark,
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    path = os.path.join(REPO_ROOT, path) if not os.path.isabs(path) else path
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, default=str)
+    print(f"Results written to {path}")
+
+
+def print_table(results: dict):
+    print(f"{'case':<40} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, r in results.items():
+        print(
+            f"{name:<40} {r['n']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+            f"{r['p99_ms']:>9.2f} {r['max_ms']:>9.2f}"
+        )
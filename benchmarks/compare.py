@@ -0,0 +1,45 @@
+"""
+Compare two benchmark result files, e.g. from two commits:
+
+    python benchmarks/compare.py before.json after.json --metric p95_ms --threshold 1.2
+
+Exits with status 1 if any case got slower than the threshold ratio.
+"""
+import argparse
+import json
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Fail if candidate/baseline exceeds this")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    print(f"{baseline['benchmark']}: {baseline['revision']} -> {candidate['revision']} ({args.metric})")
+    regressions = 0
+    for name, after in candidate["results"].items():
+        before = baseline["results"].get(name)
+        if not before or args.metric not in after:
+            print(f"  {name:<40} new")
+            continue
+        old, new = before[args.metric], after[args.metric]
+        ratio = new / old if old else float("inf") if new else 1.0
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"  {name:<40} {old:>10.2f} -> {new:>10.2f}  x{ratio:.2f}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
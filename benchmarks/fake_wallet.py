@@ -0,0 +1,391 @@
+"""
+Simulated wallet daemon speaking the JSON-RPC subset the bot uses.
+
+    python benchmarks/fake_wallet.py --port 19332 --addresses 100000 --deposits-per-address 2 \
+        --latency-ms 5 --error-rate 0.01 --block-seconds 30
+
+Point the bot (or a benchmark) at it by setting rpc.rpc_host/rpc_port; any
+rpc_user/rpc_pass is accepted. Chain state is in memory: deposits sit in the
+mempool until a block is mined, and confirmations grow with every block.
+
+Blocks are mined every --block-seconds, by --script events, or on demand:
+
+    curl -d '{"action": "mine", "blocks": 30}' localhost:19332/control
+    curl -d '{"action": "deposit", "address": "M...", "amount": 1.5}' localhost:19332/control
+    curl -d '{"action": "random_deposits", "count": 1000}' localhost:19332/control
+    curl -d '{"action": "configure", "latency_ms": 50, "error_rate": 0.1}' localhost:19332/control
+    curl -d '{"action": "stats"}' localhost:19332/control
+
+A --script file is a JSON list of events applied when the chain reaches a
+height, e.g. [{"height": 5, "random_deposits": 100}, {"height": 6, "mine": 30}].
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from aiohttp import web
+
+B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+ADDRESS_VERSION = 50  # base58 addresses starting with "M"
+
+
+def b58encode_check(payload: bytes) -> str:
+    raw = payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+    n = int.from_bytes(raw, "big")
+    encoded = ""
+    while n:
+        n, r = divmod(n, 58)
+        encoded = B58_ALPHABET[r] + encoded
+    return "1" * (len(raw) - len(raw.lstrip(b"\0"))) + encoded
+
+
+class RpcFault(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeWallet:
+    """In-memory chain and wallet. All methods run on the server's event loop thread."""
+
+    def __init__(self, seed: int = 1, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, http_error_rate: float = 0.0, fail_methods=(),
+                 method_latency_ms: dict = None):
+        self.rng = random.Random(seed)
+        self.height = 0
+        self.addresses: dict[str, list[str]] = {}     # address -> txids received
+        self.transactions: dict[str, dict] = {}       # txid -> tx
+        self.mempool: list[str] = []
+        self.history: list[str] = []                  # wallet txids in arrival order
+        self.calls = Counter()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.method_latency_ms = method_latency_ms or {}
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.fail_methods = set(fail_methods)
+        self.script: dict[int, list[dict]] = {}
+        self._counter = 0
+
+    # ---------------- chain ----------------
+    def new_address(self) -> str:
+        self._counter += 1
+        payload = bytes([ADDRESS_VERSION]) + hashlib.sha256(self._counter.to_bytes(8, "big")).digest()[:20]
+        address = b58encode_check(payload)
+        self.addresses[address] = []
+        return address
+
+    def _new_txid(self) -> str:
+        self._counter += 1
+        return hashlib.sha256(f"tx-{self._counter}".encode()).hexdigest()
+
+    def deposit(self, outputs: dict) -> str:
+        """Queue a receive paying {address: amount}; mined with the next block."""
+        txid = self._new_txid()
+        details = [
+            {"address": address, "category": "receive", "amount": float(amount)}
+            for address, amount in outputs.items()
+        ]
+        self.transactions[txid] = {
+            "txid": txid, "height": None, "time": int(time.time()),
+            "amount": float(sum(Decimal(str(a)) for a in outputs.values())),
+            "details": details, "comment": "",
+        }
+        for address in outputs:
+            self.addresses.setdefault(address, []).append(txid)
+        self.mempool.append(txid)
+        self.history.append(txid)
+        return txid
+
+    def random_deposits(self, count: int, outputs_per_tx: int = 1):
+        addresses = list(self.addresses)
+        for _ in range(count):
+            chosen = self.rng.sample(addresses, min(outputs_per_tx, len(addresses)))
+            self.deposit({a: round(self.rng.uniform(0.001, 100), 8) for a in chosen})
+
+    def _send(self, outputs: dict, comment: str) -> str:
+        txid = self._new_txid()
+        self.transactions[txid] = {
+            "txid": txid, "height": None, "time": int(time.time()),
+            "amount": -float(sum(Decimal(str(a)) for a in outputs.values())),
+            "details": [
+                {"address": address, "category": "send", "amount": -float(amount)}
+                for address, amount in outputs.items()
+            ],
+            "comment": comment,
+        }
+        self.mempool.append(txid)
+        self.history.append(txid)
+        return txid
+
+    def mine(self, blocks: int = 1):
+        for _ in range(blocks):
+            self.height += 1
+            for txid in self.mempool:
+                self.transactions[txid]["height"] = self.height
+            self.mempool.clear()
+            for event in self.script.pop(self.height, []):
+                self.apply(event)
+
+    def apply(self, event: dict):
+        if "random_deposits" in event:
+            self.random_deposits(event["random_deposits"], event.get("outputs_per_tx", 1))
+        for d in event.get("deposits", []):
+            self.deposit({d["address"]: d["amount"]})
+        if "mine" in event:
+            self.mine(event["mine"])
+
+    def confirmations(self, tx: dict) -> int:
+        return 0 if tx["height"] is None else self.height - tx["height"] + 1
+
+    def block_hash(self, height: int) -> str:
+        return f"{height:064x}"
+
+    # ---------------- RPC methods ----------------
+    def rpc_getblockcount(self):
+        return self.height
+
+    def rpc_getconnectioncount(self):
+        return 8
+
+    def rpc_getnewaddress(self, account=""):
+        return self.new_address()
+
+    def rpc_validateaddress(self, address):
+        return {"isvalid": address in self.addresses or address.startswith("M"), "address": address,
+                "ismine": address in self.addresses}
+
+    def rpc_listreceivedbyaddress(self, minconf=1, include_empty=False, include_watch_only=False):
+        result = []
+        for address, txids in self.addresses.items():
+            counted = [t for t in txids if self.confirmations(self.transactions[t]) >= minconf]
+            if not counted and not include_empty:
+                continue
+            amount = sum(
+                d["amount"] for t in counted for d in self.transactions[t]["details"] if d["address"] == address
+            )
+            confirmations = min((self.confirmations(self.transactions[t]) for t in counted), default=0)
+            result.append({
+                "address": address, "account": "", "amount": amount,
+                "confirmations": confirmations, "txids": counted,
+            })
+        return result
+
+    def _wallet_tx(self, tx: dict) -> dict:
+        confirmations = self.confirmations(tx)
+        entry = {
+            "txid": tx["txid"], "amount": tx["amount"], "confirmations": confirmations,
+            "time": tx["time"], "details": tx["details"],
+        }
+        if tx["height"] is not None:
+            entry["blockheight"] = tx["height"]
+            entry["blockhash"] = self.block_hash(tx["height"])
+        if tx["comment"]:
+            entry["comment"] = tx["comment"]
+        return entry
+
+    def rpc_gettransaction(self, txid, include_watchonly=True):
+        tx = self.transactions.get(txid)
+        if tx is None:
+            raise RpcFault(-5, "Invalid or non-wallet transaction id")
+        return self._wallet_tx(tx)
+
+    def _list_entries(self, txids) -> list:
+        entries = []
+        for txid in txids:
+            tx = self._wallet_tx(self.transactions[txid])
+            for detail in tx["details"]:
+                entry = {k: v for k, v in tx.items() if k != "details"}
+                entry.update(detail)
+                entries.append(entry)
+        return entries
+
+    def rpc_listtransactions(self, account="*", count=10, skip=0, include_watchonly=False):
+        end = len(self.history) - skip
+        return self._list_entries(self.history[max(0, end - count):max(0, end)])
+
+    def rpc_listsinceblock(self, blockhash="", target_confirmations=1, include_watchonly=False):
+        since = int(blockhash, 16) if blockhash else 0
+        txids = [
+            t for t in self.history
+            if self.transactions[t]["height"] is None or self.transactions[t]["height"] > since
+        ]
+        last = max(0, self.height - target_confirmations + 1)
+        return {"transactions": self._list_entries(txids), "lastblock": self.block_hash(last)}
+
+    def rpc_sendtoaddress(self, address, amount, comment="", *args):
+        return self._send({address: amount}, comment)
+
+    def rpc_sendmany(self, account, amounts, minconf=1, comment="", *args):
+        return self._send(amounts, comment)
+
+    def rpc_settxfee(self, amount):
+        return True
+
+    def rpc_getwalletinfo(self):
+        return {"walletversion": 169900, "balance": 0.0, "txcount": len(self.history)}
+
+    def rpc_getblockchaininfo(self):
+        return {"chain": "main", "blocks": self.height, "headers": self.height,
+                "bestblockhash": self.block_hash(self.height), "difficulty": 1.0}
+
+    def rpc_getnetworkinfo(self):
+        return {"version": 180000, "subversion": "/FakeWallet:0.1/", "connections": 8}
+
+    def rpc_getmininginfo(self):
+        return {"blocks": self.height, "difficulty": 1.0, "networkhashps": 1.0e9}
+
+    # ---------------- dispatch ----------------
+    async def handle_rpc(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        method, params = body.get("method"), body.get("params") or []
+        self.calls[method] += 1
+
+        latency = self.method_latency_ms.get(method, self.latency_ms)
+        if latency or self.jitter_ms:
+            await asyncio.sleep(max(0.0, latency + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        if self.rng.random() < self.http_error_rate:
+            return web.Response(status=503, text="injected failure")
+
+        result, error = None, None
+        try:
+            if method in self.fail_methods or self.rng.random() < self.error_rate:
+                raise RpcFault(-1, f"injected error in {method}")
+            handler = getattr(self, f"rpc_{method}", None)
+            if handler is None:
+                raise RpcFault(-32601, "Method not found")
+            result = handler(*params)
+        except RpcFault as e:
+            error = {"code": e.code, "message": e.message}
+        return web.json_response({"result": result, "error": error, "id": body.get("id")})
+
+    async def handle_control(self, request: web.Request) -> web.Response:
+        command = await request.json()
+        action = command.get("action")
+        if action == "mine":
+            self.mine(int(command.get("blocks", 1)))
+        elif action == "deposit":
+            return web.json_response({"txid": self.deposit({command["address"]: command["amount"]})})
+        elif action == "random_deposits":
+            self.random_deposits(int(command["count"]), int(command.get("outputs_per_tx", 1)))
+        elif action == "configure":
+            for key in ("latency_ms", "jitter_ms", "error_rate", "http_error_rate"):
+                if key in command:
+                    setattr(self, key, float(command[key]))
+            if "fail_methods" in command:
+                self.fail_methods = set(command["fail_methods"])
+        elif action != "stats":
+            return web.json_response({"error": f"unknown action {action}"}, status=400)
+        return web.json_response(self.stats())
+
+    def stats(self) -> dict:
+        return {
+            "height": self.height, "addresses": len(self.addresses),
+            "transactions": len(self.transactions), "mempool": len(self.mempool),
+            "calls": dict(self.calls),
+        }
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/", self.handle_rpc)
+        app.router.add_post("/control", self.handle_control)
+        return app
+
+
+async def serve(wallet: FakeWallet, host: str, port: int, block_seconds: float = 0) -> web.AppRunner:
+    runner = web.AppRunner(wallet.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    if block_seconds:
+        async def miner():
+            while True:
+                await asyncio.sleep(block_seconds)
+                wallet.mine()
+        asyncio.get_running_loop().create_task(miner())
+    return runner
+
+
+def start_in_thread(wallet: FakeWallet, host: str = "127.0.0.1", port: int = 19332,
+                    block_seconds: float = 0) -> asyncio.AbstractEventLoop:
+    """Run the server on a daemon thread; use loop.call_soon_threadsafe to touch the wallet."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve(wallet, host, port, block_seconds))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="fake-wallet", daemon=True).start()
+    ready.wait()
+    return loop
+
+
+def call_in_loop(loop: asyncio.AbstractEventLoop, func, *args):
+    """Run func(*args) on the wallet's loop thread and wait for the result."""
+    async def wrapper():
+        return func(*args)
+    return asyncio.run_coroutine_threadsafe(wrapper(), loop).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=19332)
+    parser.add_argument("--addresses", type=int, default=1000, help="Pre-generated wallet addresses")
+    parser.add_argument("--deposits-per-address", type=float, default=1.0)
+    parser.add_argument("--outputs-per-tx", type=int, default=1)
+    parser.add_argument("--blocks", type=int, default=100, help="Blocks mined after seeding")
+    parser.add_argument("--block-seconds", type=float, default=0, help="Mine a block every N seconds (0 = off)")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--method-latency", default="{}", help='JSON, e.g. {"gettransaction": 20}')
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of calls answered with a JSON-RPC error")
+    parser.add_argument("--http-error-rate", type=float, default=0, help="Fraction of calls answered with HTTP 503")
+    parser.add_argument("--fail-methods", default="", help="Comma-separated methods that always error")
+    parser.add_argument("--script", help="JSON file of height-triggered events")
+    parser.add_argument("--addresses-out", help="Write the generated addresses here, one per line")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    wallet = FakeWallet(
+        seed=args.seed, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, http_error_rate=args.http_error_rate,
+        fail_methods=[m for m in args.fail_methods.split(",") if m],
+        method_latency_ms=json.loads(args.method_latency),
+    )
+    for _ in range(args.addresses):
+        wallet.new_address()
+    wallet.random_deposits(int(args.addresses * args.deposits_per_address), args.outputs_per_tx)
+    wallet.mine(args.blocks)
+
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            for event in json.load(f):
+                wallet.script.setdefault(int(event["height"]), []).append(event)
+
+    if args.addresses_out:
+        with open(args.addresses_out, "w", encoding="utf-8") as f:
+            f.write("\n".join(wallet.addresses))
+
+    print(f"Fake wallet on {args.host}:{args.port}: {json.dumps(wallet.stats())}")
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(serve(wallet, args.host, args.port, args.block_seconds))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Minimal stand-ins for the discord.py objects the cogs touch, so command
+callbacks can be driven without a gateway connection. Only the attributes
+the cogs actually read are implemented; sends are recorded, not delivered.
+"""
+import asyncio
+import itertools
+
+import discord
+
+_ids = itertools.count(900000000000000000)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class FakeMember:
+    def __init__(self, member_id: int, name: str = None, bot: bool = False,
+                 status: discord.Status = discord.Status.online, roles=()):
+        self.id = member_id
+        self.name = name or f"user{member_id}"
+        self.display_name = self.name
+        self.bot = bot
+        self.status = status
+        self.roles = list(roles)
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeRole:
+    def __init__(self, role_id: int = None, members=()):
+        self.id = role_id or next_id()
+        self.members = list(members)
+
+    @property
+    def mention(self) -> str:
+        return f"<@&{self.id}>"
+
+
+class FakeReaction:
+    def __init__(self, emoji: str, users=()):
+        self.emoji = emoji
+        self._users = list(users)
+        self.count = len(self._users)
+
+    async def users(self):
+        for user in self._users:
+            yield user
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, **kwargs):
+        self.id = next_id()
+        self.channel = channel
+        self.content = content
+        self.kwargs = kwargs
+        self.reactions: list[FakeReaction] = []
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(FakeReaction(str(emoji)))
+
+
+class FakeChannel:
+    def __init__(self, guild, name: str = "bench", channel_id: int = None):
+        self.id = channel_id or next_id()
+        self.name = name
+        self.guild = guild
+        self.messages: dict[int, FakeMessage] = {}
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        message = FakeMessage(self, content, **kwargs)
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id: int):
+        try:
+            return self.messages[message_id]
+        except KeyError:
+            raise discord.NotFound(_FakeHTTPResponse(404), "Unknown Message")
+
+
+class _FakeHTTPResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Not Found"
+
+
+class FakeGuild:
+    def __init__(self, members=(), guild_id: int = None, owner_id: int = None):
+        self.id = guild_id or next_id()
+        self.name = f"guild{self.id}"
+        self.owner_id = owner_id
+        self._members = {m.id: m for m in members}
+        self.roles: dict[int, FakeRole] = {}
+        self.channels: dict[int, FakeChannel] = {}
+
+    @property
+    def members(self) -> list:
+        return list(self._members.values())
+
+    @property
+    def member_count(self) -> int:
+        return len(self._members)
+
+    def get_member(self, member_id: int):
+        return self._members.get(member_id)
+
+    @property
+    def chunked(self) -> bool:
+        return True
+
+    async def chunk(self):
+        return self.members
+
+    async def query_members(self, user_ids=(), **kwargs):
+        return [m for m in map(self._members.get, user_ids) if m is not None]
+
+    def add_role(self, role: FakeRole) -> FakeRole:
+        self.roles[role.id] = role
+        for member in role.members:
+            member.roles.append(role)
+        return role
+
+    def get_role(self, role_id: int):
+        return self.roles.get(role_id)
+
+    def add_channel(self, name: str = "bench") -> FakeChannel:
+        channel = FakeChannel(self, name)
+        self.channels[channel.id] = channel
+        return channel
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self._interaction.replies.append((content, kwargs))
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self._interaction.replies.append((content, kwargs))
+        return FakeMessage(self._interaction.channel, content, **kwargs)
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, guild: FakeGuild = None, channel: FakeChannel = None, command=None):
+        self.id = next_id()
+        self.user = user
+        self.guild = guild
+        self.channel = channel
+        self.command = command
+        self.extras = {}
+        self.replies: list[tuple] = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+class FakeBot:
+    """Enough of commands.Bot for cogs to be constructed; background loops never become ready."""
+
+    def __init__(self, guilds=()):
+        self.guilds = {g.id: g for g in guilds}
+        self._never = asyncio.Event()
+        self.user = FakeMember(next_id(), "bench-bot", bot=True)
+
+    def get_guild(self, guild_id: int):
+        return self.guilds.get(guild_id)
+
+    def get_user(self, user_id: int):
+        for guild in self.guilds.values():
+            member = guild.get_member(user_id)
+            if member:
+                return member
+        return None
+
+    async def fetch_user(self, user_id: int):
+        return self.get_user(user_id)
+
+    async def wait_until_ready(self):
+        await self._never.wait()
+
+
+def make_guild(size: int, first_id: int, online_ratio: float = 1.0, channel_name: str = "bench"):
+    """A guild of `size` human members with consecutive IDs, plus one channel."""
+    online_cutoff = int(size * online_ratio)
+    members = [
+        FakeMember(first_id + i, status=discord.Status.online if i < online_cutoff else discord.Status.offline)
+        for i in range(size)
+    ]
+    guild = FakeGuild(members)
+    channel = guild.add_channel(channel_name)
+    return guild, channel
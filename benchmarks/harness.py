@@ -0,0 +1,128 @@
+"""
+Environment for driving the real cogs offline: a scratch MySQL database, the
+simulated wallet, seeded users, and an event-loop stall monitor. Used by
+bench_commands.py and bench_fanout.py.
+"""
+import asyncio
+import time
+from decimal import Decimal
+
+from common import merge, prepare_config
+from bench_mysql import create_database, drop_database, insert_chunks, mysql_overrides
+import fake_wallet
+from utils.amount import Amount
+
+COMMAND_CHANNEL = "bench"
+
+
+def add_environment_args(parser):
+    parser.add_argument("--wallet-addresses", type=int, default=1000,
+                        help="Extra wallet addresses not owned by seeded users")
+    parser.add_argument("--wallet-deposits", type=int, default=1000,
+                        help="Deposits spread over all wallet addresses (drives scan cost)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated wallet RPC latency")
+    parser.add_argument("--port", type=int, default=19332)
+    parser.add_argument("--database", default="mwcbot_bench")
+    parser.add_argument("--db-host")
+    parser.add_argument("--db-port", type=int)
+    parser.add_argument("--db-user")
+    parser.add_argument("--db-pass")
+    parser.add_argument("--keep", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+class Environment:
+    def __init__(self, args, config_overrides: dict = None):
+        self.args = args
+        channels = ("help", "deposit", "withdraw", "balance", "uptime", "invite", "stats",
+                    "mninfo", "tip", "soak", "soak_info", "checksoak", "airdrop")
+        overrides = {
+            "mysql": mysql_overrides(args),
+            "rpc": {"rpc_host": "127.0.0.1", "rpc_port": str(args.port), "circuit_breaker": {"min_calls": 10 ** 9}},
+            "metrics": {"enabled": False},
+            "command_channels": {name: [COMMAND_CHANNEL] for name in channels},
+        }
+        prepare_config(merge(overrides, config_overrides or {}))
+
+        self.wallet = fake_wallet.FakeWallet(seed=args.seed, latency_ms=args.latency_ms)
+        for _ in range(args.wallet_addresses):
+            self.wallet.new_address()
+        self.wallet_loop = None
+
+        from utils import parsing
+        create_database(parsing.parse_json("config.json")["mysql"], args.database)
+        import database
+        database.run()
+        self.database = database
+
+    def seed_users(self, user_ids, balance: Amount = Amount.from_coins(1000000)):
+        """Give every user a wallet address and a confirmed balance."""
+        rows = ((uid, balance.sats, self.wallet.new_address()) for uid in user_ids)
+        insert_chunks(
+            self.database.cursor, self.database.connection,
+            "INSERT INTO users (snowflake_pk, balance, balance_unconfirmed, address, allow_soak) "
+            "VALUES (%s, %s, 0, %s, 1)",
+            rows
+        )
+
+    def start_wallet(self):
+        """Add background deposits, mine past the confirmation depth and start serving."""
+        self.wallet.random_deposits(self.args.wallet_deposits)
+        self.wallet.mine(40)
+        self.wallet_loop = fake_wallet.start_in_thread(self.wallet, port=self.args.port)
+
+        # Price lookups are served from the market collector; give it a sample so no HTTP happens
+        from utils import market
+        market.series["price"].append(Decimal("0.01"))
+
+    def rpc_calls(self) -> int:
+        return sum(self.wallet.calls.values())
+
+    def close(self):
+        if not self.args.keep:
+            drop_database(self.args.database)
+
+
+def statement_count() -> int:
+    from utils.query_log import query_log
+    return sum(s.count for s in query_log.stats.values())
+
+
+class LoopMonitor:
+    """
+    Measures how long the event loop is blocked by sleeping for `interval`
+    and recording how late each wake-up is. Lateness above `threshold`
+    counts as blocked time.
+    """
+
+    def __init__(self, interval: float = 0.001, threshold: float = 0.005):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0.0
+        self.max_stall = 0.0
+        self.stalls = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            if lag > self.threshold:
+                self.blocked += lag
+                self.stalls += 1
+                self.max_stall = max(self.max_stall, lag)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def result(self) -> dict:
+        return {
+            "loop_blocked_ms": self.blocked * 1000,
+            "loop_max_stall_ms": self.max_stall * 1000,
+            "loop_stalls": self.stalls,
+        }
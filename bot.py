@@ -1,25 +1,33 @@
 import asyncio
+import aiohttp
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 
-from utils import output, parsing, mysql_module, g
-import os
+from utils import output, parsing, mysql_module, rpc_module, market, metrics, command_sync, startup, member_snapshot, member_cache, g
+from utils.leader import leadership, RENEW_SECONDS
+from utils.member_snapshot import snapshot
+from utils.member_cache import guild_members
+from utils.amount import Amount, AmountTransformer
+import time
 import traceback
 import database
 
-from datetime import datetime, timezone
-from decimal import Decimal
+from collections import deque
 
 from utils.mysql_module import MIN_CONFIRMATIONS_FOR_DEPOSIT, Mysql
 
 mysql = Mysql()
+rpc = rpc_module.Rpc()
 
 # =========================
 # CONFIG
 # =========================
 config = parsing.parse_json("config.json")
-airdrop_cfg = config.get("airdrop", {})
+rpc_cfg = config.get("rpc", {})
+metrics_cfg = config.get("metrics", {})
+shard_cfg = config.get("sharding", {})
+deposit_cfg = config.get("deposits", {})
 
 # =========================
 # INTENTS
@@ -30,134 +38,325 @@ intents.members = True   # REQUIRED for airdrops
 intents.presences = True
 intents.messages = True
 
+# =========================
+# COMMAND TREE
+# =========================
+class InstrumentedTree(app_commands.CommandTree):
+    """Stamps each slash command so completion/error handlers can record its latency."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        metrics.current_command.set(
+            interaction.command.qualified_name if interaction.command else None
+        )
+        return True
+
+
+def record_command(interaction: discord.Interaction, status: str):
+    started = interaction.extras.get("started")
+    if started is None or interaction.command is None:
+        return
+    name = interaction.command.qualified_name
+    metrics.COMMAND_DURATION.labels(name).observe(time.perf_counter() - started)
+    metrics.COMMAND_TOTAL.labels(name, status).inc()
+
+
+# =========================
+# SHARD METRICS
+# =========================
+SHARD_LATENCY = metrics.registry.gauge(
+    "mwcbot_shard_latency_seconds", "Gateway heartbeat latency", ["shard"]
+)
+SHARD_GUILDS = metrics.registry.gauge(
+    "mwcbot_shard_guilds", "Guilds served by the shard", ["shard"]
+)
+SHARD_EVENTS = metrics.registry.counter(
+    "mwcbot_shard_events_total", "Guild events received, attributed by guild shard", ["shard", "event"]
+)
+GATEWAY_EVENTS = metrics.registry.counter(
+    "mwcbot_gateway_events_total", "Gateway dispatch events received by this process", ["event"]
+)
+
+# Sharded when enabled: shard_count null lets Discord choose, shard_ids limits
+# this process to a range so shards can be split across processes.
+BotBase = commands.AutoShardedBot if shard_cfg.get("enabled", False) else commands.Bot
+
+
 # =========================
 # BOT INITIALIZATION
 # =========================
-class MinerBot(commands.Bot):
+class MinerBot(BotBase):
     def __init__(self):
+        options = {}
+        if shard_cfg.get("enabled", False):
+            options["shard_count"] = shard_cfg.get("shard_count")
+            options["shard_ids"] = shard_cfg.get("shard_ids")
+        options["chunk_guilds_at_startup"] = member_cache.CHUNK_POLICY == "startup"
+        options["member_cache_flags"] = member_cache.cache_flags()
+
         super().__init__(
             command_prefix=["!", "?"],
             description=config["description"],
-            intents=intents
+            intents=intents,
+            tree_cls=InstrumentedTree,
+            **options
         )
+        self.shard_event_rates: dict[int, float] = {}  # shard_id -> guild events/second
+        self._shard_event_totals: dict[int, int] = {}
+        self._shard_sampled_at = time.monotonic()
+        self.chunk_queue: deque[int] = deque()  # guild ids waiting for a background chunk
+        self.deposits_recovered = False
 
     async def setup_hook(self):
         """Runs before the bot connects to Discord"""
-        output.info(f"Loading {len(g.startup_extensions)} extension(s)...")
-
-        for extension in g.startup_extensions:
-            try:
-                await self.load_extension(f"cogs.{extension}")
-                g.loaded_extensions.append(extension)
-            except Exception:
-                output.error(
-                    f"Failed to load extension {extension}\n{traceback.format_exc()}"
-                )
-
-        await self.tree.sync()
-        output.success(
-            f"Successfully loaded: {', '.join(g.loaded_extensions)}"
-        )
-        output.success("Slash commands synced successfully.")
+        await self.startup_pipeline().run()
+        self.leader_loop.start()
+
+        self.rpc_health_loop.start()
+        self.deposit_scan_loop.start()
+        self.shard_stats_loop.start()
+        if member_cache.CHUNK_POLICY == "background":
+            self.chunk_loop.start()
+        if member_cache.CHUNK_POLICY == "lazy" and member_cache.EVICT_IDLE_SECONDS:
+            self.evict_loop.start()
+        if member_snapshot.ENABLED:
+            self.snapshot_loop.start()
+
+        self.http_session = aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()])
+        self.market_loop.start()
+
+        if metrics_cfg.get("enabled", False):
+            host = metrics_cfg.get("host", "127.0.0.1")
+            port = metrics_cfg.get("port", 9108)
+            self.metrics_runner = await metrics.start_http_server(host, port)
+            output.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+
+    def startup_pipeline(self) -> startup.Pipeline:
+        """Schema, DB, wallet warmup and extension imports overlap; see the timing report."""
+        pipeline = startup.Pipeline()
+
+        @pipeline.phase("config")
+        async def check_config():
+            missing = [key for key in ("discord", "mysql", "rpc", "txfee") if key not in config]
+            if missing:
+                raise KeyError(f"config.json is missing: {', '.join(missing)}")
+
+        @pipeline.phase("schema", after=["config"])
+        async def schema():
+            await asyncio.to_thread(database.run)
+
+        @pipeline.phase("db", after=["config"])
+        async def db():
+            # Connections are per thread; this opens the one the event loop's queries use
+            mysql.connect()
+
+        @pipeline.phase("rpc", after=["config"], required=False)
+        async def rpc_warmup():
+            if not await asyncio.to_thread(rpc.health_check):
+                raise RuntimeError("wallet daemon did not answer getblockcount")
+
+        @pipeline.phase("leases", after=["schema", "db"])
+        async def leases():
+            # Take leases before any singleton loop gets a chance to run.
+            # The worker thread queries over its own connection, not the loop's
+            await asyncio.to_thread(leadership.renew)
+
+        @pipeline.phase("cache", after=["leases"], required=False)
+        async def preload():
+            await asyncio.to_thread(mysql.load_owned_addresses)
+
+        @pipeline.phase("snapshot", after=["config"], required=False)
+        async def load_snapshot():
+            if member_snapshot.ENABLED:
+                await asyncio.to_thread(snapshot.load)
+
+        # Cogs query their tables as soon as they load, so the schema must be current first
+        @pipeline.phase("extensions", after=["schema"])
+        async def extensions():
+            output.info(f"Loading {len(g.startup_extensions)} extension(s)...")
+            for extension in g.startup_extensions:
+                try:
+                    await self.load_extension(f"cogs.{extension}")
+                    g.loaded_extensions.append(extension)
+                except Exception:
+                    output.error(
+                        f"Failed to load extension {extension}\n{traceback.format_exc()}"
+                    )
+            output.success(
+                f"Successfully loaded: {', '.join(g.loaded_extensions)}"
+            )
 
-        # Start airdrop loop only if enabled
-        if airdrop_cfg.get("enabled", True):
-            self.airdrop_loop.start()
-            output.info("Airdrop background loop started")
+        @pipeline.phase("tree_sync", after=["extensions"])
+        async def tree_sync():
+            await command_sync.sync_tree(self.tree, self.application_id)
+
+        return pipeline
+
+    async def close(self):
+        if self.market_loop.is_running():
+            self.market_loop.cancel()
+        if self.leader_loop.is_running():
+            self.leader_loop.cancel()
+        leadership.release()
+        if member_snapshot.ENABLED and self.is_ready():
+            await self.save_member_snapshot()
+        if getattr(self, "http_session", None):
+            await self.http_session.close()
+        if getattr(self, "metrics_runner", None):
+            await self.metrics_runner.cleanup()
+        await super().close()
 
     # =========================
-    # AIRDROP BACKGROUND LOOP
+    # MARKET / POOL COLLECTOR
     # =========================
-    @tasks.loop(seconds=airdrop_cfg.get("loop_interval_seconds", 30))
-    async def airdrop_loop(self):
-        now = datetime.now(timezone.utc)
-        pending = Mysql.fetch_pending_airdrops(now)
+    @tasks.loop(seconds=market.POLL_INTERVAL_SECONDS)
+    @metrics.timed_loop("market")
+    async def market_loop(self):
+        await market.poll(self.http_session)
 
-        for drop in pending:
-            try:
-                await self.execute_airdrop(drop)
-            except Exception:
-                output.error(f"Airdrop execution error:\n{traceback.format_exc()}")
-
-    async def execute_airdrop(self, drop: dict):
-        # Safety: disabled
-        if not airdrop_cfg.get("enabled", True):
-            Mysql.mark_airdrop_executed(drop["id"])
-            return
-
-        guild = self.get_guild(int(drop["guild_id"]))
-        if not guild:
-            Mysql.mark_airdrop_executed(drop["id"])
-            return
-
-        channel = guild.get_channel(int(drop["channel_id"]))
-        if not channel:
-            Mysql.mark_airdrop_executed(drop["id"])
-            return
-
-        role = guild.get_role(int(drop["role_id"])) if drop["role_id"] else None
-
-        # Safety: guild-wide airdrops
-        if role is None and not airdrop_cfg.get("allow_guild_wide", False):
-            await channel.send("⚠️ Guild-wide airdrops are disabled.")
-            Mysql.mark_airdrop_executed(drop["id"])
-            return
-
-        members = [
-            m for m in (role.members if role else guild.members)
-            if not m.bot
-        ]
-
-        if not members:
-            Mysql.mark_airdrop_executed(drop["id"])
-            return
-
-        # Safety: max recipients
-        if (
-            airdrop_cfg.get("use_max_recipients", True)
-            and len(members) > airdrop_cfg.get("max_recipients", 50)
-        ):
-            await channel.send(
-                f"⚠️ Airdrop cancelled: too many recipients "
-                f"({len(members)} / {airdrop_cfg['max_recipients']})"
-            )
-            Mysql.mark_airdrop_executed(drop["id"])
-            return
-
-        split = bool(drop["split"])
-        total_amount = Decimal(drop["amount"])
+    # =========================
+    # SHARD STATS
+    # =========================
+    def shard_latencies(self) -> list[tuple[int, float]]:
+        if isinstance(self, commands.AutoShardedBot):
+            return self.latencies
+        return [(0, self.latency)]
+
+    def count_guild_event(self, guild: discord.Guild | None, event: str):
+        if guild is not None:
+            SHARD_EVENTS.labels(guild.shard_id, event).inc()
+
+    def shard_stats(self) -> list[dict]:
+        guilds: dict[int, int] = {}
+        members: dict[int, int] = {}
+        for guild in self.guilds:
+            guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+            members[guild.shard_id] = members.get(guild.shard_id, 0) + (guild.member_count or 0)
+
+        stats = []
+        for shard_id, latency in self.shard_latencies():
+            shard = self.get_shard(shard_id) if isinstance(self, commands.AutoShardedBot) else None
+            stats.append({
+                "id": shard_id,
+                "latency": latency,
+                "guilds": guilds.get(shard_id, 0),
+                "members": members.get(shard_id, 0),
+                "events_per_second": self.shard_event_rates.get(shard_id, 0.0),
+                "closed": shard.is_closed() if shard else self.is_closed(),
+            })
+        return stats
+
+    @tasks.loop(seconds=shard_cfg.get("stats_interval_seconds", 15))
+    @metrics.timed_loop("shard_stats")
+    async def shard_stats_loop(self):
+        now = time.monotonic()
+        elapsed = max(now - self._shard_sampled_at, 1e-9)
+        self._shard_sampled_at = now
+
+        totals: dict[int, int] = {}
+        for (shard, _event), counter in SHARD_EVENTS.items():
+            totals[int(shard)] = totals.get(int(shard), 0) + counter.value
+
+        for stats in self.shard_stats():
+            shard_id = stats["id"]
+            SHARD_LATENCY.labels(shard_id).set(stats["latency"])
+            SHARD_GUILDS.labels(shard_id).set(stats["guilds"])
+            total = totals.get(shard_id, 0)
+            self.shard_event_rates[shard_id] = (total - self._shard_event_totals.get(shard_id, 0)) / elapsed
+            self._shard_event_totals[shard_id] = total
+
+    @shard_stats_loop.before_loop
+    async def before_shard_stats_loop(self):
+        await self.wait_until_ready()
 
-        per_user_amount = (
-            total_amount / len(members)
-            if split
-            else total_amount
-        )
+    # =========================
+    # WALLET HEALTH MONITOR
+    # =========================
+    @tasks.loop(seconds=rpc_cfg.get("health_interval_seconds", 15))
+    @metrics.timed_loop("rpc_health")
+    async def rpc_health_loop(self):
+        previous = rpc_module.breaker.state
+        healthy = await asyncio.to_thread(rpc.health_check)
+        state = rpc_module.breaker.state
+
+        if state != previous:
+            if healthy:
+                output.success(f"Wallet daemon recovered (circuit {state})")
+            else:
+                output.warning(f"Wallet daemon unhealthy (circuit {state})")
 
-        total_required = (
-            total_amount
-            if split
-            else per_user_amount * len(members)
-        )
+    # =========================
+    # MEMBER SNAPSHOT / CHUNKING
+    # =========================
+    def prepare_guild(self, guild: discord.Guild):
+        """Warm-start the guild's members from the snapshot and, unless lazy, schedule a real chunk."""
+        if member_snapshot.ENABLED:
+            restored = snapshot.restore(guild)
+            if restored:
+                output.info(f"Restored {restored} cached members for {guild.name}")
+        if member_cache.CHUNK_POLICY == "background" and not guild_members.is_complete(guild):
+            self.chunk_queue.append(guild.id)
+
+    @tasks.loop(seconds=1)
+    async def chunk_loop(self):
+        """One guild at a time, so member requests stay within the gateway rate limit."""
+        while self.chunk_queue:
+            guild = self.get_guild(self.chunk_queue.popleft())
+            if guild is None:
+                continue
+            try:
+                await guild_members.ensure_chunked(guild, touch=False)
+            except Exception as e:
+                output.warning(f"Chunking {guild.name} failed: {type(e).__name__}: {e}")
+
+    @tasks.loop(seconds=member_cache.EVICT_INTERVAL_SECONDS)
+    async def evict_loop(self):
+        dropped = guild_members.evict_idle(self.guilds)
+        if dropped:
+            output.info(f"Evicted {dropped} cached members of idle guilds")
+
+    @tasks.loop(seconds=member_snapshot.SNAPSHOT_INTERVAL_SECONDS)
+    async def snapshot_loop(self):
+        await self.save_member_snapshot()
+
+    @snapshot_loop.before_loop
+    async def before_snapshot_loop(self):
+        await self.wait_until_ready()
+
+    async def save_member_snapshot(self):
+        try:
+            # Partial member lists (lazy or evicted guilds) would restore as if complete
+            data = snapshot.capture([g for g in self.guilds if guild_members.is_complete(g)])
+            await asyncio.to_thread(snapshot.write, data)
+        except Exception:
+            output.warning(f"Could not save member snapshot:\n{traceback.format_exc()}")
 
-        Mysql.check_for_user(drop["creator_id"])
-        balance = Mysql.get_balance(drop["creator_id"], check_update=True)
+    # =========================
+    # LEADER ELECTION
+    # =========================
+    @tasks.loop(seconds=RENEW_SECONDS)
+    async def leader_loop(self):
+        leadership.renew()
 
-        if balance < total_required:
-            await channel.send("⚠️ **Airdrop failed:** insufficient balance.")
-            Mysql.mark_airdrop_executed(drop["id"])
+    # =========================
+    # DEPOSIT SCAN
+    # =========================
+    @tasks.loop(seconds=deposit_cfg.get("scan_interval_seconds", 60))
+    @metrics.timed_loop("deposit_scan")
+    async def deposit_scan_loop(self):
+        """Credits deposits in the background now that tips no longer rescan the wallet first."""
+        if not leadership.is_leader("deposits"):
             return
+        # The wallet scans block for seconds; run them on a worker thread and its own connection.
+        # Recovery runs once, on the first tick this process leads, not on every gateway reconnect
+        if not self.deposits_recovered:
+            await asyncio.to_thread(mysql.recover_missed_deposits)
+            self.deposits_recovered = True
+        await mysql.check_for_updated_balance_async()
 
-        for member in members:
-            Mysql.check_for_user(member.id)
-            Mysql.add_tip(drop["creator_id"], member.id, per_user_amount)
-
-        Mysql.mark_airdrop_executed(drop["id"])
-
-        await channel.send(
-            f"🎉 **Airdrop Complete!**\n"
-            f"👥 {len(members)} users received "
-            f"**{per_user_amount:.8f} MWC** <:MWC:1451276940236423189>"
-        )
+    @deposit_scan_loop.before_loop
+    async def before_deposit_scan_loop(self):
+        await self.wait_until_ready()
 
 
 # =========================
@@ -166,14 +365,6 @@ class MinerBot(commands.Bot):
 bot = MinerBot()
 Mysql = mysql_module.Mysql()
 
-# =========================
-# CLEAN LOG FILE
-# =========================
-try:
-    os.remove("log.txt")
-except FileNotFoundError:
-    pass
-
 if "__pycache__" in g.startup_extensions:
     g.startup_extensions.remove("__pycache__")
 g.startup_extensions = [ext.replace(".py", "") for ext in g.startup_extensions]
@@ -181,6 +372,26 @@ g.startup_extensions = [ext.replace(".py", "") for ext in g.startup_extensions]
 # =========================
 # EVENTS
 # =========================
+async def deposit_notify(snowflake, amount: Amount, txid: str, confirmed: bool):
+    user = await bot.fetch_user(int(snowflake))
+    if not user:
+        return
+
+    status = "CONFIRMED ✅" if confirmed else "UNCONFIRMED ⏳"
+
+    await user.send(
+        f"💰 **MWC Deposit Received**\n\n"
+        f"Amount: `{amount:.8f} MWC`\n"
+        f"Status: **{status}**\n"
+        f"TXID: `{txid}`\n\n"
+        f"{'Funds are now spendable.' if confirmed else f'Funds will be credited after {MIN_CONFIRMATIONS_FOR_DEPOSIT} confirmations.'}"
+    )
+
+# bind callback; the deposit scan calls it from a worker thread
+mysql.set_deposit_callback(
+    lambda *args: asyncio.run_coroutine_threadsafe(deposit_notify(*args), bot.loop)
+)
+
 @bot.event
 async def on_ready():
     output.success(f"Logged in as {bot.user} ({bot.user.id})")
@@ -188,39 +399,48 @@ async def on_ready():
         f"Invite URL: https://discord.com/oauth2/authorize"
         f"?client_id={bot.user.id}&permissions=0&scope=bot%20applications.commands"
     )
+    output.info("Deposit notifications enabled")
 
 @bot.event
-async def on_ready():
-    async def deposit_notify(snowflake, amount: Decimal, txid: str, confirmed: bool):
-        user = await bot.fetch_user(int(snowflake))
-        if not user:
-            return
+async def on_shard_ready(shard_id: int):
+    output.success(f"Shard {shard_id} ready")
 
-        status = "CONFIRMED ✅" if confirmed else "UNCONFIRMED ⏳"
+@bot.event
+async def on_shard_disconnect(shard_id: int):
+    output.warning(f"Shard {shard_id} disconnected")
 
-        await user.send(
-            f"💰 **MWC Deposit Received**\n\n"
-            f"Amount: `{amount:.8f} MWC`\n"
-            f"Status: **{status}**\n"
-            f"TXID: `{txid}`\n\n"
-            f"{'Funds are now spendable.' if confirmed else f'Funds will be credited after {MIN_CONFIRMATIONS_FOR_DEPOSIT} confirmations.'}"
-        )
+@bot.event
+async def on_shard_resumed(shard_id: int):
+    output.info(f"Shard {shard_id} resumed")
 
-    # bind callback
-    mysql.set_deposit_callback(
-        lambda *args: asyncio.create_task(deposit_notify(*args))
-    )
+@bot.event
+async def on_socket_event_type(event_type: str):
+    GATEWAY_EVENTS.labels(event_type).inc()
+
+@bot.listen()
+async def on_presence_update(before: discord.Member, after: discord.Member):
+    bot.count_guild_event(after.guild, "PRESENCE_UPDATE")
+
+@bot.listen()
+async def on_member_update(before: discord.Member, after: discord.Member):
+    bot.count_guild_event(after.guild, "GUILD_MEMBER_UPDATE")
 
-    print("✅ Deposit notifications enabled")
+@bot.listen()
+async def on_message(message: discord.Message):
+    bot.count_guild_event(message.guild, "MESSAGE_CREATE")
 
 @bot.event
-async def on_ready():
-    print(f"Logged in as {bot.user}")
-    mysql.recover_missed_deposits()
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    record_command(interaction, "ok")
+
+@bot.listen()
+async def on_guild_available(guild: discord.Guild):
+    bot.prepare_guild(guild)
 
 @bot.event
 async def on_guild_join(guild: discord.Guild):
     output.info(f"Added to {guild.name}")
+    bot.prepare_guild(guild)
     Mysql.add_server(guild)
     for channel in guild.channels:
         Mysql.add_channel(channel)
@@ -251,20 +471,22 @@ async def on_app_command_error(
     error: app_commands.AppCommandError
 ):
     output.error(f"Slash command error: {error}")
+    record_command(interaction, "error")
+
+    if isinstance(getattr(error, "original", error), rpc_module.RpcUnavailable):
+        message = "⚠️ The wallet is temporarily unavailable. Please try again in a few minutes."
+    elif isinstance(error, app_commands.TransformerError) and isinstance(error.transformer, AmountTransformer):
+        message = f"⚠️ `{error.value}` is not a valid amount (a number with at most 8 decimal places)."
+    else:
+        message = "❌ An unexpected error occurred. Please try again later."
 
     if interaction.response.is_done():
-        await interaction.followup.send(
-            "❌ An unexpected error occurred. Please try again later.",
-            ephemeral=True
-        )
+        await interaction.followup.send(message, ephemeral=True)
     else:
-        await interaction.response.send_message(
-            "❌ An unexpected error occurred. Please try again later.",
-            ephemeral=True
-        )
+        await interaction.response.send_message(message, ephemeral=True)
 
 # =========================
 # STARTUP
 # =========================
-database.run()
-bot.run(config["discord"]["token"])
+if __name__ == "__main__":
+    bot.run(config["discord"]["token"])
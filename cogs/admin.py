@@ -1,11 +1,16 @@
+import asyncio
 import discord
+import io
 import os
 from discord import app_commands
 from discord.ext import commands
+from typing import Literal, Optional
 from utils import output, parsing, mysql_module, g
+from utils.query_log import query_log
 
 mysql = mysql_module.Mysql()
 config = parsing.parse_json('config.json')["logging"]
+MAX_LOG_LINES = 2000  # /log keeps at most this many lines in memory
 
 # ---------------------- OWNER CHECK ----------------------
 def is_owner():
@@ -110,13 +115,102 @@ class Server(commands.Cog):
     # ----------------- Log -----------------
     @app_commands.command(name="log", description="Display the last few lines of the log [ADMIN ONLY]")
     @is_owner()
-    @app_commands.describe(num_lines="Number of lines to display")
-    async def log(self, interaction: discord.Interaction, num_lines: int = 5):
-        with open(config["file"], "r") as f:
-            text = f.readlines()
-        num_lines = max(1, min(num_lines, len(text)))
-        last_lines = "".join(text[-num_lines:])
-        await interaction.response.send_message(f"```{last_lines}```")
+    @app_commands.describe(
+        num_lines=f"Number of lines to display (max {MAX_LOG_LINES})",
+        level="Only show lines of this level",
+        search="Only show lines containing this text"
+    )
+    async def log(
+        self,
+        interaction: discord.Interaction,
+        num_lines: app_commands.Range[int, 1, MAX_LOG_LINES] = 5,
+        level: Optional[Literal["error", "warning", "success", "info"]] = None,
+        search: Optional[str] = None
+    ):
+        await interaction.response.defer()
+        lines = await asyncio.to_thread(output.tail, config["file"], min(max(1, num_lines), MAX_LOG_LINES), level, search)
+        if not lines:
+            await interaction.followup.send("No matching log lines.")
+            return
+
+        text = "\n".join(lines)
+        if len(text) > 1900:
+            file = discord.File(io.BytesIO(text.encode("utf-8")), filename="log.txt")
+            await interaction.followup.send(f"Last {len(lines)} matching lines:", file=file)
+        else:
+            await interaction.followup.send(f"```{text}```")
+
+    # ----------------- Shards -----------------
+    @app_commands.command(name="shards", description="Show per-shard gateway health [ADMIN ONLY]")
+    @is_owner()
+    async def shards(self, interaction: discord.Interaction):
+        if not hasattr(self.bot, "shard_stats"):
+            await interaction.response.send_message("Shard stats are not available.")
+            return
+
+        lines = [f"{'shard':>5} {'latency':>9} {'guilds':>7} {'members':>9} {'events/s':>9}  state"]
+        for s in self.bot.shard_stats():
+            latency = "-" if s["latency"] != s["latency"] else f"{s['latency'] * 1000:.0f}ms"  # NaN before first heartbeat
+            lines.append(
+                f"{s['id']:>5} {latency:>9} {s['guilds']:>7} {s['members']:>9} "
+                f"{s['events_per_second']:>9.1f}  {'closed' if s['closed'] else 'open'}"
+            )
+
+        shard_count = self.bot.shard_count or 1
+        text = "\n".join(lines)
+        await interaction.response.send_message(f"Shards in this process (of {shard_count} total):\n```{text}```")
+
+    # ----------------- Slow Queries -----------------
+    @app_commands.command(name="slowqueries", description="Show the slowest SQL fingerprints [ADMIN ONLY]")
+    @is_owner()
+    @app_commands.describe(
+        top="Number of fingerprints to show",
+        order="Rank by total, average or worst-case time",
+        reset="Clear the collected statistics afterwards"
+    )
+    async def slowqueries(
+        self,
+        interaction: discord.Interaction,
+        top: int = 5,
+        order: Literal["total", "avg", "max"] = "total",
+        reset: bool = False
+    ):
+        stats = query_log.top(max(1, top), order)
+        if not stats:
+            await interaction.response.send_message("No queries recorded yet.")
+            return
+
+        sections = []
+        for s in stats:
+            commands_by_count = sorted(s.commands.items(), key=lambda c: c[1], reverse=True)
+            section = [
+                s.fingerprint,
+                f"  calls={s.count} total={s.total * 1000:.0f}ms avg={s.avg * 1000:.1f}ms "
+                f"max={s.max * 1000:.1f}ms rows={s.rows}",
+                "  by: " + ", ".join(f"{name}×{n}" for name, n in commands_by_count[:5]),
+            ]
+            if s.slowest_sample and s.slowest_sample.split(None, 1)[0].upper() in (
+                "SELECT", "UPDATE", "DELETE", "INSERT", "REPLACE"
+            ):
+                try:
+                    for row in mysql.explain(s.slowest_sample):
+                        section.append(
+                            f"  EXPLAIN {row.get('table')}: type={row.get('type')} "
+                            f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}"
+                        )
+                except Exception as e:
+                    section.append(f"  EXPLAIN failed: {type(e).__name__}: {e}")
+            sections.append("\n".join(section))
+
+        if reset:
+            query_log.reset()
+
+        text = "\n\n".join(sections)
+        if len(text) > 1900:
+            file = discord.File(io.BytesIO(text.encode("utf-8")), filename="slow_queries.txt")
+            await interaction.response.send_message(f"Top {len(stats)} query fingerprints by {order}:", file=file)
+        else:
+            await interaction.response.send_message(f"```{text}```")
 
 
 async def setup(bot: commands.Bot):
@@ -1,11 +1,14 @@
 from datetime import datetime, timezone, timedelta
-from decimal import Decimal
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 from typing import Optional
 
-from utils import mysql_module, parsing, checks
+from utils import mysql_module, parsing, checks, metrics
+from utils.amount import Amount, AmountTransformer, pay_split
+from utils.leader import leadership
+from utils.member_cache import guild_members
+from utils.snowflakes import SnowflakeSet
 
 mysql = mysql_module.Mysql()
 config = parsing.parse_json("config.json")
@@ -17,7 +20,6 @@ class Airdrop(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.pending_airdrops: dict[int, dict] = {}  # airdrop_id -> info
         self.check_airdrops.start()
 
     # ───────── CREATE AIRDROP ─────────
@@ -29,11 +31,11 @@ class Airdrop(commands.Cog):
     async def airdrop(
         self,
         interaction: discord.Interaction,
-        amount: float,
+        amount: app_commands.Transform[Amount, AmountTransformer],
         minutes: int,
         role: Optional[discord.Role] = None
     ):
-        if amount <= 0 or minutes <= 0:
+        if amount.sats <= 0 or minutes <= 0:
             await interaction.response.send_message(
                 "⚠️ Amount and time must be greater than zero.", ephemeral=True
             )
@@ -49,8 +51,9 @@ class Airdrop(commands.Cog):
 
         # safety check
         mysql.check_for_user(interaction.user.id)
-        total_amount = Decimal(str(amount))
-        balance = mysql.get_balance(interaction.user.id, update=True)
+        total_amount = amount
+        # Early feedback only; the payout itself is a conditional debit
+        balance = mysql.get_balance(interaction.user.id)
         if balance < total_amount:
             await interaction.response.send_message(
                 f"⚠️ Insufficient balance. Required: **{total_amount:.8f} MWC**",
@@ -86,94 +89,111 @@ class Airdrop(commands.Cog):
 
         msg = await channel.send(embed=embed)
         await msg.add_reaction("💸")
-
-        # store pending airdrop
-        self.pending_airdrops[airdrop_id] = {
-            "message_id": msg.id,
-            "channel_id": channel.id,
-            "guild_id": guild.id,
-            "creator_id": interaction.user.id,
-            "amount": total_amount,
-            "role_id": role.id if role else None,
-            "execute_at": execute_at
-        }
+        mysql.set_airdrop_message(airdrop_id, msg.id)
 
         await interaction.response.send_message(
             f"✅ Airdrop `{airdrop_id}` scheduled and awaiting reactions!", ephemeral=True
         )
 
     # ───────── CHECK AIRDROPS ─────────
-    @tasks.loop(seconds=30)
+    @tasks.loop(seconds=airdrop_cfg.get("loop_interval_seconds", 30))
+    @metrics.timed_loop("check_airdrops")
     async def check_airdrops(self):
-        now = datetime.now(timezone.utc)
-        to_remove = []
-
-        for aid, info in list(self.pending_airdrops.items()):
-            if info["execute_at"] <= now:
-                guild = self.bot.get_guild(info["guild_id"])
-                if not guild:
-                    to_remove.append(aid)
-                    continue
-
-                channel = guild.get_channel(info["channel_id"])
-                if not channel:
-                    to_remove.append(aid)
-                    continue
+        # Drops live in the database, so exactly one process (the lease holder) pays them out
+        if not airdrop_cfg.get("enabled", True) or not leadership.is_leader("airdrops"):
+            return
 
-                try:
-                    msg = await channel.fetch_message(info["message_id"])
-                except discord.NotFound:
-                    to_remove.append(aid)
+        for drop in mysql.fetch_pending_airdrops(datetime.now(timezone.utc)):
+            # With shard_ids split across processes the guild may live elsewhere; leave
+            # those drops (and any we cannot reach yet) pending rather than consume them
+            guild = self.bot.get_guild(drop["guild_id"])
+            channel = guild.get_channel(drop["channel_id"]) if guild else None
+            if not channel or not drop["message_id"]:
+                continue
+
+            try:
+                msg = await channel.fetch_message(drop["message_id"])
+            except discord.NotFound:
+                msg = None
+            except discord.HTTPException:
+                # Lost permissions or a Discord outage; try again next tick
+                continue
+
+            # Flip executed first so a restart or a new leader cannot pay this drop out again
+            if not mysql.claim_airdrop(drop["id"]):
+                continue
+
+            try:
+                if msg is None:
+                    await channel.send(
+                        f"⚠️ Airdrop `{drop['id']}` cancelled: its announcement was deleted. "
+                        f"Nothing was charged to the creator."
+                    )
                     continue
-
+                await self.execute_airdrop(drop, guild, channel, msg)
+            except Exception as e:
                 try:
-                    # collect eligible reactors
-                    users = []
-                    role_id = info["role_id"]
-                    for reaction in msg.reactions:
-                        if str(reaction.emoji) == "💸":
-                            async for user in reaction.users():
-                                if user.bot or user.id == info["creator_id"]:
-                                    continue
-                                member = guild.get_member(user.id)
-                                if member and (not role_id or role_id in [r.id for r in member.roles]):
-                                    users.append(user.id)
-
-                    users = list(set(users))  # unique users
-
-                    if not users:
-                        await channel.send(
-                            f"⚠️ No one claimed airdrop `{aid}`! Refunding **{info['amount']:.8f} MWC** to creator."
-                        )
-                        mysql.add_tip(None, info["creator_id"], info["amount"])
-                        mysql.mark_airdrop_executed(aid)
-                        to_remove.append(aid)
+                    await channel.send(
+                        f"⚠️ Airdrop `{drop['id']}` failed due to an error: {e}"
+                    )
+                except discord.HTTPException:
+                    pass
+
+    async def execute_airdrop(self, drop: dict, guild: discord.Guild, channel, msg: discord.Message):
+        aid = drop["id"]
+
+        # Reactors are checked against cached members and their roles
+        await guild_members.ensure_chunked(guild)
+
+        # collect eligible reactors
+        users = []
+        role_id = drop["role_id"]
+        for reaction in msg.reactions:
+            if str(reaction.emoji) == "💸":
+                async for user in reaction.users():
+                    if user.bot or user.id == drop["creator_id"]:
                         continue
+                    member = guild.get_member(user.id)
+                    if member and (not role_id or role_id in [r.id for r in member.roles]):
+                        users.append(user.id)
 
-                    # distribute MWC
-                    per_user = info["amount"] / len(users)
-                    for uid in users:
-                        mysql.check_for_user(uid)
-                        mysql.add_tip(info["creator_id"], uid, per_user)
+        users = SnowflakeSet(users)
 
-                    await channel.send(
-                        f"💸 Airdrop `{aid}` executed!\n"
-                        f"**{len(users)} users** received **{per_user:.8f} MWC each**"
-                    )
+        # Nothing is held at creation, so a cancelled drop has nothing to refund
+        if not users:
+            await channel.send(
+                f"⚠️ No one claimed airdrop `{aid}`! Nothing was charged to the creator."
+            )
+            return
 
-                    mysql.mark_airdrop_executed(aid)
-                    to_remove.append(aid)
+        if airdrop_cfg.get("use_max_recipients", True) and len(users) > airdrop_cfg.get("max_recipients", 50):
+            await channel.send(
+                f"⚠️ Airdrop `{aid}` cancelled: too many recipients "
+                f"({len(users)} / {airdrop_cfg['max_recipients']}). Nothing was charged to the creator."
+            )
+            return
 
-                except Exception as e:
-                    await channel.send(
-                        f"⚠️ Airdrop `{aid}` failed due to an error: {e}. Refunding creator."
-                    )
-                    mysql.add_tip(None, info["creator_id"], info["amount"])
-                    mysql.mark_airdrop_executed(aid)
-                    to_remove.append(aid)
+        # distribute MWC, split exactly
+        per_user, remainder = drop["amount"].split(len(users))
+        if not per_user:
+            await channel.send(
+                f"⚠️ Airdrop `{aid}` failed: **{drop['amount']:.8f} MWC** is too small "
+                f"to split between {len(users)} users."
+            )
+            return
+
+        mysql.check_for_users(users)
+        if not mysql.transfer(drop["creator_id"], pay_split(drop["amount"], users)):
+            await channel.send(
+                f"⚠️ Airdrop `{aid}` failed: the creator no longer has **{drop['amount']:.8f} MWC**."
+            )
+            return
 
-        for aid in to_remove:
-            self.pending_airdrops.pop(aid, None)
+        await channel.send(
+            f"💸 Airdrop `{aid}` executed!\n"
+            f"**{len(users)} users** received **{per_user:.8f}"
+            f"{f' to {per_user + Amount(1):.8f}' if remainder else ''} MWC each**"
+        )
 
     @check_airdrops.before_loop
     async def before_check_airdrops(self):
@@ -230,7 +250,6 @@ class Airdrop(commands.Cog):
             return
 
         mysql.mark_airdrop_executed(airdrop_id)
-        self.pending_airdrops.pop(airdrop_id, None)
         await interaction.response.send_message(
             f"✅ Airdrop `{airdrop_id}` canceled.", ephemeral=False
         )
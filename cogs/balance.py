@@ -3,7 +3,8 @@ from discord import app_commands
 from discord.ext import commands
 import aiohttp
 from decimal import Decimal
-from utils import rpc_module, mysql_module
+from utils import rpc_module, mysql_module, market, metrics
+from utils.amount import Amount
 
 rpc = rpc_module.Rpc()
 mysql = mysql_module.Mysql()
@@ -18,8 +19,12 @@ class Balance(commands.Cog):
         self.bot = bot
 
     async def fetch_price_usd(self) -> Decimal:
+        price = market.price_usd()
+        if price is not None:
+            return price
+
         url = f"https://api.coinpaprika.com/v1/tickers/{COINPAPRIKA_ID}"
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()]) as session:
             async with session.get(url) as resp:
                 data = await resp.json()
                 return Decimal(str(data["quotes"]["USD"]["price"]))
@@ -27,12 +32,12 @@ class Balance(commands.Cog):
     def build_embed(
         self,
         user: discord.User,
-        confirmed: Decimal,
-        unconfirmed: Decimal,
+        confirmed: Amount,
+        unconfirmed: Amount,
         price_usd: Decimal
     ) -> discord.Embed:
 
-        confirmed_usd = confirmed * price_usd
+        confirmed_usd = confirmed.coins * price_usd
 
         embed = discord.Embed(
             title="💰 MWC Balance",
@@ -51,8 +56,8 @@ class Balance(commands.Cog):
             inline=True
         )
 
-        if unconfirmed > 0:
-            unconfirmed_usd = unconfirmed * price_usd
+        if unconfirmed.sats > 0:
+            unconfirmed_usd = unconfirmed.coins * price_usd
             embed.add_field(
                 name="Unconfirmed Deposits",
                 value=f"{unconfirmed:.8f} MWC\n≈ ${unconfirmed_usd:,.6f} USD",
@@ -1,9 +1,8 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
-from utils import rpc_module as rpc
-from aiohttp import ClientSession
-import json
+from utils import rpc_module as rpc, market
 
 class Mining(commands.Cog):
     """Slash commands to display MWC mining information"""
@@ -12,32 +11,6 @@ class Mining(commands.Cog):
         self.bot = bot
         self.rpc = rpc.Rpc()
 
-    async def fetch_bmine_data(self):
-        url = "https://bmine.net/api/stats"
-        headers = {"user-agent": "Mozilla/5.0"}
-
-        async with ClientSession() as session:
-            async with session.get(url, headers=headers) as resp:
-                data = await resp.json()
-
-                pools = data.get("pools", {})
-                mwc = pools.get("minersworldcoin")
-
-                if not mwc:
-                    return None
-
-                pool_stats = mwc.get("poolStats", {})
-                blocks = mwc.get("blocks", {})
-
-                return {
-                    "workers": mwc.get("workerCount", 0),
-                    "hashrate": mwc.get("hashrate", 0),
-                    "shares": pool_stats.get("validShares", 0),
-                    "blocks_24h": blocks.get("confirmed", 0),
-                    "last_block": pool_stats.get("networkBlocks", "?"),
-                    "time_since_last": mwc.get("maxRoundTime", 0) / 60
-                }
-
     @staticmethod
     def format_hashrate(hashrate: float):
         """Auto-detect units for hashrate"""
@@ -52,14 +25,14 @@ class Mining(commands.Cog):
     async def mining(self, interaction: discord.Interaction):
         try:
             # ---------------- Core chain info ----------------
-            mining_info = self.rpc.getmininginfo()
+            mining_info = await asyncio.to_thread(self.rpc.getmininginfo)
             height = mining_info["blocks"]
             difficulty = mining_info["difficulty"]
             network_hashrate = mining_info["networkhashps"]
             hash_value, unit = self.format_hashrate(network_hashrate)
 
-            # ---------------- bMine pool info ----------------
-            pool_data = await self.fetch_bmine_data()
+            # ---------------- bMine pool info (background collector) ----------------
+            pool_data = market.latest.get("pool")
 
             embed = discord.Embed(colour=0x00FF00)
             embed.set_author(name="MWC Mining & Pool Info", icon_url="https://pbs.twimg.com/profile_images/2001665741133639680/oKsBqI8b_400x400.jpg")
@@ -78,6 +51,10 @@ class Mining(commands.Cog):
                 embed.add_field(name="24h Blocks", value=str(pool_data["blocks_24h"]), inline=True)
                 embed.add_field(name="Last Block Found", value=str(pool_data["last_block"]), inline=True)
                 embed.add_field(name="Time Since Last Block", value=f"{pool_data['time_since_last']:.2f} min", inline=True)
+
+                trend = market.sparkline("pool_hashrate", 86400)
+                if trend:
+                    embed.add_field(name="Pool Hashrate (24h)", value=f"`{trend}`", inline=False)
                 embed.set_footer(text="ccminer.exe -a yespower -o stratum+tcp://bmine.net:3333 -u <Wallet>.<RigName> -p <Anything>")
             else:
                 embed.add_field(name="Pool Info", value="Could not fetch bMine pool info", inline=False)
@@ -1,10 +1,13 @@
-import math
 import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
 from enum import Enum
-from utils import rpc_module, mysql_module, checks, parsing
+from utils import rpc_module, mysql_module, checks, parsing, market, metrics
+from utils.amount import Amount, AmountTransformer, pay_split
+from utils.member_cache import guild_members
+from utils.snowflakes import SnowflakeSet, mentions
+from utils.tip_batcher import batcher
 
 rpc = rpc_module.Rpc()
 mysql = mysql_module.Mysql()
@@ -29,15 +32,19 @@ class Soak(commands.Cog):
         soak_config = parsing.parse_json('config.json')['soak']
         self.soak_max_recipients = soak_config["soak_max_recipients"]
         self.use_max_recipients = soak_config["use_max_recipients"]
-        self.soak_min_received = soak_config["soak_min_received"]
+        self.soak_min_received = Amount.from_coins(soak_config["soak_min_received"])
         self.use_min_received = soak_config["use_min_received"]
 
         # --- In-memory activity tracker for active soak ---
         self.active_users: dict[int, float] = {}  # snowflake -> last seen timestamp
 
     async def fetch_price_usd(self) -> float:
+        price = market.price_usd()
+        if price is not None:
+            return float(price)
+
         url = f"https://api.coinpaprika.com/v1/tickers/{COINPAPRIKA_ID}"
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()]) as session:
             async with session.get(url) as resp:
                 data = await resp.json()
                 return float(data["quotes"]["USD"]["price"])
@@ -65,7 +72,7 @@ class Soak(commands.Cog):
         self,
         interaction: discord.Interaction,
         type: SoakType,
-        amount: float,
+        amount: app_commands.Transform[Amount, AmountTransformer],
         role: discord.Role | None = None,
         timeframe: str | None = None
     ):
@@ -78,26 +85,24 @@ class Soak(commands.Cog):
         await interaction.response.defer(ephemeral=False)
 
         mysql.check_for_user(snowflake)
-        balance = mysql.get_balance(snowflake, update=True)
 
-        if amount <= 0:
+        if amount.sats <= 0:
             await interaction.followup.send(f"{sender.mention} ⚠️ Amount must be greater than 0!", ephemeral=True)
             return
 
-        if balance < amount:
-            await interaction.followup.send(f"{sender.mention} ⚠️ Insufficient balance!", ephemeral=True)
-            return
+        # Every soak type reads the guild's member list
+        await guild_members.ensure_chunked(interaction.guild)
 
-        recipients: list[discord.Member] = []
+        recipients = SnowflakeSet()
 
         # =========================
         # ONLINE SOAK
         # =========================
         if type == SoakType.online:
-            recipients = [
-                m for m in interaction.guild.members
-                if not m.bot and m.id != snowflake and m.status != discord.Status.offline
-            ]
+            recipients = SnowflakeSet(
+                m.id for m in interaction.guild.members
+                if not m.bot and m.status != discord.Status.offline
+            )
 
         # =========================
         # ROLE SOAK
@@ -106,10 +111,7 @@ class Soak(commands.Cog):
             if not role:
                 await interaction.followup.send("⚠️ You must specify a role for role soak!", ephemeral=True)
                 return
-            recipients = [
-                m for m in role.members
-                if not m.bot and m.id != snowflake
-            ]
+            recipients = SnowflakeSet(m.id for m in role.members if not m.bot)
 
         # =========================
         # ACTIVE SOAK (since bot startup)
@@ -141,25 +143,22 @@ class Soak(commands.Cog):
 
             cutoff = discord.utils.utcnow().timestamp() - duration_seconds
 
-            active_ids = [
+            guild = interaction.guild
+            recipients = SnowflakeSet(
                 uid for uid, ts in self.active_users.items()
-                if ts >= cutoff
-            ]
-
-            for uid in active_ids:
-                member = interaction.guild.get_member(uid)
-                if member and not member.bot and member.id != snowflake:
-                    recipients.append(member)
+                if ts >= cutoff and (member := guild.get_member(uid)) and not member.bot
+            )
 
         # =========================
         # VALIDATION
         # =========================
+        recipients = recipients.difference([snowflake]).difference(mysql.fetch_soak_optouts())
         if not recipients:
             await interaction.followup.send(f"{sender.mention} ⚠️ No eligible users found!", ephemeral=True)
             return
 
         if self.use_max_recipients:
-            recipients = recipients[: self.soak_max_recipients]
+            recipients = recipients.sample(self.soak_max_recipients)
 
         count = len(recipients)
 
@@ -170,35 +169,34 @@ class Soak(commands.Cog):
             )
             return
 
-        split_amount = math.floor(amount * 1e8 / count) / 1e8
-        if split_amount <= 0:
+        # Exact split: the first `remainder` recipients by ID get one satoshi more
+        split_amount, remainder = amount.split(count)
+        if not split_amount:
             await interaction.followup.send(f"{sender.mention} ⚠️ Amount too small to split!", ephemeral=True)
             return
 
         # =========================
         # EXECUTE SOAK
         # =========================
-        for member in recipients:
-            mysql.check_for_user(member.id)
-            mysql.add_tip(snowflake, member.id, split_amount)
+        mysql.check_for_users(recipients)
+        if not await batcher.transfer(snowflake, pay_split(amount, recipients)):
+            await interaction.followup.send(f"{sender.mention} ⚠️ Insufficient balance!", ephemeral=True)
+            return
 
         price_usd = await self.fetch_price_usd()
-        usd_each = split_amount * price_usd
+        usd_each = float(split_amount.coins) * price_usd
+        each = f"{split_amount:.8f}" + (f" to {split_amount + Amount(1):.8f}" if remainder else "")
 
         # =========================
         # BUILD MENTIONS WITH SPLIT MESSAGES
         # =========================
-        chunk_size = 50
-        mentions_chunks = [
-            ", ".join(m.mention for m in recipients[i:i+chunk_size])
-            for i in range(0, len(recipients), chunk_size)
-        ]
+        mentions_chunks = [mentions(chunk) for chunk in recipients.chunks(50)]
 
         # First chunk uses followup.send to resolve the defer
         first_chunk = mentions_chunks.pop(0)
         msg = (
             f"💦 {sender.mention} soaked **{count} users** ({type.value})\n"
-            f"💰 **{split_amount:.8f} MWC each** (~${usd_each:,.6f})\n"
+            f"💰 **{each} MWC each** (~${usd_each:,.6f})\n"
             f"👥 {first_chunk}\n"
             f"📦 Total: **{amount:.8f} MWC**"
         )
@@ -208,7 +206,7 @@ class Soak(commands.Cog):
         for chunk in mentions_chunks:
             extra_msg = (
                 f"💦 {sender.mention} soaked **{count} users** ({type.value})\n"
-                f"💰 **{split_amount:.8f} MWC each** (~${usd_each:,.6f})\n"
+                f"💰 **{each} MWC each** (~${usd_each:,.6f})\n"
                 f"👥 {chunk}\n"
                 f"📦 Total: **{amount:.8f} MWC**"
             )
@@ -1,14 +1,7 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-import aiohttp
-import asyncio
-from decimal import Decimal
-from utils import parsing
-
-COINPAPRIKA_ID = "mwc-minersworldcoin"
-CHAIN_INFO_URL = "https://api.minersworld.org/info"
-SATOSHIS = Decimal("100000000")
+from utils import parsing, market
 
 
 class Stats(commands.Cog):
@@ -17,39 +10,20 @@ class Stats(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    async def fetch_price_data(self) -> Decimal:
-        """Fetch MWC price in USD from CoinPaprika"""
-        url = f"https://api.coinpaprika.com/v1/tickers/{COINPAPRIKA_ID}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=10) as resp:
-                data = await resp.json()
-                return Decimal(str(data["quotes"]["USD"]["price"]))
-
-    async def fetch_chain_supply(self) -> Decimal:
-        """Fetch circulating supply from chain and convert from satoshi"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(CHAIN_INFO_URL, timeout=10) as resp:
-                data = await resp.json()
-                sat_supply = Decimal(str(data["result"]["supply"]))
-                return sat_supply / SATOSHIS
-
-    async def fetch_volume_and_rank(self) -> dict:
-        """Fetch 24h volume and rank from CoinPaprika"""
-        url = f"https://api.coinpaprika.com/v1/tickers/{COINPAPRIKA_ID}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=10) as resp:
-                data = await resp.json()
-                usd = data["quotes"]["USD"]
-                return {
-                    "volume_24h": Decimal(str(usd["volume_24h"])),
-                    "rank": data.get("rank", "?")
-                }
+    @staticmethod
+    def format_delta(name: str, seconds: int) -> str:
+        change = market.delta(name, seconds)
+        if change is None:
+            return ""
+        arrow = "▲" if change[0] >= 0 else "▼"
+        return f"\n{arrow} {change[1]:+.2f}%"
 
     @app_commands.command(
         name="stats",
         description="Show Miners World Coin (MWC) stats"
     )
-    async def stats(self, interaction: discord.Interaction):
+    @app_commands.describe(window="Show changes over a window like 1h, 24h, 7d (default 24h)")
+    async def stats(self, interaction: discord.Interaction, window: str = "24h"):
         # Channel restriction
         allowed_channels = parsing.parse_json("config.json")["command_channels"]["stats"]
         if interaction.channel.name not in allowed_channels:
@@ -59,16 +33,28 @@ class Stats(commands.Cog):
             )
             return
 
-        await interaction.response.defer()
-
         try:
-            # Parallel fetch: price, supply, volume/rank
-            price, supply, vr = await asyncio.gather(
-                self.fetch_price_data(),
-                self.fetch_chain_supply(),
-                self.fetch_volume_and_rank()
+            window_seconds = parsing.parse_duration(window)
+        except ValueError:
+            await interaction.response.send_message(
+                "⚠️ Invalid window format.\nUse `30m`, `1h`, `24h`, `7d`",
+                ephemeral=True
+            )
+            return
+
+        # Rendered from the background collector; no third-party calls here
+        price = market.price_usd()
+        supply = market.series["supply"].latest()
+        volume = market.series["volume_24h"].latest()
+
+        if price is None or supply is None:
+            await interaction.response.send_message(
+                "⏳ Market data has not been collected yet, please try again shortly.",
+                ephemeral=True
             )
+            return
 
+        try:
             # Calculate market cap manually
             market_cap = price * supply
 
@@ -84,7 +70,7 @@ class Stats(commands.Cog):
 
             embed.add_field(
                 name="Price (USD)",
-                value=f"${price:.8f}",
+                value=f"${price:.8f}{self.format_delta('price', window_seconds)}",
                 inline=True
             )
 
@@ -102,21 +88,29 @@ class Stats(commands.Cog):
 
             embed.add_field(
                 name="24h Volume",
-                value=f"${vr['volume_24h']:,}",
+                value=f"${volume:,}{self.format_delta('volume_24h', window_seconds)}",
                 inline=True
             )
 
             embed.add_field(
                 name="Rank",
-                value=f"#{vr['rank']}",
+                value=f"#{market.latest.get('rank', '?')}",
                 inline=True
             )
 
-            await interaction.followup.send(embed=embed)
+            trend = market.sparkline("price", window_seconds)
+            if trend:
+                embed.add_field(
+                    name=f"Price Trend ({window})",
+                    value=f"`{trend}`",
+                    inline=False
+                )
+
+            await interaction.response.send_message(embed=embed)
 
         except Exception as e:
-            await interaction.followup.send(
-                f"⚠️ Error fetching MWC stats:\n`{type(e).__name__}: {e}`",
+            await interaction.response.send_message(
+                f"⚠️ Error building MWC stats:\n`{type(e).__name__}: {e}`",
                 ephemeral=False
             )
 
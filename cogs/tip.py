@@ -2,7 +2,11 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from typing import Union
-from utils import rpc_module, mysql_module, parsing, checks
+from utils import rpc_module, mysql_module, parsing, checks, market, metrics
+from utils.amount import Amount, AmountTransformer, pay_split
+from utils.member_cache import guild_members
+from utils.snowflakes import SnowflakeSet, mentions
+from utils.tip_batcher import batcher
 import aiohttp
 import re
 
@@ -20,12 +24,32 @@ class Tip(commands.Cog):
         self.bot = bot
 
     async def fetch_price_usd(self) -> float:
+        price = market.price_usd()
+        if price is not None:
+            return float(price)
+
         url = f"https://api.coinpaprika.com/v1/tickers/{COINPAPRIKA_ID}"
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()]) as session:
             async with session.get(url) as resp:
                 data = await resp.json()
                 return float(data["quotes"]["USD"]["price"])
 
+    async def defer(self, interaction: discord.Interaction):
+        """Acknowledge before slow work. The placeholder is ephemeral so error replies stay private."""
+        if not interaction.response.is_done():
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+    async def respond(self, interaction: discord.Interaction, content: str, ephemeral: bool = False):
+        """send_message, or after defer(): errors fill the private placeholder, results go out as a new public message."""
+        if not interaction.response.is_done():
+            await interaction.response.send_message(content, ephemeral=ephemeral)
+        elif ephemeral:
+            await interaction.edit_original_response(content=content)
+        else:
+            # A followup to an unresolved deferral would inherit its ephemeral flag
+            await interaction.edit_original_response(content="✅ Done.")
+            await interaction.followup.send(content)
+
     @app_commands.command(
         name="tip",
         description="Tip users or roles MWC coins"
@@ -34,7 +58,7 @@ class Tip(commands.Cog):
     async def tip(
         self,
         interaction: discord.Interaction,
-        amount: float,
+        amount: app_commands.Transform[Amount, AmountTransformer],
         user: discord.Member | None = None,
         users: str | None = None,  # comma-separated user mentions
         role: discord.Role | None = None
@@ -47,7 +71,7 @@ class Tip(commands.Cog):
             )
             return
 
-        if amount <= 0:
+        if amount.sats <= 0:
             await interaction.response.send_message(
                 f"{interaction.user.mention} ⚠️ Tip amount must be greater than 0!",
                 ephemeral=True
@@ -57,44 +81,50 @@ class Tip(commands.Cog):
         sender = interaction.user
         mysql.check_for_user(sender.id)
 
-        recipients: list[discord.Member] = []
+        recipient_ids: list[int] = []
 
         # ----- SINGLE USER -----
         if user:
-            recipients.append(user)
+            recipient_ids.append(user.id)
 
         # ----- MULTI USERS -----
         if users:
             user_ids = [int(re.sub(r"[<@!>]", "", u.strip())) for u in users.split(",") if u.strip()]
-            for uid in user_ids:
-                member = interaction.guild.get_member(uid)
-                if member and not member.bot and member.id != sender.id:
-                    recipients.append(member)
+            for member in await guild_members.resolve(interaction.guild, user_ids):
+                if not member.bot and member.id != sender.id:
+                    recipient_ids.append(member.id)
 
         # ----- ROLE -----
         if role:
-            role_members = [m for m in role.members if not m.bot and m.id != sender.id]
+            if not guild_members.is_complete(interaction.guild):
+                # Chunking can outlast the 3 second interaction deadline
+                await self.defer(interaction)
+            await guild_members.ensure_chunked(interaction.guild)
+            role_members = SnowflakeSet(m.id for m in role.members if not m.bot).difference([sender.id])
             if len(role_members) > MAX_ROLE_MEMBERS:
-                await interaction.response.send_message(
+                await self.respond(
+                    interaction,
                     f"{sender.mention} ⚠️ Role has **{len(role_members)} members** "
                     f"(max {MAX_ROLE_MEMBERS})",
                     ephemeral=True
                 )
                 return
-            recipients.extend(role_members)
+            recipient_ids.extend(role_members)
 
         # ----- CLEAN & DEDUPE -----
-        recipients = list({m.id: m for m in recipients}.values())
+        recipients = SnowflakeSet(recipient_ids)
 
         if not recipients:
-            await interaction.response.send_message(
+            await self.respond(
+                interaction,
                 f"{sender.mention} ⚠️ No valid recipients!",
                 ephemeral=True
             )
             return
 
         if len(recipients) > MAX_MULTI_USERS:
-            await interaction.response.send_message(
+            await self.respond(
+                interaction,
                 f"{sender.mention} ⚠️ Too many recipients "
                 f"(**{len(recipients)}**, max {MAX_MULTI_USERS})",
                 ephemeral=True
@@ -102,40 +132,43 @@ class Tip(commands.Cog):
             return
 
         # ----- SPLIT LOGIC -----
-        if len(recipients) > 1:
-            per_user_amount = amount / len(recipients)
-            total_required = amount
-        else:
-            per_user_amount = amount
-            total_required = amount
-
-        # ----- CHECK SENDER BALANCE -----
-        balance = mysql.get_balance(sender.id, update=True)
-        if balance < total_required:
-            await interaction.response.send_message(
-                f"{sender.mention} ⚠️ You need **{total_required:.8f} MWC** to complete this tip!",
+        # Exact split: the first `remainder` recipients get one satoshi more
+        share, remainder = amount.split(len(recipients))
+        if not share:
+            await self.respond(
+                interaction,
+                f"{sender.mention} ⚠️ Amount too small to split between **{len(recipients)} users**!",
                 ephemeral=True
             )
             return
 
-        # ----- PROCESS TIPS -----
-        for member in recipients:
-            mysql.check_for_user(member.id)
-            mysql.add_tip(sender.id, member.id, per_user_amount)
+        # ----- DEBIT SENDER & PROCESS TIPS -----
+        mysql.check_for_users(recipients)
+        if not await batcher.transfer(sender.id, pay_split(amount, recipients)):
+            await self.respond(
+                interaction,
+                f"{sender.mention} ⚠️ You need **{amount:.8f} MWC** to complete this tip!",
+                ephemeral=True
+            )
+            return
 
+        if market.price_usd() is None:
+            # The CoinPaprika fallback can outlast the interaction deadline too
+            await self.defer(interaction)
         price_usd = await self.fetch_price_usd()
-        usd_value = per_user_amount * price_usd
+        usd_value = float(share.coins) * price_usd
 
-        mentions = ", ".join(m.mention for m in recipients[:5])
+        shown = mentions(next(recipients.chunks(5)))
         if len(recipients) > 5:
-            mentions += f" +{len(recipients) - 5} more"
+            shown += f" +{len(recipients) - 5} more"
 
         mode = "split" if len(recipients) > 1 else "single"
 
-        await interaction.response.send_message(
+        await self.respond(
+            interaction,
             f"{sender.mention} tipped **{len(recipients)} users** ({mode} mode)\n"
-            f"👥 {mentions}\n"
-            f"💰 **{per_user_amount:.8f} MWC per user**\n"
+            f"👥 {shown}\n"
+            f"💰 **{share:.8f}{f' to {share + Amount(1):.8f}' if remainder else ''} MWC per user**\n"
             f"💵 ~${usd_value:,.6f} USD each <:MWC:1451276940236423189>"
         )
 
@@ -1,3 +1,4 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
@@ -28,9 +29,11 @@ class WalletInfo(commands.Cog):
     async def wallet(self, interaction: discord.Interaction):
         """Show wallet info"""
         try:
-            wallet_info = self.rpc.getwalletinfo()
-            network_info = self.rpc.getnetworkinfo()
-            chain_info = self.rpc.getblockchaininfo()
+            wallet_info, network_info, chain_info = await asyncio.gather(
+                asyncio.to_thread(self.rpc.getwalletinfo),
+                asyncio.to_thread(self.rpc.getnetworkinfo),
+                asyncio.to_thread(self.rpc.getblockchaininfo)
+            )
 
             wallet_balance = float(wallet_info.get("balance", 0))
             block_height = chain_info.get("blocks", "N/A")
@@ -64,6 +67,35 @@ class WalletInfo(commands.Cog):
                 ephemeral=False
             )
 
+    @app_commands.command(
+        name="rpc_health",
+        description="Show wallet RPC circuit state and latencies [ADMIN ONLY]"
+    )
+    @is_owner()
+    async def rpc_health(self, interaction: discord.Interaction):
+        """Show circuit breaker state and per-method latency"""
+        breaker = rpc_module.breaker
+
+        embed = discord.Embed(
+            title="🩺 Wallet RPC Health",
+            colour=discord.Colour.green() if breaker.state == breaker.CLOSED else discord.Colour.red()
+        )
+        embed.add_field(name="Circuit", value=breaker.state, inline=True)
+        embed.add_field(name="Error Rate", value=f"{breaker.current_error_rate():.0%}", inline=True)
+
+        lines = [
+            f"{method}: n={h.count} p50={h.percentile(0.5) * 1000:.0f}ms "
+            f"p95={h.percentile(0.95) * 1000:.0f}ms max={h.max * 1000:.0f}ms"
+            for (method,), h in sorted(rpc_module.latency.items())
+        ]
+        embed.add_field(
+            name="Latency",
+            value=f"```{chr(10).join(lines)}```" if lines else "No calls yet",
+            inline=False
+        )
+
+        await interaction.response.send_message(embed=embed)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(WalletInfo(bot))
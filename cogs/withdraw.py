@@ -1,15 +1,23 @@
+import asyncio
 import discord
 from discord import app_commands
-from discord.ext import commands
-from utils import rpc_module, mysql_module, parsing
+from discord.ext import commands, tasks
+from utils import rpc_module, mysql_module, parsing, output, addresses, metrics
+from utils.leader import leadership
+from utils.amount import Amount, ZERO
 from decimal import Decimal, InvalidOperation
 import traceback
+import uuid
 from datetime import datetime
 
 rpc = rpc_module.Rpc()
 mysql = mysql_module.Mysql()
+withdraw_cfg = parsing.parse_json("config.json").get("withdraw", {})
 
 EXPLORER_TX_URL = "https://miners-world-coin-mwc.github.io/explorer/#/transaction/{}"
+RECOVERY_PAGE_SIZE = 100
+# Wallet and database clocks may disagree; search this much further back
+RECOVERY_CLOCK_SKEW_SECONDS = 600
 
 
 class Withdraw(commands.Cog):
@@ -18,6 +26,42 @@ class Withdraw(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
+        # --- Withdrawal worker ---
+        self.max_attempts = withdraw_cfg.get("max_attempts", 5)
+        self.retry_base_seconds = withdraw_cfg.get("retry_base_seconds", 30)
+        self.max_concurrency = withdraw_cfg.get("max_concurrency", 4)
+        self.min_confirmations = withdraw_cfg.get("min_confirmations", 1)
+        self.recovery_scan_limit = withdraw_cfg.get("recovery_scan_limit", 5000)
+        self._worker_lock = asyncio.Lock()
+
+        # --- Optional batched settlement via sendmany ---
+        self.batch_enabled = withdraw_cfg.get("batch_enabled", False)
+        self.batch_interval_seconds = withdraw_cfg.get("batch_interval_seconds", 60)
+        self.batch_max_size = withdraw_cfg.get("batch_max_size", 20)
+
+        self.withdrawal_worker.change_interval(seconds=withdraw_cfg.get("worker_interval_seconds", 5))
+        self.withdrawal_worker.start()
+
+    async def cog_unload(self):
+        self.withdrawal_worker.cancel()
+
+    async def defer(self, interaction: discord.Interaction):
+        """Acknowledge before slow work. The placeholder is ephemeral so error replies stay private."""
+        if not interaction.response.is_done():
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+    async def respond(self, interaction: discord.Interaction, content: str = None, *,
+                      embed: discord.Embed = None, ephemeral: bool = False):
+        """send_message, or after defer(): errors fill the private placeholder, results go out as a new public message."""
+        if not interaction.response.is_done():
+            await interaction.response.send_message(content, embed=embed, ephemeral=ephemeral)
+        elif ephemeral:
+            await interaction.edit_original_response(content=content, embed=embed)
+        else:
+            # A followup to an unresolved deferral would inherit its ephemeral flag
+            await interaction.edit_original_response(content="✅ Done.")
+            await interaction.followup.send(content, embed=embed)
+
     withdraw = app_commands.Group(
         name="withdraw",
         description="Withdraw MWC or view withdrawal history"
@@ -47,6 +91,8 @@ class Withdraw(commands.Cog):
         try:
             amount_dec = Decimal(amount)
         except InvalidOperation:
+            amount_dec = None
+        if amount_dec is None or not amount_dec.is_finite():
             await interaction.response.send_message("⚠️ Invalid amount format.", ephemeral=True)
             return
 
@@ -64,87 +110,118 @@ class Withdraw(commands.Cog):
             )
             return
 
-        mysql.check_for_user(snowflake)
+        try:
+            amount = Amount.from_coins(amount_dec)
+        except ValueError:
+            await interaction.response.send_message("⚠️ Amount is too large.", ephemeral=True)
+            return
+
+        # Address validation may ask the daemon; acknowledge within the interaction deadline first
+        await self.defer(interaction)
+        await asyncio.to_thread(mysql.check_for_user, snowflake)
 
         # ---- Validate address ----
-        addr_info = rpc.validateaddress(address)
-        if not addr_info.get("isvalid"):
-            await interaction.response.send_message(
+        if not await asyncio.to_thread(addresses.is_valid, address):
+            await self.respond(
+                interaction,
                 "⚠️ Invalid withdrawal address.",
                 ephemeral=True
             )
             return
 
         # ---- Prevent withdrawing to bot-owned addresses ----
-        for addr in rpc.listreceivedbyaddress(0, True):
-            if addr.get("address") == address:
-                await interaction.response.send_message(
-                    "⚠️ You cannot withdraw to a bot-owned address. Use `/tip` instead.",
-                    ephemeral=True
-                )
-                return
-
-        # ---- Update balance ----
-        mysql.check_for_updated_balance(snowflake)
+        if await asyncio.to_thread(mysql.is_bot_address, address):
+            await self.respond(
+                interaction,
+                "⚠️ You cannot withdraw to a bot-owned address. Use `/tip` instead.",
+                ephemeral=True
+            )
+            return
 
-        balance = mysql.get_balance(snowflake, confirmed_only=True)
-        txfee = Decimal(str(mysql.txfee))
+        # Deposits are credited by the bot's deposit_scan_loop; only the confirmed balance is spendable
+        balance = await asyncio.to_thread(mysql.get_balance, snowflake, confirmed_only=True)
+        txfee = mysql.txfee
 
-        if amount_dec <= txfee:
-            await interaction.response.send_message(
+        if amount <= txfee:
+            await self.respond(
+                interaction,
                 f"⚠️ Amount must be greater than the tx fee ({txfee} MWC).",
                 ephemeral=True
             )
             return
 
-        if balance < amount_dec:
-            await interaction.response.send_message(
+        if balance < amount:
+            await self.respond(
+                interaction,
                 "⚠️ Insufficient confirmed balance.",
                 ephemeral=True
             )
             return
 
-        # ---- Execute withdrawal ----
-        try:
-            txid = mysql.create_withdrawal(
-                snowflake=snowflake,
-                address=address,
-                amount=amount_dec
+        # ---- Create and reserve the withdrawal job ----
+        # The interaction ID makes a replayed interaction resolve to the same job
+        job = await asyncio.to_thread(
+            mysql.create_withdrawal_job,
+            idempotency_key=str(interaction.id),
+            snowflake=snowflake,
+            address=address,
+            amount=amount
+        )
+        if job["status"] == "REQUESTED":
+            job = await asyncio.to_thread(mysql.reserve_withdrawal, job["id"])
+
+        if job["status"] == "FAILED":
+            await self.respond(
+                interaction,
+                f"⚠️ Withdrawal `{job['id']}` failed: {job['last_error']}.",
+                ephemeral=True
             )
+            return
 
-            if not txid:
-                await interaction.response.send_message(
-                    "❌ Withdrawal failed. Please contact support.",
-                    ephemeral=True
-                )
-                return
+        embed = discord.Embed(
+            title="⏳ Withdrawal Requested",
+            color=discord.Color.gold(),
+            timestamp=datetime.utcnow()
+        )
+        embed.add_field(name="Job ID", value=f"`{job['id']}`", inline=False)
+        embed.add_field(name="Amount", value=f"{amount:.8f} MWC", inline=False)
+        embed.add_field(name="To Address", value=f"`{address}`", inline=False)
+        embed.set_footer(
+            text="⚠️ Tx fee paid by sender • You will receive a DM with the transaction ID"
+        )
 
-            explorer_link = EXPLORER_TX_URL.format(txid)
+        await self.respond(interaction, embed=embed)
 
-            embed = discord.Embed(
-                title="✅ Withdrawal Successful",
-                color=discord.Color.green(),
-                timestamp=datetime.utcnow()
+    # =========================
+    # /withdraw status
+    # =========================
+    @withdraw.command(name="status", description="Check the status of a withdrawal")
+    async def withdraw_status(self, interaction: discord.Interaction, job_id: int):
+        job = mysql.get_withdrawal_job(job_id)
+        if not job or job["snowflake_fk"] != interaction.user.id:
+            await interaction.response.send_message(
+                "❌ Withdrawal not found.",
+                ephemeral=True
             )
-            embed.add_field(name="Amount", value=f"{amount_dec:.8f} MWC", inline=False)
-            embed.add_field(name="To Address", value=f"`{address}`", inline=False)
+            return
+
+        embed = discord.Embed(
+            title=f"Withdrawal `{job['id']}`",
+            color=discord.Color.blurple()
+        )
+        embed.add_field(name="Status", value=job["status"], inline=True)
+        embed.add_field(name="Amount", value=f"{job['amount']:.8f} MWC", inline=True)
+        embed.add_field(name="To Address", value=f"`{job['address']}`", inline=False)
+        if job["txid"]:
             embed.add_field(
                 name="Transaction ID",
-                value=f"[{txid}]({explorer_link})",
+                value=f"[{job['txid']}]({EXPLORER_TX_URL.format(job['txid'])})",
                 inline=False
             )
-            embed.set_footer(
-                text="⚠️ Tx fee paid by sender • Use /balance to verify"
-            )
+        if job["last_error"]:
+            embed.add_field(name="Last Error", value=job["last_error"], inline=False)
 
-            await interaction.response.send_message(embed=embed)
-
-        except Exception as e:
-            traceback.print_exc()
-            await interaction.response.send_message(
-                f"❌ Withdrawal error:\n```{type(e).__name__}: {e}```",
-                ephemeral=True
-            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
     # =========================
     # /withdraw history
@@ -169,11 +246,17 @@ class Withdraw(commands.Cog):
         )
 
         for w in withdrawals[:10]:
-            explorer_link = EXPLORER_TX_URL.format(w["txid"])
+            if w["txid"]:
+                explorer_link = EXPLORER_TX_URL.format(w["txid"])
+                value = f"[View Transaction]({explorer_link})"
+            elif w["status"] == "FAILED":
+                value = f"❌ Failed (ID `{w['id']}`)"
+            else:
+                value = f"⏳ {w['status'].capitalize()} (ID `{w['id']}`)"
 
             embed.add_field(
                 name=f"{w['amount']:.8f} MWC",
-                value=f"[View Transaction]({explorer_link})",
+                value=value,
                 inline=False
             )
 
@@ -181,6 +264,221 @@ class Withdraw(commands.Cog):
 
         await interaction.response.send_message(embed=embed, ephemeral=False)
 
+    # =========================
+    # WITHDRAWAL WORKER
+    # =========================
+    @tasks.loop(seconds=5)
+    @metrics.timed_loop("withdrawal_worker")
+    async def withdrawal_worker(self):
+        # Another process owns the withdrawal queue; requests made here are picked up there
+        if not leadership.is_leader("withdrawals"):
+            return
+
+        async with self._worker_lock:
+            try:
+                # Jobs left REQUESTED by a crash between create and reserve
+                for job in mysql.fetch_withdrawal_jobs("REQUESTED", 100):
+                    job = mysql.reserve_withdrawal(job["id"])
+                    if job["status"] == "FAILED":
+                        await self.notify_withdrawal(job, None, refunded=False)
+
+                # Don't burn retry attempts while the wallet is known to be down
+                if rpc_module.breaker.state == rpc_module.CircuitBreaker.OPEN:
+                    return
+
+                await self.broadcast_reserved()
+                await self.confirm_broadcast()
+            except Exception:
+                output.error(f"Withdrawal worker error:\n{traceback.format_exc()}")
+
+    @withdrawal_worker.before_loop
+    async def before_withdrawal_worker(self):
+        await self.bot.wait_until_ready()
+
+    async def broadcast_reserved(self):
+        limit = self.batch_max_size * 5 if self.batch_enabled else self.max_concurrency * 5
+        jobs = mysql.fetch_withdrawal_jobs("RESERVED", limit, due_only=True)
+        if not jobs:
+            return
+
+        jobs = await self.recover_broadcasts(jobs)
+
+        for job in [j for j in jobs if j["attempts"] >= self.max_attempts]:
+            mysql.fail_withdrawals([job], job["last_error"] or "Broadcast failed")
+            await self.notify_withdrawal(job, None)
+
+        jobs = [j for j in jobs if j["attempts"] < self.max_attempts]
+        if not jobs:
+            return
+
+        if self.batch_enabled:
+            # Settle every batch_interval_seconds, or early once batch_max_size are waiting
+            if len(jobs) < self.batch_max_size and max(j["age"] for j in jobs) < self.batch_interval_seconds:
+                return
+            for i in range(0, len(jobs), self.batch_max_size):
+                await self.broadcast(jobs[i:i + self.batch_max_size])
+            return
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def broadcast_one(job):
+            async with semaphore:
+                await self.broadcast([job])
+
+        await asyncio.gather(*(broadcast_one(job) for job in jobs))
+
+    async def recover_broadcasts(self, jobs: list[dict]) -> list[dict]:
+        """
+        A failed attempt may still have reached the wallet. Look up earlier attempts
+        by their wallet comment and settle those jobs instead of paying them twice.
+        If the wallet history cannot be searched back far enough to be sure, the
+        jobs are parked for manual review rather than broadcast again.
+        """
+        retried = [j for j in jobs if j["attempts"] > 0 and j["broadcast_ref"]]
+        refs = {j["broadcast_ref"] for j in retried}
+        if not refs:
+            return jobs
+
+        # Any send for these jobs happened after the oldest was created
+        since = min(float(j["created_ts"]) for j in retried) - RECOVERY_CLOCK_SKEW_SECONDS
+        try:
+            found, complete = await asyncio.to_thread(self.find_sends, refs, since)
+        except Exception as e:
+            output.warning(f"Withdrawal recovery skipped, wallet unavailable: {type(e).__name__}: {e}")
+            return [j for j in jobs if j["broadcast_ref"] not in refs]
+
+        for ref, txid in found.items():
+            recovered = [j for j in jobs if j["broadcast_ref"] == ref]
+            mysql.mark_withdrawals_broadcast([j["id"] for j in recovered], txid)
+            output.info(f"Recovered {len(recovered)} withdrawal(s) already broadcast in {txid}")
+            for job in recovered:
+                await self.notify_withdrawal(job, txid)
+
+        if not complete:
+            unsure = [j for j in retried if j["broadcast_ref"] not in found]
+            if unsure:
+                mysql.hold_withdrawals(
+                    [j["id"] for j in unsure],
+                    "Earlier attempt not found in the scanned wallet history; needs manual review"
+                )
+                output.error(
+                    f"Parked withdrawal(s) {', '.join(str(j['id']) for j in unsure)} for review: "
+                    f"wallet history beyond {self.recovery_scan_limit} entries was not searched"
+                )
+            return [j for j in jobs if j["broadcast_ref"] not in refs]
+
+        return [j for j in jobs if j["broadcast_ref"] not in found]
+
+    def find_sends(self, refs: set[str], since: float) -> tuple[dict, bool]:
+        """
+        Page backwards through the wallet's transactions for sends tagged with one
+        of refs (blocking). Returns ({ref: txid}, complete), where complete means
+        the scan reached transactions older than since or the start of history.
+        """
+        found = {}
+        skip = 0
+        while skip < self.recovery_scan_limit:
+            page = rpc.listtransactions("*", RECOVERY_PAGE_SIZE, skip)
+            for tx in page:
+                if tx.get("category") == "send" and tx.get("comment") in refs:
+                    found[tx["comment"]] = tx["txid"]
+            if len(page) < RECOVERY_PAGE_SIZE or min(tx.get("time", 0) for tx in page) < since:
+                return found, True
+            skip += RECOVERY_PAGE_SIZE
+        return found, False
+
+    async def broadcast(self, jobs: list[dict]):
+        txfee = mysql.txfee
+        job_ids = [j["id"] for j in jobs]
+
+        if len(jobs) == 1:
+            ref = f"withdrawal:{jobs[0]['id']}"
+        else:
+            ref = f"withdrawal-batch:{uuid.uuid4().hex}"
+        mysql.mark_withdrawals_broadcasting(job_ids, ref)
+
+        # sendmany takes one output per address, so merge repeat destinations
+        outputs: dict[str, Amount] = {}
+        for job in jobs:
+            outputs[job["address"]] = outputs.get(job["address"], ZERO) + job["amount"] - txfee
+
+        try:
+            await asyncio.to_thread(rpc.settxfee, txfee)
+            if len(jobs) == 1:
+                txid = await asyncio.to_thread(
+                    rpc.sendtoaddress, jobs[0]["address"], outputs[jobs[0]["address"]], ref
+                )
+            else:
+                txid = await asyncio.to_thread(rpc.sendmany, outputs, 1, ref)
+            error = None if txid else "Wallet returned no txid"
+        except Exception as e:
+            txid = None
+            error = f"{type(e).__name__}: {e}"
+
+        if not txid:
+            # Back off exponentially; recover_broadcasts checks the wallet before the next attempt
+            attempts = max(j["attempts"] for j in jobs) + 1
+            mysql.defer_withdrawals(job_ids, error, self.retry_base_seconds * 2 ** (attempts - 1))
+            output.error(f"Withdrawal broadcast {ref} failed (attempt {attempts}): {error}")
+            return
+
+        mysql.mark_withdrawals_broadcast(job_ids, txid)
+        output.info(f"Broadcast {len(jobs)} withdrawal(s) in {txid}")
+
+        for job in jobs:
+            await self.notify_withdrawal(job, txid)
+
+    async def confirm_broadcast(self):
+        for txid in mysql.fetch_broadcast_txids(50):
+            try:
+                tx = await asyncio.to_thread(rpc.gettransaction, txid)
+            except Exception as e:
+                output.warning(f"Could not check withdrawal tx {txid}: {type(e).__name__}: {e}")
+                return
+
+            if tx.get("confirmations", 0) >= self.min_confirmations:
+                mysql.confirm_withdrawals(txid)
+
+    async def notify_withdrawal(self, withdrawal: dict, txid: str | None, refunded: bool = True):
+        """DM the result. refunded=False for jobs that failed to reserve, so were never debited."""
+        try:
+            user = await self.bot.fetch_user(int(withdrawal["snowflake_fk"]))
+        except discord.HTTPException:
+            return
+
+        if txid:
+            embed = discord.Embed(
+                title="✅ Withdrawal Sent",
+                color=discord.Color.green(),
+                timestamp=datetime.utcnow()
+            )
+            embed.add_field(name="Job ID", value=f"`{withdrawal['id']}`", inline=False)
+            embed.add_field(name="Amount", value=f"{withdrawal['amount']:.8f} MWC", inline=False)
+            embed.add_field(name="To Address", value=f"`{withdrawal['address']}`", inline=False)
+            embed.add_field(
+                name="Transaction ID",
+                value=f"[{txid}]({EXPLORER_TX_URL.format(txid)})",
+                inline=False
+            )
+        else:
+            if refunded:
+                description = "Your balance has been refunded. Please try again later or contact support."
+            else:
+                description = f"{withdrawal['last_error']}. Nothing was deducted from your balance."
+            embed = discord.Embed(
+                title="❌ Withdrawal Failed",
+                description=description,
+                color=discord.Color.red(),
+                timestamp=datetime.utcnow()
+            )
+            embed.add_field(name="Job ID", value=f"`{withdrawal['id']}`", inline=False)
+            embed.add_field(name="Amount", value=f"{withdrawal['amount']:.8f} MWC", inline=False)
+
+        try:
+            await user.send(embed=embed)
+        except discord.HTTPException:
+            output.warning(f"Could not DM withdrawal {withdrawal['id']} result to {user}")
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Withdraw(bot))
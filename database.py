@@ -11,13 +11,22 @@ except KeyError:
 db_user = config["db_user"]
 db_pass = config["db_pass"]
 db = config["db"]
-connection = pymysql.connect(
-    host=host,
-    port=port,
-    user=db_user,
-    password=db_pass,
-    db=db)
-cursor = connection.cursor(pymysql.cursors.DictCursor)
+# Opened by connect() so importing this module does no I/O
+connection = None
+cursor = None
+
+
+def connect():
+    global connection, cursor
+    if connection is None:
+        connection = pymysql.connect(
+            host=host,
+            port=port,
+            user=db_user,
+            password=db_pass,
+            db=db)
+        cursor = connection.cursor(pymysql.cursors.DictCursor)
+    return cursor
 
 #cursor.execute("DROP DATABASE IF EXISTS {};".format(database))
 #cursor.execute("CREATE DATABASE IF NOT EXISTS {};".format(database))
@@ -26,7 +35,100 @@ cursor = connection.cursor(pymysql.cursors.DictCursor)
 #cursor.execute("USE {};".format(database))
 
 
+def to_satoshis(table: str, columns: dict[str, str]) -> list[str]:
+    """
+    Statements converting DECIMAL coin columns to BIGINT satoshis. Values are
+    copied into new columns rather than scaled in place, so a rerun after a
+    partial failure stops at the ADD COLUMN instead of multiplying twice.
+    """
+    return [
+        f"ALTER TABLE {table} "
+        + ", ".join(f"ADD COLUMN {c}_sat BIGINT {spec} AFTER {c}" for c, spec in columns.items()),
+        f"UPDATE {table} SET " + ", ".join(f"{c}_sat = {c} * 100000000" for c in columns),
+        f"ALTER TABLE {table} " + ", ".join(f"DROP COLUMN {c}" for c in columns),
+        f"ALTER TABLE {table} "
+        + ", ".join(f"CHANGE COLUMN {c}_sat {c} BIGINT {spec}" for c, spec in columns.items()),
+    ]
+
+
+# Schema changes applied on top of the base tables, in order. Each entry is
+# (version, [statements]); applied versions are recorded in schema_version.
+MIGRATIONS = [
+    (1, [
+        """
+        ALTER TABLE withdrawal
+            ADD COLUMN address VARCHAR(128) DEFAULT NULL AFTER amount,
+            ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'SENT' AFTER txid,
+            MODIFY txid VARCHAR(256) DEFAULT NULL,
+            DROP INDEX uq_withdraw_txid,
+            ADD KEY idx_withdraw_txid (txid),
+            ADD KEY idx_withdraw_status (status)
+        """,
+    ]),
+    (2, [
+        """
+        ALTER TABLE withdrawal
+            ADD COLUMN idempotency_key VARCHAR(64) DEFAULT NULL AFTER id,
+            ADD COLUMN broadcast_ref VARCHAR(64) DEFAULT NULL AFTER txid,
+            ADD COLUMN attempts INT UNSIGNED NOT NULL DEFAULT 0 AFTER status,
+            ADD COLUMN last_error VARCHAR(255) DEFAULT NULL AFTER attempts,
+            ADD COLUMN next_attempt_at DATETIME DEFAULT NULL AFTER last_error,
+            ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            ALTER COLUMN status SET DEFAULT 'REQUESTED',
+            ADD UNIQUE KEY uq_withdraw_idempotency (idempotency_key)
+        """,
+        "UPDATE withdrawal SET status = 'RESERVED' WHERE status = 'PENDING'",
+        "UPDATE withdrawal SET status = 'BROADCAST' WHERE status = 'SENT'",
+    ]),
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS job_lease (
+            name VARCHAR(64) NOT NULL,
+            owner VARCHAR(128) NOT NULL,
+            expires_at DATETIME NOT NULL,
+            PRIMARY KEY (name)
+        )
+        """,
+    ]),
+    (4, [
+        "ALTER TABLE users ADD KEY idx_users_allow_soak (allow_soak)",
+    ]),
+    (5, [
+        *to_satoshis("users", {"balance": "NOT NULL DEFAULT 0", "balance_unconfirmed": "NOT NULL DEFAULT 0"}),
+        *to_satoshis("deposit", {"amount": "NOT NULL"}),
+        *to_satoshis("withdrawal", {"amount": "NOT NULL"}),
+        *to_satoshis("tip", {"amount": "NOT NULL"}),
+        *to_satoshis("airdrops", {"amount": "NOT NULL"}),
+    ]),
+    (6, [
+        "ALTER TABLE airdrops ADD COLUMN message_id BIGINT UNSIGNED DEFAULT NULL AFTER channel_id",
+    ]),
+]
+
+
+def migrate():
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT UNSIGNED NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version)
+    )
+    """)
+    cursor.execute("SELECT version FROM schema_version")
+    applied = {row["version"] for row in cursor.fetchall()}
+
+    for version, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_version (version) VALUES (%s)", (version,))
+        connection.commit()
+        output.info(f"Applied database migration {version}")
+
+
 def run():
+    connect()
     with warnings.catch_warnings():
         warnings.simplefilter('ignore')
 
@@ -133,3 +235,5 @@ def run():
         """)
 
         connection.commit()
+
+        migrate()
@@ -1 +1 @@
-__ALL__ = ['checks', 'db_actions', 'mysql_module', 'output', 'parsing', 'rpc_module']
\ No newline at end of file
+__ALL__ = ['addresses', 'amount', 'checks', 'command_sync', 'db_actions', 'leader', 'market', 'member_cache', 'member_snapshot', 'metrics', 'mysql_module', 'output', 'parsing', 'query_log', 'rpc_module', 'snowflakes', 'startup', 'tip_batcher']
@@ -0,0 +1,144 @@
+import functools
+import hashlib
+from typing import Optional
+
+from utils import parsing, rpc_module
+
+rpc = rpc_module.Rpc()
+config = parsing.parse_json("config.json").get("address", {})
+
+# Allowed base58check version bytes (P2PKH / P2SH). Empty = accept any version.
+BASE58_VERSIONS = set(config.get("base58_versions", []))
+# Human-readable part for bech32 segwit addresses. None = any HRP whose checksum verifies
+BECH32_HRP = config.get("bech32_hrp")
+VALIDATE_CACHE_SIZE = config.get("validate_cache_size", 4096)
+
+B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+B58_INDEX = {c: i for i, c in enumerate(B58_ALPHABET)}
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+
+
+# =====================
+# BASE58CHECK
+# =====================
+def b58decode_check(address: str) -> Optional[bytes]:
+    """Decode a base58check string and return its payload, or None if malformed."""
+    n = 0
+    for c in address:
+        digit = B58_INDEX.get(c)
+        if digit is None:
+            return None
+        n = n * 58 + digit
+
+    raw = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    raw = b"\0" * (len(address) - len(address.lstrip("1"))) + raw
+    if len(raw) < 5:
+        return None
+
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        return None
+    return payload
+
+
+def is_base58_address(address: str) -> bool:
+    payload = b58decode_check(address)
+    if payload is None or len(payload) != 21:  # version byte + hash160
+        return False
+    return not BASE58_VERSIONS or payload[0] in BASE58_VERSIONS
+
+
+# =====================
+# BECH32 / BECH32M (BIP173, BIP350)
+# =====================
+def _bech32_polymod(values) -> int:
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def _hrp_expand(hrp: str) -> list[int]:
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def _convertbits(data, frombits: int, tobits: int) -> Optional[list[int]]:
+    acc = 0
+    bits = 0
+    ret = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            ret.append((acc >> bits) & maxv)
+    if bits >= frombits or ((acc << (tobits - bits)) & maxv):
+        return None
+    return ret
+
+
+def is_bech32_address(address: str, hrp: Optional[str] = BECH32_HRP) -> bool:
+    """
+    Full BIP173/BIP350 check. With no hrp any human-readable part is
+    accepted; the checksum covers it, so typos are still caught.
+    """
+    if not address.isascii():
+        return False
+    if address.lower() != address and address.upper() != address:
+        return False
+    address = address.lower()
+
+    pos = address.rfind("1")
+    if pos < 1 or pos + 7 > len(address) or len(address) > 90:
+        return False
+    if any(not 33 <= ord(c) <= 126 for c in address[:pos]):
+        return False
+    if hrp and address[:pos] != hrp.lower():
+        return False
+    if any(c not in BECH32_CHARSET for c in address[pos + 1:]):
+        return False
+
+    data = [BECH32_CHARSET.find(c) for c in address[pos + 1:]]
+    const = _bech32_polymod(_hrp_expand(address[:pos]) + data)
+    if const not in (BECH32_CONST, BECH32M_CONST):
+        return False
+
+    witness_version = data[0]
+    program = _convertbits(data[1:-6], 5, 8)
+    if witness_version > 16 or program is None or not 2 <= len(program) <= 40:
+        return False
+    if witness_version == 0:
+        return const == BECH32_CONST and len(program) in (20, 32)
+    return const == BECH32M_CONST
+
+
+# =====================
+# PUBLIC
+# =====================
+def is_well_formed(address: str) -> bool:
+    """Local format check; no RPC."""
+    return is_base58_address(address) or is_bech32_address(address)
+
+
+@functools.lru_cache(maxsize=VALIDATE_CACHE_SIZE)
+def _daemon_validate(address: str) -> dict:
+    # Errors are raised, not cached, so a wallet outage is retried next time
+    return rpc.validateaddress(address)
+
+
+def is_valid(address: str) -> bool:
+    """
+    Reject malformed addresses locally, then confirm with the daemon.
+    Daemon answers are cached per address.
+    """
+    if not is_well_formed(address):
+        return False
+    return bool(_daemon_validate(address).get("isvalid"))
@@ -0,0 +1,185 @@
+from decimal import Decimal, InvalidOperation, ROUND_DOWN
+from typing import Iterable
+
+import discord
+from discord import app_commands
+
+COIN = 100_000_000  # satoshis per MWC
+SATOSHI = Decimal("0.00000001")
+MAX_SATS = 2 ** 63 - 1  # largest amount a BIGINT column holds
+
+
+class Amount:
+    """
+    An MWC amount held as a whole number of satoshis. Arithmetic stays in
+    integers; Decimal appears only when parsing and formatting. Amounts only
+    compare and add with other Amounts, so a stray float or coin-denominated
+    config value fails loudly instead of being read as satoshis.
+    """
+    __slots__ = ("sats",)
+
+    def __init__(self, sats: int = 0):
+        if isinstance(sats, bool) or not isinstance(sats, int):
+            raise TypeError(f"Amount takes integer satoshis, not {type(sats).__name__}")
+        self.sats = sats
+
+    @classmethod
+    def from_coins(cls, value) -> "Amount":
+        """
+        Parse a coin value (str, Decimal, int or float), rounding down to a
+        satoshi. Raises ValueError for anything that is not a number or does
+        not fit a BIGINT of satoshis.
+        """
+        if isinstance(value, Amount):
+            return value
+        if isinstance(value, float):
+            # repr gives the shortest decimal that round-trips, e.g. 0.1 rather than 0.1000000000000000055...
+            value = repr(value)
+        try:
+            coins = Decimal(value)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValueError(f"Invalid amount: {value!r}")
+        if not coins.is_finite():
+            raise ValueError(f"Invalid amount: {value!r}")
+        # Checked before quantize, which raises InvalidOperation past the context precision
+        if abs(coins) * COIN > MAX_SATS:
+            raise ValueError(f"Amount out of range: {value!r}")
+        return cls(int(coins.quantize(SATOSHI, rounding=ROUND_DOWN) * COIN))
+
+    @property
+    def coins(self) -> Decimal:
+        return Decimal(self.sats).scaleb(-8)
+
+    # =========================
+    # ARITHMETIC
+    # =========================
+    def __add__(self, other: "Amount") -> "Amount":
+        if not isinstance(other, Amount):
+            return NotImplemented
+        return Amount(self.sats + other.sats)
+
+    def __radd__(self, other) -> "Amount":
+        # Lets sum() start from its default 0
+        if other == 0 and isinstance(other, int):
+            return self
+        return NotImplemented
+
+    def __sub__(self, other: "Amount") -> "Amount":
+        if not isinstance(other, Amount):
+            return NotImplemented
+        return Amount(self.sats - other.sats)
+
+    def __mul__(self, count: int) -> "Amount":
+        if isinstance(count, bool) or not isinstance(count, int):
+            return NotImplemented
+        return Amount(self.sats * count)
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> "Amount":
+        return Amount(-self.sats)
+
+    def split(self, parts: int) -> tuple["Amount", int]:
+        """
+        Divide into parts with nothing lost: (share, remainder), where every
+        part gets share and the first remainder parts one satoshi more.
+        """
+        if parts <= 0:
+            raise ValueError("Cannot split an amount into no parts")
+        share, remainder = divmod(self.sats, parts)
+        return Amount(share), remainder
+
+    # =========================
+    # COMPARISON
+    # =========================
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Amount) and self.sats == other.sats
+
+    def __hash__(self) -> int:
+        return hash(self.sats)
+
+    def __lt__(self, other: "Amount") -> bool:
+        if not isinstance(other, Amount):
+            return NotImplemented
+        return self.sats < other.sats
+
+    def __le__(self, other: "Amount") -> bool:
+        if not isinstance(other, Amount):
+            return NotImplemented
+        return self.sats <= other.sats
+
+    def __gt__(self, other: "Amount") -> bool:
+        if not isinstance(other, Amount):
+            return NotImplemented
+        return self.sats > other.sats
+
+    def __ge__(self, other: "Amount") -> bool:
+        if not isinstance(other, Amount):
+            return NotImplemented
+        return self.sats >= other.sats
+
+    def __bool__(self) -> bool:
+        return self.sats != 0
+
+    # =========================
+    # FORMATTING
+    # =========================
+    def __str__(self) -> str:
+        sign = "-" if self.sats < 0 else ""
+        whole, frac = divmod(abs(self.sats), COIN)
+        return f"{sign}{whole}.{frac:08d}"
+
+    def __format__(self, spec: str) -> str:
+        return format(self.coins, spec) if spec else str(self)
+
+    def __repr__(self) -> str:
+        return f"Amount({self.sats})"
+
+
+ZERO = Amount(0)
+
+# A transfer as (amount each, recipients): every listed recipient receives that amount
+Payout = tuple[Amount, list[int]]
+
+
+def pay_each(amount_each: Amount, recipients: Iterable[int]) -> list[Payout]:
+    """Every recipient (de-duplicated) receives amount_each."""
+    return [(amount_each, sorted(set(int(r) for r in recipients)))]
+
+
+def pay_split(total: Amount, recipients: Iterable[int]) -> list[Payout]:
+    """
+    total divided exactly between the recipients. In ascending ID order the
+    first total % n recipients receive one satoshi more than the rest, so the
+    same inputs always produce the same payouts.
+    """
+    recipients = sorted(set(int(r) for r in recipients))
+    if not recipients:
+        return []
+    share, remainder = total.split(len(recipients))
+    payouts = [(share + Amount(1), recipients[:remainder]), (share, recipients[remainder:])]
+    return [(amount, ids) for amount, ids in payouts if ids]
+
+
+def payout_total(payouts: list[Payout]) -> Amount:
+    return sum((amount * len(ids) for amount, ids in payouts), ZERO)
+
+
+class AmountTransformer(app_commands.Transformer):
+    """Slash command option typed as text so amounts arrive exactly as entered, not as floats."""
+
+    @property
+    def type(self) -> discord.AppCommandOptionType:
+        return discord.AppCommandOptionType.string
+
+    async def transform(self, interaction: discord.Interaction, value: str) -> Amount:
+        try:
+            coins = Decimal(value.strip())
+        except InvalidOperation:
+            raise app_commands.TransformerError(value, self.type, self)
+        if not coins.is_finite() or coins.as_tuple().exponent < -8:
+            raise app_commands.TransformerError(value, self.type, self)
+        try:
+            return Amount.from_coins(coins)
+        except ValueError:
+            raise app_commands.TransformerError(value, self.type, self)
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+import discord
+
+from utils import parsing, output
+
+config = parsing.parse_json("config.json").get("command_sync", {})
+
+# "auto" syncs only when the schema hash changed, "always" / "never" force it
+MODE = config.get("mode", "auto")
+# Non-empty: copy the global commands into these guilds and sync there instead (instant, for development)
+GUILD_IDS = [int(g) for g in config.get("guild_ids", [])]
+STATE_FILE = config.get("state_file", "command_sync.json")
+
+
+def schema_hash(tree: discord.app_commands.CommandTree, guild: discord.abc.Snowflake = None) -> str:
+    """Stable hash of the payload tree.sync() would upload for this scope."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda c: (c.get("type", 1), c["name"])
+    )
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def load_state() -> dict:
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict):
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, STATE_FILE)
+
+
+async def sync_tree(tree: discord.app_commands.CommandTree, application_id: int) -> list:
+    """
+    Sync each scope (global, or every configured dev guild) whose schema hash
+    differs from the last successful sync by this application. Returns the
+    scopes that were synced.
+    """
+    if MODE == "never":
+        output.info("Slash command sync disabled")
+        return []
+
+    scopes = []
+    if GUILD_IDS:
+        for guild_id in GUILD_IDS:
+            guild = discord.Object(id=guild_id)
+            tree.copy_global_to(guild=guild)
+            scopes.append((f"guild:{guild_id}", guild))
+    else:
+        scopes.append(("global", None))
+
+    state = load_state()
+    synced = []
+    for scope, guild in scopes:
+        key = f"{application_id}:{scope}"
+        digest = schema_hash(tree, guild)
+        if MODE != "always" and state.get(key) == digest:
+            output.info(f"Slash commands unchanged for {scope}, skipping sync")
+            continue
+
+        await tree.sync(guild=guild)
+        state[key] = digest
+        synced.append(scope)
+        output.success(f"Slash commands synced for {scope}")
+
+    if synced:
+        try:
+            save_state(state)
+        except OSError as e:
+            output.warning(f"Could not save command sync state: {e}")
+    return synced
@@ -0,0 +1,69 @@
+import os
+import socket
+import time
+import uuid
+
+from utils import parsing, output, mysql_module
+
+config = parsing.parse_json("config.json").get("leader", {})
+
+LEASE_SECONDS = config.get("lease_seconds", 15)
+RENEW_SECONDS = config.get("renew_seconds", 5)
+
+# Background jobs that must run in exactly one bot process
+JOBS = ("airdrops", "deposits", "withdrawals")
+
+
+class Leadership:
+    """
+    Lease-row leader election, one lease per singleton job. A process owns a
+    job while its lease in job_lease is unexpired; renewing every
+    RENEW_SECONDS keeps it, and a crashed owner is replaced once its lease
+    lapses. Leases are released on shutdown so failover is immediate.
+    """
+
+    def __init__(self, jobs=JOBS, lease_seconds: int = LEASE_SECONDS):
+        self.jobs = tuple(jobs)
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._renewed_at: dict[str, float] = {}  # job -> monotonic time of last successful renewal
+
+    def renew(self):
+        """Acquire or extend every job's lease. Safe to call from any number of processes."""
+        mysql = mysql_module.Mysql()
+        for job in self.jobs:
+            was_leader = self.is_leader(job)
+            try:
+                held = mysql.acquire_lease(job, self.owner, self.lease_seconds)
+            except Exception as e:
+                # Keep acting until our lease would have lapsed anyway
+                output.warning(f"Could not renew {job} lease: {type(e).__name__}: {e}")
+                held = None
+
+            if held:
+                self._renewed_at[job] = time.monotonic()
+            elif held is False:
+                self._renewed_at.pop(job, None)
+
+            if held and not was_leader:
+                output.success(f"Leader for {job} ({self.owner})")
+            elif was_leader and not self.is_leader(job):
+                output.warning(f"Lost leadership of {job}")
+
+    def is_leader(self, job: str) -> bool:
+        """
+        True while our last successful renewal is younger than the lease, so a
+        process that cannot reach the DB stops acting before another takes over.
+        """
+        renewed_at = self._renewed_at.get(job)
+        return renewed_at is not None and time.monotonic() - renewed_at < self.lease_seconds
+
+    def release(self):
+        try:
+            mysql_module.Mysql().release_leases(self.owner)
+        except Exception as e:
+            output.warning(f"Could not release leases: {type(e).__name__}: {e}")
+        self._renewed_at.clear()
+
+
+leadership = Leadership()
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Optional
+
+import aiohttp
+
+from utils import parsing, output
+
+config = parsing.parse_json("config.json").get("market", {})
+
+COINPAPRIKA_ID = "mwc-minersworldcoin"
+TICKER_URL = f"https://api.coinpaprika.com/v1/tickers/{COINPAPRIKA_ID}"
+CHAIN_INFO_URL = "https://api.minersworld.org/info"
+BMINE_STATS_URL = "https://bmine.net/api/stats"
+SATOSHIS = Decimal("100000000")
+
+POLL_INTERVAL_SECONDS = config.get("poll_interval_seconds", 60)
+HISTORY_SIZE = config.get("history_size", 1440)  # one day at the default interval
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class RingBuffer:
+    """Fixed-size (timestamp, value) series; the oldest sample is dropped when full."""
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        self.samples = deque(maxlen=size)
+
+    def append(self, value, timestamp: float = None):
+        self.samples.append((timestamp or time.time(), value))
+
+    def latest(self):
+        return self.samples[-1][1] if self.samples else None
+
+    def at_or_before(self, age_seconds: float):
+        """Newest value at least age_seconds old, or the oldest sample if history is shorter."""
+        if not self.samples:
+            return None
+        cutoff = time.time() - age_seconds
+        for timestamp, value in reversed(self.samples):
+            if timestamp <= cutoff:
+                return value
+        return self.samples[0][1]
+
+    def values(self, since_seconds: float = None) -> list:
+        if since_seconds is None:
+            return [v for _, v in self.samples]
+        cutoff = time.time() - since_seconds
+        return [v for t, v in self.samples if t >= cutoff]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+series = {
+    name: RingBuffer()
+    for name in ("price", "volume_24h", "supply", "pool_hashrate", "pool_workers")
+}
+# Latest non-series fields (rank, pool details), with the time they were collected
+latest: dict = {}
+updated_at: dict[str, float] = {}
+
+
+# =====================
+# COLLECTION
+# =====================
+async def _get_json(session: aiohttp.ClientSession, url: str, **kwargs):
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=10), **kwargs) as resp:
+        resp.raise_for_status()
+        return await resp.json(content_type=None)
+
+
+async def collect_ticker(session: aiohttp.ClientSession):
+    data = await _get_json(session, TICKER_URL)
+    usd = data["quotes"]["USD"]
+    series["price"].append(Decimal(str(usd["price"])))
+    series["volume_24h"].append(Decimal(str(usd["volume_24h"])))
+    latest["rank"] = data.get("rank", "?")
+    updated_at["ticker"] = time.time()
+
+
+async def collect_supply(session: aiohttp.ClientSession):
+    data = await _get_json(session, CHAIN_INFO_URL)
+    series["supply"].append(Decimal(str(data["result"]["supply"])) / SATOSHIS)
+    updated_at["supply"] = time.time()
+
+
+async def collect_pool(session: aiohttp.ClientSession):
+    data = await _get_json(session, BMINE_STATS_URL, headers={"user-agent": "Mozilla/5.0"})
+    mwc = data.get("pools", {}).get("minersworldcoin")
+    if not mwc:
+        latest["pool"] = None
+        return
+
+    pool_stats = mwc.get("poolStats", {})
+    blocks = mwc.get("blocks", {})
+    latest["pool"] = {
+        "workers": mwc.get("workerCount", 0),
+        "hashrate": mwc.get("hashrate", 0),
+        "shares": pool_stats.get("validShares", 0),
+        "blocks_24h": blocks.get("confirmed", 0),
+        "last_block": pool_stats.get("networkBlocks", "?"),
+        "time_since_last": mwc.get("maxRoundTime", 0) / 60
+    }
+    series["pool_hashrate"].append(float(latest["pool"]["hashrate"]))
+    series["pool_workers"].append(latest["pool"]["workers"])
+    updated_at["pool"] = time.time()
+
+
+async def poll(session: aiohttp.ClientSession):
+    """Poll every source once. A failing source keeps its last good data."""
+    results = await asyncio.gather(
+        collect_ticker(session),
+        collect_supply(session),
+        collect_pool(session),
+        return_exceptions=True
+    )
+    for name, result in zip(("ticker", "supply", "pool"), results):
+        if isinstance(result, Exception):
+            output.warning(f"Market collector: {name} poll failed ({type(result).__name__}: {result})")
+
+
+# =====================
+# READERS
+# =====================
+def price_usd() -> Optional[Decimal]:
+    return series["price"].latest()
+
+
+def delta(name: str, seconds: float) -> Optional[tuple]:
+    """(absolute change, percent change) of a series over the last `seconds`."""
+    buffer = series[name]
+    if len(buffer) < 2:
+        return None
+    now, then = buffer.latest(), buffer.at_or_before(seconds)
+    if not then:
+        return None
+    return now - then, (now - then) / then * 100
+
+
+def sparkline(name: str, since_seconds: float = None, width: int = 24) -> str:
+    values = [float(v) for v in series[name].values(since_seconds)]
+    if len(values) < 2:
+        return ""
+
+    # Downsample to at most `width` points by taking evenly spaced samples
+    if len(values) > width:
+        step = (len(values) - 1) / (width - 1)
+        values = [values[round(i * step)] for i in range(width)]
+
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[round((v - low) * scale)] for v in values)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import discord
+
+from utils import parsing, output, member_snapshot
+
+config = parsing.parse_json("config.json").get("member_cache", {})
+
+# "startup": discord.py's default, every guild is chunked before READY
+# "background": guilds are chunked one at a time after READY
+# "lazy": a guild is chunked the first time soak, a role tip or an airdrop needs it
+CHUNK_POLICY = config.get("chunk_policy", "startup")
+if CHUNK_POLICY == "startup" and member_snapshot.ENABLED:
+    # Waiting for every chunk before READY would defeat the warm start
+    CHUNK_POLICY = "background"
+
+# MemberCacheFlags names ("joined", "voice") or "all" / "none"
+CACHE_FLAGS = config.get("cache_flags", "all")
+# Lazy policy only: drop member lists of guilds no command has needed for this long (0 = never)
+EVICT_IDLE_SECONDS = config.get("evict_idle_seconds", 0)
+EVICT_INTERVAL_SECONDS = config.get("evict_interval_seconds", 300)
+
+
+def cache_flags() -> discord.MemberCacheFlags:
+    if CACHE_FLAGS in ("all", "none"):
+        return getattr(discord.MemberCacheFlags, CACHE_FLAGS)()
+    return discord.MemberCacheFlags(**{name: True for name in CACHE_FLAGS})
+
+
+class MemberCache:
+    """
+    Tracks which guilds have a complete member list and chunks the rest on
+    demand. Concurrent callers for the same guild share one chunk request.
+    """
+
+    def __init__(self):
+        self.chunked_at: dict[int, float] = {}  # guild_id -> monotonic time of our last chunk
+        self.last_used: dict[int, float] = {}  # guild_id -> monotonic time a command last needed it
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def is_complete(self, guild: discord.Guild) -> bool:
+        if member_snapshot.snapshot.is_warm(guild):
+            return False
+        return guild.id in self.chunked_at or guild.chunked
+
+    async def ensure_chunked(self, guild: discord.Guild, touch: bool = True) -> discord.Guild:
+        """Make guild.members complete, chunking it now if needed."""
+        if touch:
+            self.last_used[guild.id] = time.monotonic()
+        if self.is_complete(guild):
+            return guild
+
+        async with self._locks.setdefault(guild.id, asyncio.Lock()):
+            if self.is_complete(guild):
+                return guild
+            started = time.perf_counter()
+            await guild.chunk()
+            self.chunked_at[guild.id] = time.monotonic()
+            stale = member_snapshot.snapshot.chunked(guild)
+            output.info(
+                f"Chunked {guild.name}: {guild.member_count} members in "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms"
+                + (f", dropped {stale} departed" if stale else "")
+            )
+        return guild
+
+    async def resolve(self, guild: discord.Guild, member_ids: list[int]) -> list[discord.Member]:
+        """Members by ID, asking the gateway only for those not cached."""
+        found = {mid: m for mid in member_ids if (m := guild.get_member(mid)) is not None}
+        missing = [mid for mid in member_ids if mid not in found]
+        if missing and not self.is_complete(guild):
+            for i in range(0, len(missing), 100):
+                for member in await guild.query_members(user_ids=missing[i:i + 100], cache=True):
+                    found[member.id] = member
+        return [found[mid] for mid in member_ids if mid in found]
+
+    def evict_idle(self, guilds, idle_seconds: float = EVICT_IDLE_SECONDS) -> int:
+        """Empty the member cache of guilds not needed for idle_seconds. Returns members dropped."""
+        if not idle_seconds:
+            return 0
+        cutoff = time.monotonic() - idle_seconds
+        dropped = 0
+        for guild in guilds:
+            if self.last_used.get(guild.id, 0) > cutoff or guild.id not in self.chunked_at:
+                continue
+            lock = self._locks.get(guild.id)
+            if lock and lock.locked():
+                continue
+            me = guild.me
+            for member in list(guild._members.values()):
+                if me is None or member.id != me.id:
+                    guild._remove_member(member)
+                    dropped += 1
+            del self.chunked_at[guild.id]
+            self.last_used.pop(guild.id, None)
+        return dropped
+
+
+guild_members = MemberCache()
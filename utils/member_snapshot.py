@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+import time
+
+import discord
+
+from utils import parsing, output
+
+config = parsing.parse_json("config.json").get("gateway", {})
+
+ENABLED = config.get("member_snapshot", False)
+SNAPSHOT_FILE = config.get("snapshot_file", "member_snapshot.json.gz")
+SNAPSHOT_INTERVAL_SECONDS = config.get("snapshot_interval_seconds", 600)
+MAX_AGE_SECONDS = config.get("snapshot_max_age_seconds", 86400)
+
+
+def _row(member: discord.Member) -> list:
+    user = member._user
+    return [member.id, user.name, user.global_name, user._avatar, user.bot, member.nick, member._roles.tolist()]
+
+
+def _payload(row: list) -> dict:
+    """Rebuild the gateway member payload discord.Member is constructed from."""
+    member_id, name, global_name, avatar, bot, nick, roles = row
+    return {
+        "user": {
+            "id": member_id,
+            "username": name,
+            "discriminator": "0",
+            "global_name": global_name,
+            "avatar": avatar,
+            "bot": bot,
+        },
+        "roles": roles,
+        "nick": nick,
+        "flags": 0,
+    }
+
+
+class MemberSnapshot:
+    """
+    Local copy of every guild's member list, written on shutdown and every
+    SNAPSHOT_INTERVAL_SECONDS. On the next start each guild's cache is filled
+    from it as soon as the guild becomes available, so member lists work
+    before chunking finishes. Presence is not stored; everyone starts offline.
+
+    Restored members are remembered until the guild has been chunked, then any
+    that chunking did not replace (they left while we were down) are dropped.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_FILE, max_age: float = MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age = max_age
+        self._rows: dict[int, list] = {}  # guild_id -> rows, until restored
+        self._restored: dict[int, list] = {}  # guild_id -> Member objects from the snapshot
+
+    # =========================
+    # SAVE
+    # =========================
+    def capture(self, guilds) -> dict:
+        """Copy member rows out of the cache; cheap enough to run on the event loop."""
+        return {
+            "saved_at": time.time(),
+            "guilds": {str(guild.id): [_row(m) for m in guild.members] for guild in guilds},
+        }
+
+    def write(self, data: dict):
+        """Compress and atomically replace the snapshot file (blocking)."""
+        tmp = self.path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=3) as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    # =========================
+    # RESTORE
+    # =========================
+    def load(self) -> int:
+        """Read the snapshot into memory (blocking). Returns the number of member rows."""
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            output.warning(f"Ignoring unreadable member snapshot: {e}")
+            return 0
+
+        age = time.time() - data.get("saved_at", 0)
+        if age > self.max_age:
+            output.info(f"Member snapshot is {age / 3600:.1f}h old, not using it")
+            return 0
+
+        self._rows = {int(gid): rows for gid, rows in data.get("guilds", {}).items()}
+        count = sum(len(rows) for rows in self._rows.values())
+        output.info(f"Loaded member snapshot: {count} members in {len(self._rows)} guild(s), {age:.0f}s old")
+        return count
+
+    def restore(self, guild: discord.Guild) -> int:
+        """Fill a guild's member cache from the snapshot without touching members already cached."""
+        rows = self._rows.pop(guild.id, None)
+        if not rows:
+            return 0
+
+        state = guild._state
+        restored = []
+        for row in rows:
+            if guild._members.get(row[0]) is not None:
+                continue
+            member = discord.Member(data=_payload(row), guild=guild, state=state)
+            guild._add_member(member)
+            restored.append(member)
+        self._restored[guild.id] = restored
+        return len(restored)
+
+    def is_warm(self, guild: discord.Guild) -> bool:
+        """True while the guild's cache holds snapshot members that chunking has not confirmed."""
+        return guild.id in self._restored
+
+    def chunked(self, guild: discord.Guild) -> int:
+        """Drop snapshot members the completed chunk did not replace. Returns how many."""
+        stale = [m for m in self._restored.pop(guild.id, []) if guild._members.get(m.id) is m]
+        for member in stale:
+            guild._remove_member(member)
+        return len(stale)
+
+
+snapshot = MemberSnapshot()
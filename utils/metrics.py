@@ -0,0 +1,249 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from aiohttp import TraceConfig, web
+
+# Upper bounds in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Slash command or loop currently running in this task, for attributing DB work
+current_command = contextvars.ContextVar("current_command", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, safe to observe from worker threads."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+            self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1)."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank:
+                    return self.buckets[i] if i < len(self.buckets) else self.max
+            return self.max
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Family:
+    """A named metric with one child per combination of label values."""
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: tuple, factory):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def items(self):
+        return list(self._children.items())
+
+
+class Registry:
+    def __init__(self):
+        self.families: dict[str, Family] = {}
+
+    def _register(self, name, help, kind, labelnames, factory) -> Family:
+        if name not in self.families:
+            self.families[name] = Family(name, help, kind, tuple(labelnames), factory)
+        return self.families[name]
+
+    def counter(self, name: str, help: str, labelnames=()) -> Family:
+        return self._register(name, help, "counter", labelnames, Counter)
+
+    def gauge(self, name: str, help: str, labelnames=()) -> Family:
+        return self._register(name, help, "gauge", labelnames, Gauge)
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Family:
+        return self._register(name, help, "histogram", labelnames, lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = []
+        for family in self.families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in sorted(family.items()):
+                labels = dict(zip(family.labelnames, values))
+                if family.kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(child.buckets + (float("inf"),), child.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{family.name}_bucket{_labels({**labels, 'le': le})} {cumulative}")
+                    lines.append(f"{family.name}_sum{_labels(labels)} {child.sum}")
+                    lines.append(f"{family.name}_count{_labels(labels)} {child.count}")
+                else:
+                    lines.append(f"{family.name}{_labels(labels)} {child.value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+registry = Registry()
+
+COMMAND_DURATION = registry.histogram(
+    "mwcbot_command_duration_seconds", "Slash command handling time", ["command"]
+)
+COMMAND_TOTAL = registry.counter(
+    "mwcbot_commands_total", "Slash commands handled", ["command", "status"]
+)
+LOOP_DURATION = registry.histogram(
+    "mwcbot_loop_duration_seconds", "Background loop iteration time", ["loop"]
+)
+LOOP_ERRORS = registry.counter(
+    "mwcbot_loop_errors_total", "Background loop iterations that raised", ["loop"]
+)
+HTTP_DURATION = registry.histogram(
+    "mwcbot_http_client_duration_seconds", "Outbound HTTP request time", ["host"]
+)
+HTTP_TOTAL = registry.counter(
+    "mwcbot_http_client_requests_total", "Outbound HTTP requests", ["host", "status"]
+)
+
+
+# =====================
+# INSTRUMENTATION HELPERS
+# =====================
+@contextmanager
+def timer(duration: Family, errors: Family, *labels):
+    """Observe the block's duration; count it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors.labels(*labels).inc()
+        raise
+    finally:
+        duration.labels(*labels).observe(time.perf_counter() - start)
+
+
+def timed_loop(name: str):
+    """Decorator for tasks.loop bodies: records iteration time and errors."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = current_command.set(f"loop:{name}")
+            try:
+                with timer(LOOP_DURATION, LOOP_ERRORS, name):
+                    return await func(*args, **kwargs)
+            finally:
+                current_command.reset(token)
+        return wrapper
+    return decorator
+
+
+def instrument_methods(duration: Family, errors: Family):
+    """Class decorator timing every public synchronous method, labelled by method name."""
+    def decorator(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(func) or inspect.iscoroutinefunction(func):
+                continue
+            setattr(cls, name, _timed_method(func, duration, errors))
+        return cls
+    return decorator
+
+
+def _timed_method(func, duration: Family, errors: Family):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timer(duration, errors, func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def http_trace_config() -> TraceConfig:
+    """aiohttp TraceConfig recording per-host request time and status."""
+    async def on_request_start(session, ctx, params):
+        ctx.start = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        host = params.url.host
+        HTTP_DURATION.labels(host).observe(time.perf_counter() - ctx.start)
+        HTTP_TOTAL.labels(host, params.response.status).inc()
+
+    async def on_request_exception(session, ctx, params):
+        host = params.url.host
+        HTTP_DURATION.labels(host).observe(time.perf_counter() - ctx.start)
+        HTTP_TOTAL.labels(host, "error").inc()
+
+    trace_config = TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx: SimpleNamespace())
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+# =====================
+# HTTP ENDPOINT
+# =====================
+async def start_http_server(host: str, port: int) -> web.AppRunner:
+    """Serve /metrics in Prometheus text format. Bind to localhost unless scraped remotely."""
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -1,19 +1,33 @@
 import pymysql.cursors
 import discord
 from discord.abc import GuildChannel
-from utils import parsing, rpc_module
-from decimal import Decimal
+from utils import parsing, rpc_module, metrics, output
+from utils.query_log import InstrumentedCursor
+from utils.snowflakes import SnowflakeSet
+from utils.amount import Amount, ZERO, Payout, payout_total
 import asyncio
+import threading
+from contextlib import contextmanager
 from typing import Optional, Union
 from datetime import datetime, timezone
 
 rpc = rpc_module.Rpc()
 MIN_CONFIRMATIONS_FOR_DEPOSIT = 30
+IN_CHUNK = 1000  # ids per IN (...) list
+
+DB_DURATION = metrics.registry.histogram(
+    "mwcbot_mysql_duration_seconds", "Mysql method time", ["method"]
+)
+DB_ERRORS = metrics.registry.counter(
+    "mwcbot_mysql_errors_total", "Mysql method calls that raised", ["method"]
+)
 
 
 class Mysql:
     """
-    Singleton helper for complex database methods
+    Singleton helper for complex database methods. pymysql connections are
+    not thread-safe, so each thread (the event loop, asyncio.to_thread
+    workers) gets its own connection.
     """
     instance = None
 
@@ -24,6 +38,7 @@ class Mysql:
     def __getattr__(self, name):
         return getattr(self.instance, name)
 
+    @metrics.instrument_methods(DB_DURATION, DB_ERRORS)
     class __Mysql:
         def __init__(self):
             config = parsing.parse_json('config.json')["mysql"]
@@ -32,12 +47,22 @@ class Mysql:
             self.__db_user = config["db_user"]
             self.__db_pass = config["db_pass"]
             self.__db = config["db"]
-            self.txfee = parsing.parse_json('config.json')["txfee"]
+            self.txfee = Amount.from_coins(parsing.parse_json('config.json')["txfee"])
             self.deposit_callback = None  # callback for deposit notifications
-            self.__setup_connection()
+            self.__owned_addresses: Optional[set[str]] = None  # loaded on first use
+            self.__local = threading.local()  # .connection, opened by connect() or on first use
+
+        def connect(self):
+            """Open this thread's connection now instead of on the first query."""
+            connection = getattr(self.__local, "connection", None)
+            if connection is None:
+                self.__local.connection = self.__setup_connection()
+            else:
+                connection.ping(reconnect=True)
+            return self.__local.connection
 
         def __setup_connection(self):
-            self.__connection = pymysql.connect(
+            return pymysql.connect(
                 host=self.__host,
                 port=self.__port,
                 user=self.__db_user,
@@ -47,8 +72,28 @@ class Mysql:
             )
 
         def __setup_cursor(self):
-            self.__connection.ping(reconnect=True)
-            return self.__connection.cursor(pymysql.cursors.DictCursor)
+            return self.connect().cursor(InstrumentedCursor)
+
+        @contextmanager
+        def __transaction(self):
+            """Run the enclosed statements as one transaction on this thread's connection."""
+            connection = self.connect()
+            cursor = connection.cursor(InstrumentedCursor)
+            connection.begin()
+            try:
+                yield cursor
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        def explain(self, statement: str) -> list[dict]:
+            """EXPLAIN a fully formatted statement (kept out of the query log)."""
+            with self.connect().cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute(f"EXPLAIN {statement}")
+                return cursor.fetchall()
 
         # -------------------- USER --------------------
         def make_user(self, snowflake: int, address: str):
@@ -56,8 +101,10 @@ class Mysql:
                 cursor.execute(
                     "INSERT INTO users (snowflake_pk, balance, balance_unconfirmed, address, allow_soak) "
                     "VALUES (%s, %s, %s, %s, %s)",
-                    (str(snowflake), '0', '0', address, 1)
+                    (str(snowflake), 0, 0, address, 1)
                 )
+            if self.__owned_addresses is not None:
+                self.__owned_addresses.add(address)
 
         def check_for_user(self, snowflake: int):
             """Ensure user exists; if not, create + new address."""
@@ -72,6 +119,23 @@ class Mysql:
                 address = rpc.getnewaddress(str(snowflake))
                 self.make_user(snowflake, address)
 
+        def check_for_users(self, snowflakes):
+            """check_for_user for many users, one SELECT per IN_CHUNK ids."""
+            snowflakes = [int(s) for s in snowflakes]
+            existing = set()
+            with self.__setup_cursor() as cursor:
+                for i in range(0, len(snowflakes), IN_CHUNK):
+                    chunk = snowflakes[i:i + IN_CHUNK]
+                    cursor.execute(
+                        f"SELECT snowflake_pk FROM users WHERE snowflake_pk IN ({', '.join(['%s'] * len(chunk))})",
+                        [str(s) for s in chunk]
+                    )
+                    existing.update(int(r["snowflake_pk"]) for r in cursor.fetchall())
+
+            for snowflake in snowflakes:
+                if snowflake not in existing:
+                    self.make_user(snowflake, rpc.getnewaddress(str(snowflake)))
+
         def get_user(self, snowflake: int) -> Optional[dict]:
             """Return full user row for a snowflake."""
             with self.__setup_cursor() as cursor:
@@ -92,6 +156,39 @@ class Mysql:
                 )
                 return cursor.fetchone()
 
+        def load_owned_addresses(self):
+            """
+            Build the in-memory set of bot-owned addresses from users.address
+            plus every address the wallet knows about (including unused ones).
+            """
+            with self.__setup_cursor() as cursor:
+                cursor.execute("SELECT address FROM users")
+                addresses = {r["address"] for r in cursor.fetchall()}
+
+            try:
+                for entry in rpc.listreceivedbyaddress(0, True):
+                    if entry.get("address"):
+                        addresses.add(entry["address"])
+            except Exception as e:
+                output.warning(f"RPC error listing wallet addresses, using DB only: {e}")
+
+            self.__owned_addresses = addresses
+            output.info(f"Loaded {len(addresses)} bot-owned addresses")
+
+        def is_bot_address(self, address: str) -> bool:
+            """O(1) check against the owned set, falling back to the users.address unique index."""
+            if self.__owned_addresses is None:
+                self.load_owned_addresses()
+
+            if address in self.__owned_addresses:
+                return True
+
+            # Address may have been created by another process since the set was loaded
+            if self.get_user_by_address(address):
+                self.__owned_addresses.add(address)
+                return True
+            return False
+
         def get_address(self, snowflake: int) -> Optional[str]:
             """Get (and ensure) address for user."""
             self.check_for_user(snowflake)
@@ -151,16 +248,16 @@ class Mysql:
                 cursor.execute("DELETE FROM channel WHERE channel_id = %s", (str(channel.id),))
 
         # -------------------- BALANCE --------------------
-        def set_balance(self, snowflake: int, amount: Decimal, is_unconfirmed=False):
+        def set_balance(self, snowflake: int, amount: Amount, is_unconfirmed=False):
             field = "balance_unconfirmed" if is_unconfirmed else "balance"
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     f"UPDATE users SET {field} = %s WHERE snowflake_pk = %s",
-                    (str(amount), str(snowflake))
+                    (amount.sats, str(snowflake))
                 )
 
         # ---------- PUBLIC BALANCE ACCESS ----------
-        def get_balance(self, user_id: int, confirmed_only: bool = True, update: bool = False) -> Decimal:
+        def get_balance(self, user_id: int, confirmed_only: bool = True, update: bool = False) -> Amount:
             """
             Public balance accessor.
             confirmed_only=True  -> confirmed balance only
@@ -175,63 +272,63 @@ class Mysql:
                 return self.get_confirmed_balance(user_id)
             return self.get_unconfirmed_balance(user_id)
 
-        def get_confirmed_balance(self, snowflake: int) -> Decimal:
+        def get_confirmed_balance(self, snowflake: int) -> Amount:
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     "SELECT balance FROM users WHERE snowflake_pk = %s",
                     (str(snowflake),)
                 )
                 row = cursor.fetchone()
-            return Decimal(row["balance"] or 0) if row else Decimal("0")
+            return Amount(int(row["balance"])) if row else ZERO
 
-        def get_unconfirmed_balance(self, snowflake: int) -> Decimal:
+        def get_unconfirmed_balance(self, snowflake: int) -> Amount:
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     "SELECT balance_unconfirmed FROM users WHERE snowflake_pk = %s",
                     (str(snowflake),)
                 )
                 row = cursor.fetchone()
-            return Decimal(row["balance_unconfirmed"] or 0) if row else Decimal("0")
+            return Amount(int(row["balance_unconfirmed"])) if row else ZERO
 
-        def add_to_balance(self, snowflake: int, amount: Decimal):
+        def add_to_balance(self, snowflake: int, amount: Amount):
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     "UPDATE users SET balance = balance + %s WHERE snowflake_pk = %s",
-                    (str(amount), str(snowflake))
+                    (amount.sats, str(snowflake))
                 )
 
-        def remove_from_balance(self, snowflake: int, amount: Decimal):
+        def remove_from_balance(self, snowflake: int, amount: Amount):
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     "UPDATE users SET balance = balance - %s WHERE snowflake_pk = %s",
-                    (str(amount), str(snowflake))
+                    (amount.sats, str(snowflake))
                 )
 
         # ---------- NEW HELPER FOR BALANCE UPDATES & WITHDRAW ----------
-        def check_for_updated_balance(self, snowflake: int, send_to_address: str = None, amount: Decimal = None):
+        def check_for_updated_balance(self, snowflake: int, send_to_address: str = None, amount: Amount = None):
             """
             Sync new deposits from wallet. If send_to_address and amount are provided, also send coins.
             """
             # 1️⃣ Update deposits first
             deposits = self.list_deposits_for_user(snowflake)
-            total_new = sum(d["amount"] for d in deposits)
-            if total_new > 0:
-                self.add_to_balance(snowflake, Decimal(total_new))
+            total_new = sum((d["amount"] for d in deposits), ZERO)
+            if total_new.sats > 0:
+                self.add_to_balance(snowflake, total_new)
 
             # 2️⃣ If withdrawing, deduct balance and send via RPC
             if send_to_address and amount:
                 self.remove_from_balance(snowflake, amount)
-                txid = rpc.sendtoaddress(str(send_to_address), float(amount))
+                txid = rpc.sendtoaddress(str(send_to_address), amount)
                 return txid
 
-        def add_to_balance_unconfirmed(self, snowflake: int, amount: Decimal):
+        def add_to_balance_unconfirmed(self, snowflake: int, amount: Amount):
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     "UPDATE users SET balance_unconfirmed = balance_unconfirmed + %s WHERE snowflake_pk = %s",
-                    (str(amount), str(snowflake))
+                    (amount.sats, str(snowflake))
                 )
 
-        def remove_from_balance_unconfirmed(self, snowflake: int, amount: Decimal):
+        def remove_from_balance_unconfirmed(self, snowflake: int, amount: Amount):
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     """
@@ -239,7 +336,7 @@ class Mysql:
                     SET balance_unconfirmed = GREATEST(balance_unconfirmed - %s, 0)
                     WHERE snowflake_pk = %s
                     """,
-                    (str(amount), str(snowflake))
+                    (amount.sats, str(snowflake))
                 )
 
         # -------------------- DEPOSIT TRACKING --------------------
@@ -249,7 +346,7 @@ class Mysql:
             """
             await asyncio.to_thread(self.check_for_updated_balance)
 
-        def check_for_updated_balance(self, snowflake: int = None, send_to_address: str = None, amount: Decimal = None):
+        def check_for_updated_balance(self, snowflake: int = None, send_to_address: str = None, amount: Amount = None):
             """
             Scan wallet using listreceivedbyaddress and update balances.
             Handles:
@@ -263,9 +360,9 @@ class Mysql:
             # --- Handle a single user's deposits if snowflake provided ---
             if snowflake is not None:
                 deposits = self.list_deposits_for_user(snowflake)
-                total_new = sum(d["amount"] for d in deposits)
-                if total_new > 0:
-                    self.add_to_balance(snowflake, Decimal(total_new))
+                total_new = sum((d["amount"] for d in deposits), ZERO)
+                if total_new.sats > 0:
+                    self.add_to_balance(snowflake, total_new)
 
             # --- Full scan for all users (background deposit processing) ---
             # Fetch all users from DB
@@ -281,7 +378,7 @@ class Mysql:
                     include_watch_only=True
                 )
             except Exception as e:
-                print(f"[RECOVERY] RPC error fetching received list: {e}")
+                output.error(f"[RECOVERY] RPC error fetching received list: {e}")
                 return
 
             # Map user addresses to snowflake
@@ -306,43 +403,30 @@ class Mysql:
                     try:
                         tx = rpc.gettransaction(txid)
                     except Exception as e:
-                        print(f"[RECOVERY] Failed to fetch tx {txid}: {e}")
+                        output.warning(f"[RECOVERY] Failed to fetch tx {txid}: {e}")
                         continue
 
                     confirmations = tx.get("confirmations", 0)
 
                     # Sum amounts for this address (multi-output TX)
-                    tx_amount = Decimal("0")
+                    tx_amount = ZERO
                     for detail in tx.get("details", []):
                         if detail.get("category") == "receive" and detail.get("address") == address:
-                            tx_amount += Decimal(detail.get("amount", 0))
+                            tx_amount += Amount.from_coins(detail.get("amount", 0))
 
-                    if tx_amount <= 0:
+                    if tx_amount.sats <= 0:
                         continue
 
-                    # 🟡 New unconfirmed deposit
-                    if status == "DOESNT_EXIST" and confirmations < MIN_CONFIRMATIONS_FOR_DEPOSIT:
-                        self.add_deposit(snowflake, tx_amount, txid, "UNCONFIRMED")
-                        self.add_to_balance_unconfirmed(snowflake, tx_amount)
-                        if self.deposit_callback:
-                            self.deposit_callback(snowflake, tx_amount, txid, False)
-
-                    # 🟢 New confirmed deposit
-                    elif status == "DOESNT_EXIST" and confirmations >= MIN_CONFIRMATIONS_FOR_DEPOSIT:
-                        self.add_deposit(snowflake, tx_amount, txid, "CONFIRMED")
-                        self.add_to_balance(snowflake, tx_amount)
-                        if self.deposit_callback:
-                            self.deposit_callback(snowflake, tx_amount, txid, True)
+                    confirmed = confirmations >= MIN_CONFIRMATIONS_FOR_DEPOSIT
 
-                    # 🔁 Previously unconfirmed, now confirmed
-                    elif status == "UNCONFIRMED" and confirmations >= MIN_CONFIRMATIONS_FOR_DEPOSIT:
-                        self.confirm_deposit(txid)
+                    # 🟡🟢 New deposit, unconfirmed or already confirmed
+                    if status == "DOESNT_EXIST":
+                        if self.credit_deposit(snowflake, tx_amount, txid, confirmed) and self.deposit_callback:
+                            self.deposit_callback(snowflake, tx_amount, txid, confirmed)
 
-                        # 🔄 MOVE funds from unconfirmed → confirmed
-                        self.remove_from_balance_unconfirmed(snowflake, tx_amount)
-                        self.add_to_balance(snowflake, tx_amount)
-
-                        if self.deposit_callback:
+                    # 🔁 Previously unconfirmed, now confirmed
+                    elif status == "UNCONFIRMED" and confirmed:
+                        if self.settle_deposit(snowflake, tx_amount, txid) and self.deposit_callback:
                             self.deposit_callback(snowflake, tx_amount, txid, True)
 
         def get_transaction_status_by_txid(self, txid: str) -> str:
@@ -362,8 +446,7 @@ class Mysql:
                     (str(snowflake),)
                 )
                 deposits = cursor.fetchall()
-            # convert amounts to Decimal
-            return [{"amount": Decimal(d["amount"]), "txid": d["txid"]} for d in deposits]
+            return [{"amount": Amount(int(d["amount"])), "txid": d["txid"]} for d in deposits]
         
         def get_deposit_history(self, snowflake: int, limit: int = 10):
             with self.__setup_cursor() as cursor:
@@ -380,7 +463,7 @@ class Mysql:
 
             return [
                 {
-                    "amount": Decimal(r["amount"]),
+                    "amount": Amount(int(r["amount"])),
                     "txid": r["txid"],
                     "status": r["status"]
                 }
@@ -388,63 +471,236 @@ class Mysql:
             ]
 
         # -------------------- Deposit/Withdraw/Tip/Soak --------------------
-        def add_deposit(self, snowflake: int, amount: Decimal, txid: str, status: str):
+        def add_deposit(self, snowflake: int, amount: Amount, txid: str, status: str):
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     "INSERT INTO deposit(snowflake_fk, amount, txid, status) VALUES (%s, %s, %s, %s)",
-                    (str(snowflake), str(amount), txid, status)
+                    (str(snowflake), amount.sats, txid, status)
                 )
 
         def confirm_deposit(self, txid: str):
             with self.__setup_cursor() as cursor:
                 cursor.execute("UPDATE deposit SET status = %s WHERE txid = %s", ('CONFIRMED', txid))
 
-        def create_withdrawal(self, snowflake: int, address: str, amount: Decimal) -> Optional[str]:
-            amount = Decimal(amount)
+        def credit_deposit(self, snowflake: int, amount: Amount, txid: str, confirmed: bool) -> bool:
+            """
+            Record a new deposit and credit it in one transaction. The deposit
+            row goes in first and the balance moves only if it was new, so two
+            scans racing on the same txid credit it once. Returns whether this
+            call credited it.
+            """
+            column = "balance" if confirmed else "balance_unconfirmed"
+            with self.__transaction() as cursor:
+                cursor.execute(
+                    "INSERT IGNORE INTO deposit(snowflake_fk, amount, txid, status) VALUES (%s, %s, %s, %s)",
+                    (str(snowflake), amount.sats, txid, "CONFIRMED" if confirmed else "UNCONFIRMED")
+                )
+                if cursor.rowcount != 1:
+                    return False
+                cursor.execute(
+                    f"UPDATE users SET {column} = {column} + %s WHERE snowflake_pk = %s",
+                    (amount.sats, str(snowflake))
+                )
+                return True
 
-            balance = self.get_balance(snowflake, confirmed_only=True)
-            if amount <= 0 or balance < amount:
-                return None
+        def settle_deposit(self, snowflake: int, amount: Amount, txid: str) -> bool:
+            """Confirm an unconfirmed deposit and move it to the spendable balance, at most once."""
+            with self.__transaction() as cursor:
+                cursor.execute(
+                    "UPDATE deposit SET status = 'CONFIRMED' WHERE txid = %s AND status = 'UNCONFIRMED'",
+                    (txid,)
+                )
+                if cursor.rowcount != 1:
+                    return False
+                cursor.execute(
+                    """
+                    UPDATE users
+                    SET balance_unconfirmed = GREATEST(balance_unconfirmed - %s, 0),
+                        balance = balance + %s
+                    WHERE snowflake_pk = %s
+                    """,
+                    (amount.sats, amount.sats, str(snowflake))
+                )
+                return True
 
-            txfee_decimal = Decimal(str(self.txfee))
+        def add_withdrawal(self, snowflake: int, amount: Amount, txid: str) -> str:
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO withdrawal (snowflake_fk, amount, txid)
+                    VALUES (%s, %s, %s)
+                    """,
+                    (str(snowflake), amount.sats, txid)
+                )
 
-            if not rpc.settxfee(float(txfee_decimal)):
-                return None
+            return txid
+        
+        # -------------------- WITHDRAWAL JOBS --------------------
+        # REQUESTED -> RESERVED -> BROADCAST -> CONFIRMED, or FAILED.
+        # Funds leave the balance on RESERVED and are refunded if a job FAILS after that.
+        # A RESERVED job whose earlier attempt cannot be ruled out is parked as REVIEW, still debited.
+        __JOB_COLUMNS = (
+            "id, idempotency_key, snowflake_fk, amount, address, txid, broadcast_ref, "
+            "status, attempts, last_error, TIMESTAMPDIFF(SECOND, created_at, NOW()) AS age, "
+            "UNIX_TIMESTAMP(created_at) AS created_ts"
+        )
+
+        def create_withdrawal_job(self, idempotency_key: str, snowflake: int, address: str, amount: Amount) -> dict:
+            """
+            Record a REQUESTED withdrawal. Repeating a key returns the existing job instead of a new one.
+            """
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT IGNORE INTO withdrawal (idempotency_key, snowflake_fk, amount, address, status)
+                    VALUES (%s, %s, %s, %s, 'REQUESTED')
+                    """,
+                    (idempotency_key, str(snowflake), amount.sats, address)
+                )
+            return self.get_withdrawal_job_by_key(idempotency_key)
 
-            send_amount = amount - txfee_decimal
-            if send_amount <= 0:
-                return None
+        def get_withdrawal_job(self, job_id: int) -> Optional[dict]:
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {self.__JOB_COLUMNS} FROM withdrawal WHERE id = %s",
+                    (int(job_id),)
+                )
+                return self.__job_row(cursor.fetchone())
 
-            txid = rpc.sendtoaddress(address, float(send_amount))
-            if not txid:
-                return None
+        def get_withdrawal_job_by_key(self, idempotency_key: str) -> Optional[dict]:
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {self.__JOB_COLUMNS} FROM withdrawal WHERE idempotency_key = %s",
+                    (idempotency_key,)
+                )
+                return self.__job_row(cursor.fetchone())
 
-            self.remove_from_balance(snowflake, amount)
-            self.add_withdrawal(snowflake, amount, txid)
+        @staticmethod
+        def __job_row(row: Optional[dict]) -> Optional[dict]:
+            if row:
+                row["amount"] = Amount(int(row["amount"]))
+            return row
 
-            return txid
+        def reserve_withdrawal(self, job_id: int) -> Optional[dict]:
+            """
+            Atomically debit a REQUESTED job's amount and move it to RESERVED,
+            or to FAILED if the confirmed balance does not cover it.
+            """
+            with self.__transaction() as cursor:
+                cursor.execute(
+                    "SELECT snowflake_fk, amount, status FROM withdrawal WHERE id = %s FOR UPDATE",
+                    (int(job_id),)
+                )
+                job = cursor.fetchone()
+
+                if job and job["status"] == "REQUESTED":
+                    cursor.execute(
+                        "UPDATE users SET balance = balance - %s WHERE snowflake_pk = %s AND balance >= %s",
+                        (int(job["amount"]), str(job["snowflake_fk"]), int(job["amount"]))
+                    )
+                    if cursor.rowcount == 1:
+                        cursor.execute(
+                            "UPDATE withdrawal SET status = 'RESERVED' WHERE id = %s",
+                            (int(job_id),)
+                        )
+                    else:
+                        cursor.execute(
+                            "UPDATE withdrawal SET status = 'FAILED', last_error = %s WHERE id = %s",
+                            ("Insufficient confirmed balance", int(job_id))
+                        )
+
+            return self.get_withdrawal_job(job_id)
+
+        def fetch_withdrawal_jobs(self, status: str, limit: int, due_only: bool = False) -> list[dict]:
+            """Oldest jobs in a state first. due_only skips jobs still backing off from a failed attempt."""
+            query = f"SELECT {self.__JOB_COLUMNS} FROM withdrawal WHERE status = %s"
+            if due_only:
+                query += " AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())"
+            query += " ORDER BY id ASC LIMIT %s"
 
-        def add_withdrawal(self, snowflake: int, amount: Decimal, txid: str) -> str:
-            amount = Decimal(amount)
+            with self.__setup_cursor() as cursor:
+                cursor.execute(query, (status, int(limit)))
+                return [self.__job_row(r) for r in cursor.fetchall()]
 
+        def fetch_broadcast_txids(self, limit: int) -> list[str]:
             with self.__setup_cursor() as cursor:
                 cursor.execute(
-                    """
-                    INSERT INTO withdrawal (snowflake_fk, amount, txid)
-                    VALUES (%s, %s, %s)
-                    """,
-                    (str(snowflake), str(amount), txid)
+                    "SELECT DISTINCT txid FROM withdrawal WHERE status = 'BROADCAST' LIMIT %s",
+                    (int(limit),)
+                )
+                return [r["txid"] for r in cursor.fetchall()]
+
+        def __update_reserved(self, cursor, job_ids: list[int], assignments: str, params: tuple):
+            placeholders = ", ".join(["%s"] * len(job_ids))
+            cursor.execute(
+                f"UPDATE withdrawal SET {assignments} WHERE status = 'RESERVED' AND id IN ({placeholders})",
+                (*params, *[int(i) for i in job_ids])
+            )
+
+        def mark_withdrawals_broadcasting(self, job_ids: list[int], broadcast_ref: str):
+            """Tag jobs with the wallet comment of the attempt about to be made."""
+            with self.__setup_cursor() as cursor:
+                self.__update_reserved(
+                    cursor, job_ids,
+                    "broadcast_ref = %s, attempts = attempts + 1",
+                    (broadcast_ref,)
+                )
+
+        def mark_withdrawals_broadcast(self, job_ids: list[int], txid: str):
+            with self.__setup_cursor() as cursor:
+                self.__update_reserved(
+                    cursor, job_ids,
+                    "status = 'BROADCAST', txid = %s, last_error = NULL, next_attempt_at = NULL",
+                    (txid,)
+                )
+
+        def defer_withdrawals(self, job_ids: list[int], error: str, retry_in_seconds: int):
+            with self.__setup_cursor() as cursor:
+                self.__update_reserved(
+                    cursor, job_ids,
+                    "last_error = %s, next_attempt_at = NOW() + INTERVAL %s SECOND",
+                    (error[:255], int(retry_in_seconds))
+                )
+
+        def hold_withdrawals(self, job_ids: list[int], error: str):
+            """Park RESERVED jobs as REVIEW: neither retried nor refunded until someone checks the wallet."""
+            with self.__setup_cursor() as cursor:
+                self.__update_reserved(
+                    cursor, job_ids,
+                    "status = 'REVIEW', last_error = %s",
+                    (error[:255],)
+                )
+
+        def fail_withdrawals(self, jobs: list[dict], error: str):
+            """Move RESERVED jobs to FAILED and refund their amounts."""
+            with self.__transaction() as cursor:
+                for job in jobs:
+                    self.__update_reserved(
+                        cursor, [job["id"]],
+                        "status = 'FAILED', last_error = %s",
+                        (error[:255],)
+                    )
+                    if cursor.rowcount == 1:
+                        cursor.execute(
+                            "UPDATE users SET balance = balance + %s WHERE snowflake_pk = %s",
+                            (job["amount"].sats, str(job["snowflake_fk"]))
+                        )
+
+        def confirm_withdrawals(self, txid: str):
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE withdrawal SET status = 'CONFIRMED' WHERE txid = %s AND status = 'BROADCAST'",
+                    (txid,)
                 )
 
-            return txid
-        
         def get_withdrawal_history(self, snowflake: int, limit: int = 10):
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     """
-                    SELECT amount, txid
+                    SELECT id, amount, txid, status
                     FROM withdrawal
                     WHERE snowflake_fk = %s
+                    ORDER BY id DESC
                     LIMIT %s
                     """,
                     (str(snowflake), limit)
@@ -453,26 +709,26 @@ class Mysql:
 
             return [
                 {
-                    "amount": Decimal(r["amount"]),
-                    "txid": r["txid"]
+                    "id": r["id"],
+                    "amount": Amount(int(r["amount"])),
+                    "txid": r["txid"],
+                    "status": r["status"]
                 }
                 for r in rows
             ]
 
-        def add_tip(self, from_snowflake: int, to_snowflake: int, amount: Decimal):
-            amount = Decimal(amount)
-
+        def add_tip(self, from_snowflake: int, to_snowflake: int, amount: Amount):
             with self.__setup_cursor() as cursor:
                 # Remove from sender
                 cursor.execute(
                     "UPDATE users SET balance = balance - %s WHERE snowflake_pk = %s",
-                    (str(amount), str(from_snowflake))
+                    (amount.sats, str(from_snowflake))
                 )
 
                 # Add to receiver
                 cursor.execute(
                     "UPDATE users SET balance = balance + %s WHERE snowflake_pk = %s",
-                    (str(amount), str(to_snowflake))
+                    (amount.sats, str(to_snowflake))
                 )
 
                 # Record tip
@@ -481,8 +737,113 @@ class Mysql:
                     INSERT INTO tip (snowflake_from_fk, snowflake_to_fk, amount)
                     VALUES (%s, %s, %s)
                     """,
-                    (str(from_snowflake), str(to_snowflake), str(amount))
+                    (str(from_snowflake), str(to_snowflake), amount.sats)
+                )
+
+        def debit_if_sufficient(self, snowflake: int, amount: Amount) -> bool:
+            """Take amount from the confirmed balance in one statement; False if it does not cover it."""
+            with self.__setup_cursor() as cursor:
+                return self.__debit(cursor, snowflake, amount)
+
+        def __debit(self, cursor, snowflake: int, amount: Amount) -> bool:
+            cursor.execute(
+                "UPDATE users SET balance = balance - %s WHERE snowflake_pk = %s AND balance >= %s",
+                (amount.sats, str(snowflake), amount.sats)
+            )
+            return cursor.rowcount == 1
+
+        def transfer(self, from_snowflake: int, payouts: list[Payout]) -> bool:
+            """
+            Pay every (amount, recipients) payout (see utils.amount.pay_each and
+            pay_split) and record the tips, all in one transaction. The sender is
+            debited only if their confirmed balance covers the total, so
+            concurrent tips cannot overdraw it. Recipients must already exist
+            (check_for_users).
+            """
+            payouts = [(amount, [str(s) for s in ids]) for amount, ids in payouts if ids]
+            if not payouts or any(amount.sats <= 0 for amount, _ in payouts):
+                return False
+
+            with self.__transaction() as cursor:
+                if not self.__debit(cursor, from_snowflake, payout_total(payouts)):
+                    return False
+
+                for amount, recipients in payouts:
+                    for i in range(0, len(recipients), IN_CHUNK):
+                        chunk = recipients[i:i + IN_CHUNK]
+                        cursor.execute(
+                            f"UPDATE users SET balance = balance + %s "
+                            f"WHERE snowflake_pk IN ({', '.join(['%s'] * len(chunk))})",
+                            [amount.sats, *chunk]
+                        )
+                cursor.executemany(
+                    "INSERT INTO tip (snowflake_from_fk, snowflake_to_fk, amount) VALUES (%s, %s, %s)",
+                    [(str(from_snowflake), to, amount.sats) for amount, recipients in payouts for to in recipients]
                 )
+            return True
+
+        def transfer_batch(self, transfers: list[tuple[int, list[Payout]]]) -> list[bool]:
+            """
+            Apply many (from_snowflake, payouts) transfers in one transaction,
+            in order, with the same all-or-nothing rule per transfer as
+            transfer(). Senders are locked with SELECT ... FOR UPDATE and every
+            user's balance changes by one aggregated delta.
+            Returns whether each transfer was applied.
+            """
+            prepared = []
+            for from_snowflake, payouts in transfers:
+                payouts = [(amount.sats, [int(s) for s in ids]) for amount, ids in payouts if ids]
+                prepared.append((int(from_snowflake), payouts))
+
+            senders = list({p[0] for p in prepared})
+            results = []
+            deltas: dict[int, int] = {}  # snowflake -> satoshis
+            tips = []
+            with self.__transaction() as cursor:
+                available = {}
+                for i in range(0, len(senders), IN_CHUNK):
+                    chunk = senders[i:i + IN_CHUNK]
+                    cursor.execute(
+                        f"SELECT snowflake_pk, balance FROM users "
+                        f"WHERE snowflake_pk IN ({', '.join(['%s'] * len(chunk))}) FOR UPDATE",
+                        [str(s) for s in chunk]
+                    )
+                    available.update({int(r["snowflake_pk"]): int(r["balance"]) for r in cursor.fetchall()})
+
+                for from_snowflake, payouts in prepared:
+                    total = sum(sats * len(ids) for sats, ids in payouts)
+                    if (
+                        not payouts
+                        or any(sats <= 0 for sats, _ in payouts)
+                        or available.get(from_snowflake, 0) < total
+                    ):
+                        results.append(False)
+                        continue
+                    available[from_snowflake] -= total
+                    deltas[from_snowflake] = deltas.get(from_snowflake, 0) - total
+                    for sats, ids in payouts:
+                        for to in ids:
+                            deltas[to] = deltas.get(to, 0) + sats
+                            if to in available:
+                                available[to] += sats
+                            tips.append((str(from_snowflake), str(to), sats))
+                    results.append(True)
+
+                changed = [(k, v) for k, v in deltas.items() if v]
+                for i in range(0, len(changed), IN_CHUNK):
+                    chunk = changed[i:i + IN_CHUNK]
+                    cursor.execute(
+                        f"UPDATE users SET balance = balance + CASE snowflake_pk "
+                        f"{' '.join(['WHEN %s THEN %s'] * len(chunk))} END "
+                        f"WHERE snowflake_pk IN ({', '.join(['%s'] * len(chunk))})",
+                        [x for k, v in chunk for x in (str(k), v)] + [str(k) for k, _ in chunk]
+                    )
+                if tips:
+                    cursor.executemany(
+                        "INSERT INTO tip (snowflake_from_fk, snowflake_to_fk, amount) VALUES (%s, %s, %s)",
+                        tips
+                    )
+            return results
 
         def check_soak(self, guild_id: int) -> bool:
             self.check_guild(guild_id)
@@ -514,6 +875,12 @@ class Mysql:
                 cursor.execute("SELECT allow_soak FROM users WHERE snowflake_pk = %s", (str(snowflake),))
                 result = cursor.fetchone()
             return bool(result['allow_soak']) if result else False
+
+        def fetch_soak_optouts(self) -> SnowflakeSet:
+            """Users who turned soaking off with /soakme."""
+            with self.__setup_cursor() as cursor:
+                cursor.execute("SELECT snowflake_pk FROM users WHERE allow_soak = 0")
+                return SnowflakeSet(int(r["snowflake_pk"]) for r in cursor.fetchall())
         
         def get_active_users(self, hours: int) -> list[int]:
             query = """
@@ -527,7 +894,7 @@ class Mysql:
             return [r["snowflake_to_fk"] for r in rows]
 
         def recover_missed_deposits(self):
-            print("[RECOVERY] Scanning for missed deposits...")
+            output.info("[RECOVERY] Scanning for missed deposits...")
 
             # Fetch all users
             with self.__setup_cursor() as cursor:
@@ -543,7 +910,7 @@ class Mysql:
                     include_watch_only=True
                 )
             except Exception as e:
-                print(f"[RECOVERY] RPC error fetching received list: {e}")
+                output.error(f"[RECOVERY] RPC error fetching received list: {e}")
                 return
 
             # Process all received entries
@@ -565,29 +932,48 @@ class Mysql:
                     try:
                         tx = rpc.gettransaction(txid)
                     except Exception as e:
-                        print(f"[RECOVERY] Failed to fetch tx {txid}: {e}")
+                        output.warning(f"[RECOVERY] Failed to fetch tx {txid}: {e}")
                         continue
 
                     confirmations = tx.get("confirmations", 0)
 
                     # Sum multi-output amounts
-                    amount = Decimal("0")
+                    amount = ZERO
                     for d in tx.get("details", []):
                         if d.get("category") == "receive" and d.get("address") == address:
-                            amount += Decimal(d.get("amount", 0))
+                            amount += Amount.from_coins(d.get("amount", 0))
 
-                    if amount <= 0:
+                    if amount.sats <= 0:
                         continue
 
-                    # Unconfirmed
-                    if confirmations < MIN_CONFIRMATIONS_FOR_DEPOSIT:
-                        self.add_to_balance_unconfirmed(snowflake, amount)
-                        self.add_deposit(snowflake, amount, txid, "UNCONFIRMED")
-                    else:  # Confirmed
-                        self.add_to_balance(snowflake, amount)
-                        self.add_deposit(snowflake, amount, txid, "CONFIRMED")
+                    self.credit_deposit(snowflake, amount, txid, confirmations >= MIN_CONFIRMATIONS_FOR_DEPOSIT)
 
-            print("[RECOVERY] Complete")
+            output.info("[RECOVERY] Complete")
+
+        # -------------------- LEADER LEASES --------------------
+        def acquire_lease(self, name: str, owner: str, lease_seconds: int) -> bool:
+            """Take or extend the named lease if it is free, expired or already ours."""
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    "INSERT IGNORE INTO job_lease (name, owner, expires_at) "
+                    "VALUES (%s, %s, NOW() + INTERVAL %s SECOND)",
+                    (name, owner, int(lease_seconds))
+                )
+                cursor.execute(
+                    """
+                    UPDATE job_lease
+                    SET owner = %s, expires_at = NOW() + INTERVAL %s SECOND
+                    WHERE name = %s AND (owner = %s OR expires_at < NOW())
+                    """,
+                    (owner, int(lease_seconds), name, owner)
+                )
+                cursor.execute("SELECT owner FROM job_lease WHERE name = %s", (name,))
+                row = cursor.fetchone()
+            return bool(row) and row["owner"] == owner
+
+        def release_leases(self, owner: str):
+            with self.__setup_cursor() as cursor:
+                cursor.execute("UPDATE job_lease SET expires_at = NOW() WHERE owner = %s", (owner,))
 
         # -------------------- AIRDROPS --------------------
         def create_airdrop(
@@ -595,15 +981,12 @@ class Mysql:
             guild_id: int,
             channel_id: int,
             creator_id: int,
-            amount: Decimal,
+            amount: Amount,
             split: bool,
             role_id: Optional[int],
             execute_at: datetime
         ) -> int:
             """Insert a scheduled airdrop and return its ID"""
-
-            amount = Decimal(amount)
-
             with self.__setup_cursor() as cursor:
                 cursor.execute(
                     """
@@ -615,7 +998,7 @@ class Mysql:
                         int(guild_id),
                         int(channel_id),
                         int(creator_id),
-                        str(amount),
+                        amount.sats,
                         int(split),
                         int(role_id) if role_id is not None else None,
                         execute_at,
@@ -623,6 +1006,14 @@ class Mysql:
                 )
                 return cursor.lastrowid
 
+        def set_airdrop_message(self, airdrop_id: int, message_id: int):
+            """Record the announcement whose reactions decide who receives the airdrop"""
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE airdrops SET message_id = %s WHERE id = %s",
+                    (int(message_id), int(airdrop_id))
+                )
+
         def fetch_pending_airdrops(self, now: datetime):
             """Get a list of airdrops ready to execute"""
             with self.__setup_cursor() as cursor:
@@ -635,7 +1026,7 @@ class Mysql:
                     """,
                     (now,)
                 )
-                return cursor.fetchall()
+                return [self.__airdrop_row(r) for r in cursor.fetchall()]
 
         def fetch_airdrop_by_id(self, airdrop_id: int):
             with self.__setup_cursor() as cursor:
@@ -643,7 +1034,22 @@ class Mysql:
                     "SELECT * FROM airdrops WHERE id = %s",
                     (int(airdrop_id),)
                 )
-                return cursor.fetchone()
+                return self.__airdrop_row(cursor.fetchone())
+
+        @staticmethod
+        def __airdrop_row(row: Optional[dict]) -> Optional[dict]:
+            if row:
+                row["amount"] = Amount(int(row["amount"]))
+            return row
+
+        def claim_airdrop(self, airdrop_id: int) -> bool:
+            """Mark a pending airdrop executed; True only for the one caller that flipped it."""
+            with self.__setup_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE airdrops SET executed = 1 WHERE id = %s AND executed = 0",
+                    (int(airdrop_id),)
+                )
+                return cursor.rowcount == 1
 
         def mark_airdrop_executed(self, airdrop_id: int):
             with self.__setup_cursor() as cursor:
@@ -668,5 +1074,5 @@ class Mysql:
                     """,
                     (int(creator_id), int(executed))
                 )
-                return cursor.fetchall()
+                return [self.__airdrop_row(r) for r in cursor.fetchall()]
 
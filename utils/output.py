@@ -1,3 +1,15 @@
+import atexit
+import glob
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
 from utils import parsing
 
 config = parsing.parse_json("config.json")["logging"]
@@ -5,14 +17,204 @@ config = parsing.parse_json("config.json")["logging"]
 color = ["\033[1;31;49m", "\033[1;33;49m", "\033[1;32;49m", "\033[1;36;49m"]
 message = ["[ERROR]   ", "[WARNING] ", "[SUCCESS] ", "[INFO]    "]
 
+# The bot's 0-3 verbosity scale mapped onto logging levels
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+LEVELS = [logging.ERROR, logging.WARNING, SUCCESS, logging.INFO]
+VERBOSITY = {level: var for var, level in enumerate(LEVELS)}
 
-def do_syn(string, var):
-    if var <= config["print_level"]:
-        print(f"{color[var]}{message[var]}\033[1;37;49m{string}")
+MAX_BYTES = config.get("max_bytes", 10 * 1024 * 1024)
+ROTATE_SECONDS = config.get("rotate_seconds", 86400)
+BACKUP_COUNT = config.get("backup_count", 14)
+COMPRESS = config.get("compress", True)
+BATCH_SIZE = config.get("batch_size", 512)
+QUEUE_SIZE = config.get("queue_size", 10000)
+
+
+def _level(var) -> int:
+    """Accept either the 0-3 scale or a level name such as "WARNING"."""
+    if isinstance(var, str):
+        return logging.getLevelName(var.upper())
+    return LEVELS[max(0, min(var, len(LEVELS) - 1))]
+
+
+# =====================
+# HANDLERS
+# =====================
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        var = VERBOSITY.get(record.levelno, 0)
+        return f"{color[var]}{message[var]}\033[1;37;49m{record.getMessage()}"
+
+
+class FileFormatter(logging.Formatter):
+    def format(self, record):
+        var = VERBOSITY.get(record.levelno, 0)
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        return f"{stamp} {message[var]}{record.getMessage()}"
+
+
+class RotatingCompressedFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    Appends to `filename` and rolls it over once it reaches max_bytes or is
+    rotate_seconds old. Rolled files are timestamped, gzipped if compress is
+    set, and only the newest backup_count are kept. Writes are not flushed per
+    record; the background writer flushes once per batch.
+    """
+
+    def __init__(self, filename, max_bytes=MAX_BYTES, rotate_seconds=ROTATE_SECONDS,
+                 backup_count=BACKUP_COUNT, compress=COMPRESS):
+        super().__init__(filename, "a", encoding="utf-8", delay=False)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.compress = compress
+        started = os.path.getmtime(self.baseFilename) if os.path.getsize(self.baseFilename) else time.time()
+        self.rollover_at = started + rotate_seconds
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+    def shouldRollover(self, record) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        if self.rotate_seconds and record.created >= self.rollover_at:
+            return self.stream.tell() > 0
+        return bool(self.max_bytes) and self.stream.tell() >= self.max_bytes
+
+    def doRollover(self):
+        self.stream.close()
+        self.stream = None
+
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        target = f"{self.baseFilename}.{stamp}"
+        n = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{self.baseFilename}.{stamp}.{n}"
+            n += 1
+        os.rename(self.baseFilename, target)
+
+        if self.compress:
+            with open(target, "rb") as src, gzip.open(target + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(target)
+
+        backups = sorted(glob.glob(glob.escape(self.baseFilename) + ".*"), key=os.path.getmtime)
+        for old in backups[:max(0, len(backups) - self.backup_count)]:
+            os.remove(old)
+
+        self.stream = self._open()
+        self.rollover_at = time.time() + self.rotate_seconds
+
+
+class BackgroundWriter:
+    """Drains the log queue on its own thread, handling records in batches."""
+
+    _STOP = object()
+
+    def __init__(self, log_queue: queue.Queue, *handlers):
+        self.queue = log_queue
+        self.handlers = handlers
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.queue.put(self._STOP)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is self._STOP:
+                    self._flush()
+                    return
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            self._flush()
 
-    if var <= config["file_level"]:
-        with open(config["file"], "a", encoding="utf-8") as f:
-            f.write(f"{message[var]}{string}\n")
+    def _flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: if the writer falls behind, records are dropped and counted."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+# =====================
+# SETUP
+# =====================
+log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+console_handler = logging.StreamHandler(sys.stdout)
+console_handler.setLevel(_level(config["print_level"]))
+console_handler.setFormatter(ConsoleFormatter())
+
+file_handler = RotatingCompressedFileHandler(config["file"])
+file_handler.setLevel(_level(config["file_level"]))
+file_handler.setFormatter(FileFormatter())
+
+root = logging.getLogger("mwcbot")
+root.setLevel(min(console_handler.level, file_handler.level))
+root.propagate = False
+root.addHandler(DroppingQueueHandler(log_queue))
+
+# Per-module overrides, e.g. {"cogs.soak": "WARNING", "utils.query_log": 1}
+for _module, _var in config.get("levels", {}).items():
+    logging.getLogger(f"mwcbot.{_module}").setLevel(_level(_var))
+
+writer = BackgroundWriter(log_queue, console_handler, file_handler)
+writer.start()
+
+
+def shutdown():
+    """Flush everything still queued and stop the writer thread."""
+    if writer._thread.is_alive():
+        writer.stop()
+
+
+atexit.register(shutdown)
+
+
+# =====================
+# PUBLIC
+# =====================
+_loggers: dict[str, logging.Logger] = {}
+
+
+def _caller_logger() -> logging.Logger:
+    module = sys._getframe(3).f_globals.get("__name__", "")
+    logger = _loggers.get(module)
+    if logger is None:
+        logger = _loggers[module] = root.getChild(module) if module else root
+    return logger
+
+
+def do_syn(string, var):
+    _caller_logger().log(LEVELS[var], string)
 
 
 def error(string):
@@ -29,3 +231,43 @@ def success(string):
 
 def info(string):
     do_syn(string, 3)
+
+
+# =====================
+# READERS
+# =====================
+def reverse_lines(path: str, block_size: int = 64 * 1024):
+    """Yield the lines of a file newest-first, reading fixed-size blocks from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + remainder).split(b"\n")
+            # The first piece may be the tail of a line that started in an earlier block
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line.decode("utf-8", errors="replace")
+        if remainder:
+            yield remainder.decode("utf-8", errors="replace")
+
+
+def tail(path: str, num_lines: int, level: str = None, search: str = None) -> list[str]:
+    """Last num_lines lines matching an optional level tag and substring, oldest first."""
+    tag = f"[{level.upper()}]" if level else None
+    needle = search.lower() if search else None
+    matches = []
+    for line in reverse_lines(path):
+        if tag and tag not in line:
+            continue
+        if needle and needle not in line.lower():
+            continue
+        matches.append(line)
+        if len(matches) >= num_lines:
+            break
+    matches.reverse()
+    return matches
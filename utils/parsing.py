@@ -1,4 +1,4 @@
-import re, json
+import copy, os, re, json
 
 DURATION_MULTIPLIERS = {
     "s": 1,
@@ -15,8 +15,22 @@ def parse_duration(input: str) -> int:
     value, unit = match.groups()
     return int(value) * DURATION_MULTIPLIERS[unit]
 
+# path -> (mtime, parsed); every module parses config.json at import
+_cache = {}
+
 def parse_json(filename):
     """Remove //-- and /* -- */ style comments from JSON"""
+    path = os.path.abspath(filename)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return copy.deepcopy(cached[1])
+
+    contents = _parse_json(path)
+    _cache[path] = (mtime, contents)
+    return copy.deepcopy(contents)
+
+def _parse_json(filename):
     comment_re = re.compile(
         r'(^)?[^\S\n]*/(?:\*(.*?)\*/[^\S\n]*|/[^\n]*)($)?',
         re.DOTALL | re.MULTILINE
@@ -0,0 +1,112 @@
+import functools
+import re
+import threading
+import time
+
+import pymysql.cursors
+
+from utils import parsing, output, metrics
+
+config = parsing.parse_json("config.json")["mysql"]
+
+SLOW_QUERY_MS = config.get("slow_query_ms", 100)
+MAX_FINGERPRINTS = config.get("query_log_size", 500)
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*(?:\?|NULL)(?:\s*,\s*(?:\?|NULL))*\s*\)", re.IGNORECASE)
+_REPEATED_ROWS_RE = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Longer statements (executemany's inlined multi-row INSERTs) are normalised
+# without caching so the cache never pins them
+MAX_CACHED_STATEMENT = 2048
+
+
+def _normalise(statement: str) -> str:
+    fp = statement.replace("%s", "?")
+    fp = _STRING_RE.sub("?", fp)
+    fp = _NUMBER_RE.sub("?", fp)
+    fp = _PLACEHOLDER_LIST_RE.sub("(?+)", fp)
+    fp = _REPEATED_ROWS_RE.sub("(?+)", fp)
+    return _WHITESPACE_RE.sub(" ", fp).strip()
+
+
+_cached_normalise = functools.lru_cache(maxsize=1024)(_normalise)
+
+
+def fingerprint(statement: str) -> str:
+    """Normalise a statement so executions differing only in values (or row counts) group together."""
+    if len(statement) > MAX_CACHED_STATEMENT:
+        return _normalise(statement)
+    return _cached_normalise(statement)
+
+
+class QueryStats:
+    def __init__(self, fp: str):
+        self.fingerprint = fp
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slowest_sample = None  # fully formatted statement of the slowest execution
+        self.commands: dict[str, int] = {}
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class QueryLog:
+    """Per-fingerprint timing for every statement run through an InstrumentedCursor."""
+
+    def __init__(self, max_fingerprints: int = MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self.stats: dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, fp: str, sample, duration: float, rows: int, command: str):
+        with self._lock:
+            stats = self.stats.get(fp)
+            if stats is None:
+                if len(self.stats) >= self.max_fingerprints:
+                    # Drop the cheapest fingerprint to stay bounded
+                    del self.stats[min(self.stats.values(), key=lambda s: s.total).fingerprint]
+                stats = self.stats[fp] = QueryStats(fp)
+
+            stats.count += 1
+            stats.total += duration
+            stats.rows += max(rows, 0)
+            stats.commands[command] = stats.commands.get(command, 0) + 1
+            if duration >= stats.max:
+                stats.max = duration
+                stats.slowest_sample = sample() if callable(sample) else sample
+
+    def top(self, n: int, order: str = "total") -> list[QueryStats]:
+        with self._lock:
+            return sorted(self.stats.values(), key=lambda s: getattr(s, order), reverse=True)[:n]
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+
+
+query_log = QueryLog()
+
+
+class InstrumentedCursor(pymysql.cursors.DictCursor):
+    """DictCursor that records fingerprint, duration, rows and calling command per statement."""
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            duration = time.perf_counter() - start
+            fp = fingerprint(query)
+            command = metrics.current_command.get() or "unknown"
+            query_log.record(fp, lambda: self.mogrify(query, args), duration, self.rowcount, command)
+
+            if duration * 1000 >= SLOW_QUERY_MS:
+                output.warning(
+                    f"Slow query {duration * 1000:.0f}ms [{command}] rows={self.rowcount}: {fp}"
+                )
@@ -1,6 +1,183 @@
 import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 import requests
-from utils import parsing
+from utils import parsing, metrics
+from utils.amount import Amount
+
+rpc_cfg = parsing.parse_json("config.json")["rpc"]
+breaker_cfg = rpc_cfg.get("circuit_breaker", {})
+
+# Read-only methods served from cache, with TTLs in seconds. Entries are also
+# dropped as soon as getblockcount reports a new block.
+CACHE_TTLS = {
+    "getblockcount": 5,
+    "getmininginfo": 300,
+    "getblockchaininfo": 300,
+    "getnetworkinfo": 60,
+    "getwalletinfo": 15,
+}
+CACHE_TTLS.update(rpc_cfg.get("cache_ttl_seconds", {}))
+
+
+def encode_json(value) -> str:
+    """json.dumps that writes Amount values as exact 8-decimal numbers instead of going through float."""
+    if isinstance(value, Amount):
+        return str(value)
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{json.dumps(str(k))}: {encode_json(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(encode_json(v) for v in value) + "]"
+    return json.dumps(value)
+
+
+class RpcError(Exception):
+    """The daemon answered with a JSON-RPC error."""
+
+
+class RpcUnavailable(RuntimeError):
+    """Raised without contacting the daemon while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass, failures and slow calls are tracked over a sliding window.
+    Open: calls are rejected until open_seconds have passed.
+    Half-open: one trial call decides whether to close or re-open.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, window=20, min_calls=5, error_rate=0.5, slow_call_seconds=5.0, open_seconds=30):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+
+        self.state = self.CLOSED
+        self._results = deque(maxlen=window)  # True = failed or too slow
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool, elapsed: float):
+        failed = not ok or elapsed >= self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self._close()
+                return
+
+            self._results.append(failed)
+            if len(self._results) >= self.min_calls and self.current_error_rate() >= self.error_rate:
+                self._open()
+
+    def record_probe(self, ok: bool, elapsed: float):
+        """Health probes are authoritative: a good probe closes the circuit, a bad one opens it."""
+        with self._lock:
+            if ok and elapsed < self.slow_call_seconds:
+                if self.state != self.CLOSED:
+                    self._close()
+            else:
+                self._open()
+
+    def current_error_rate(self) -> float:
+        return sum(self._results) / len(self._results) if self._results else 0.0
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._results.clear()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._results.clear()
+
+
+class ResponseCache:
+    """
+    TTL cache for read-only RPC results, keyed by method and params, and
+    invalidated on block change. Concurrent identical misses share one
+    daemon call (single-flight).
+    """
+
+    def __init__(self, ttls: dict):
+        self.ttls = ttls
+        self.height = None
+        self._entries = {}  # key -> (expires_at, value)
+        self._in_flight: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def observe_height(self, height: int):
+        with self._lock:
+            if height != self.height:
+                self.height = height
+                # Keep the fresh block count itself, drop everything derived from the old tip
+                self._entries = {k: v for k, v in self._entries.items() if k[0] == "getblockcount"}
+
+    def get(self, method: str, params: list, fetch):
+        key = (method, json.dumps(params))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttls[method], value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every Rpc instance: they all talk to the same daemon
+breaker = CircuitBreaker(**breaker_cfg)
+cache = ResponseCache(CACHE_TTLS)
+latency = metrics.registry.histogram(
+    "mwcbot_rpc_duration_seconds", "Wallet RPC call time", ["method"]
+)
+errors = metrics.registry.counter(
+    "mwcbot_rpc_errors_total", "Wallet RPC calls that failed or were rejected", ["method"]
+)
 
 
 class Rpc:
@@ -19,12 +196,18 @@ class Rpc:
     # =====================
     # Internal helper
     # =====================
-    def _call(self, method: str, params=None):
+    def _call(self, method: str, params=None, probe: bool = False):
         """Generic RPC call"""
         if params is None:
             params = []
 
-        payload = json.dumps({"method": method, "params": params, "jsonrpc": "2.0"})
+        if not probe and not breaker.allow():
+            errors.labels(method).inc()
+            raise RpcUnavailable("Wallet daemon is unavailable, please try again shortly")
+
+        payload = encode_json({"method": method, "params": params, "jsonrpc": "2.0"})
+        ok = False
+        start = time.monotonic()
         try:
             response = requests.post(
                 self.server_url,
@@ -33,15 +216,51 @@ class Rpc:
                 auth=(self.rpc_user, self.rpc_pass),
                 timeout=10  # avoid hanging
             )
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+
+            # A JSON-RPC error still means the daemon is up and answering
+            if isinstance(data, dict) and data.get("error") is not None:
+                ok = True
+                raise RpcError(data["error"])
+
             response.raise_for_status()
-            data = response.json()
-            if "error" in data and data["error"] is not None:
-                raise Exception(data["error"])
+            if data is None:
+                raise RuntimeError("Invalid JSON response from RPC server")
+            ok = True
             return data.get("result")
         except requests.RequestException as e:
             raise RuntimeError(f"RPC connection failed: {e}")
-        except json.JSONDecodeError:
-            raise RuntimeError("Invalid JSON response from RPC server")
+        finally:
+            elapsed = time.monotonic() - start
+            latency.labels(method).observe(elapsed)
+            if not ok:
+                errors.labels(method).inc()
+            if probe:
+                breaker.record_probe(ok, elapsed)
+            else:
+                breaker.record(ok, elapsed)
+
+    def _cached_call(self, method: str, params=None):
+        """Serve a read-only method from the shared response cache."""
+        if params is None:
+            params = []
+
+        if method != "getblockcount":
+            # Refreshes the tip (at most once per getblockcount TTL) so stale blocks are evicted
+            self.getblockcount()
+
+        return cache.get(method, params, lambda: self._call(method, params))
+
+    def health_check(self) -> bool:
+        """Probe the daemon with getblockcount, bypassing (and updating) the circuit breaker."""
+        try:
+            cache.observe_height(self._call("getblockcount", probe=True))
+            return True
+        except Exception:
+            return False
 
     # =====================
     # RPC METHODS
@@ -52,39 +271,47 @@ class Rpc:
     def getnewaddress(self, account=""):
         return self._call("getnewaddress", [account])
 
-    def listtransactions(self, account="*", count=10):
-        return self._call("listtransactions", [account, count])
+    def listtransactions(self, account="*", count=10, skip=0):
+        return self._call("listtransactions", [account, count, skip])
 
     def getconnectioncount(self):
         return self._call("getconnectioncount")
 
     def getblockcount(self):
-        return self._call("getblockcount")
+        height = self._cached_call("getblockcount")
+        cache.observe_height(height)
+        return height
 
     def getblockchaininfo(self):
-        return self._call("getblockchaininfo")
+        return self._cached_call("getblockchaininfo")
 
     def getnetworkinfo(self):
-        return self._call("getnetworkinfo")
+        return self._cached_call("getnetworkinfo")
 
     def getwalletinfo(self):
-        return self._call("getwalletinfo")
+        return self._cached_call("getwalletinfo")
 
     # def listmasternodes(self):
     #     return self._call("listmasternodes")
 
     def getmininginfo(self):
-        return self._call("getmininginfo")
+        return self._cached_call("getmininginfo")
 
     def validateaddress(self, address):
         return self._call("validateaddress", [address])
 
-    def sendtoaddress(self, address, amount):
-        return self._call("sendtoaddress", [address, amount])
+    def sendtoaddress(self, address, amount, comment: str = ""):
+        return self._call("sendtoaddress", [address, amount, comment])
+
+    def sendmany(self, amounts: dict, minconf: int = 1, comment: str = ""):
+        """
+        Pay several addresses in one transaction. amounts maps address -> Amount.
+        """
+        return self._call("sendmany", ["", amounts, minconf, comment])
 
     def settxfee(self, amount):
         return self._call("settxfee", [amount])
-    
+
     def gettransaction(self, txid: str, include_watchonly: bool = True):
         """
         Get detailed info about a transaction in the wallet.
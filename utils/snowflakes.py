@@ -0,0 +1,84 @@
+import random
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+
+class SnowflakeSet:
+    """
+    Immutable set of Discord IDs stored sorted and de-duplicated in an
+    array('Q'): 8 bytes per ID instead of a list of Member references.
+    Membership is a binary search, and set operations probe the smaller side
+    into the larger, so excluding a handful of IDs from a huge guild stays
+    O(n log m) without building a Python set.
+    """
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        if isinstance(ids, SnowflakeSet):
+            self._ids = ids._ids
+        else:
+            self._ids = array("Q", sorted(set(ids)))
+
+    @classmethod
+    def _wrap(cls, ids: array) -> "SnowflakeSet":
+        result = cls.__new__(cls)
+        result._ids = ids
+        return result
+
+    @staticmethod
+    def _coerce(other) -> "SnowflakeSet":
+        return other if isinstance(other, SnowflakeSet) else SnowflakeSet(other)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __contains__(self, snowflake: int) -> bool:
+        i = bisect_left(self._ids, snowflake)
+        return i < len(self._ids) and self._ids[i] == snowflake
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SnowflakeSet) and self._ids == other._ids
+
+    def __repr__(self) -> str:
+        return f"SnowflakeSet({len(self)} ids)"
+
+    # =========================
+    # SET OPERATIONS
+    # =========================
+    def intersection(self, other: Iterable[int]) -> "SnowflakeSet":
+        other = self._coerce(other)
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        return self._wrap(array("Q", (s for s in small._ids if s in large)))
+
+    def difference(self, other: Iterable[int]) -> "SnowflakeSet":
+        other = self._coerce(other)
+        if not other:
+            return self
+        return self._wrap(array("Q", (s for s in self._ids if s not in other)))
+
+    def union(self, other: Iterable[int]) -> "SnowflakeSet":
+        other = self._coerce(other)
+        return SnowflakeSet(self._ids.tolist() + other._ids.tolist())
+
+    # =========================
+    # SELECTION
+    # =========================
+    def sample(self, k: int, rng: random.Random = random) -> "SnowflakeSet":
+        """k IDs chosen uniformly at random (all of them if k >= len)."""
+        if k >= len(self):
+            return self
+        picks = sorted(rng.sample(range(len(self._ids)), k))
+        return self._wrap(array("Q", (self._ids[i] for i in picks)))
+
+    def chunks(self, size: int) -> Iterator[array]:
+        for i in range(0, len(self._ids), size):
+            yield self._ids[i:i + size]
+
+
+def mentions(ids: Iterable[int]) -> str:
+    """User mentions built straight from IDs, no Member lookup needed."""
+    return ", ".join(f"<@{s}>" for s in ids)
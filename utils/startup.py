@@ -0,0 +1,94 @@
+import asyncio
+import time
+import traceback
+from typing import Awaitable, Callable
+
+from utils import output, metrics
+
+PHASE_SECONDS = metrics.registry.gauge(
+    "mwcbot_startup_phase_seconds", "Wall time of each startup phase in the last start", ["phase"]
+)
+
+
+class Phase:
+    def __init__(self, name: str, func: Callable[[], Awaitable], after=(), required: bool = True):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.required = required
+        self.started = None
+        self.finished = None
+        self.status = "pending"  # pending, ok, failed, skipped
+
+
+class Pipeline:
+    """
+    Runs startup phases as soon as the phases they depend on have finished,
+    so independent ones (schema, RPC warmup, extension imports) overlap.
+    Blocking work belongs in asyncio.to_thread inside the phase; Mysql gives
+    each worker thread its own connection.
+
+    A failed required phase skips its dependents and is raised from run()
+    once everything else has settled; a failed optional phase only warns.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, Phase] = {}
+        self.started = None
+
+    def phase(self, name: str, after=(), required: bool = True):
+        """Decorator registering an async function as a phase."""
+        def decorator(func):
+            self.add(name, func, after, required)
+            return func
+        return decorator
+
+    def add(self, name: str, func, after=(), required: bool = True):
+        for dependency in after:
+            if dependency not in self.phases:
+                raise ValueError(f"Phase {name} depends on unknown phase {dependency}")
+        self.phases[name] = Phase(name, func, after, required)
+
+    async def _run_phase(self, phase: Phase, tasks: dict):
+        results = await asyncio.gather(*(tasks[d] for d in phase.after))
+        if not all(results):
+            phase.status = "skipped"
+            return False
+
+        phase.started = time.perf_counter()
+        try:
+            await phase.func()
+            phase.status = "ok"
+        except Exception:
+            phase.status = "failed"
+            log = output.error if phase.required else output.warning
+            log(f"Startup phase {phase.name} failed:\n{traceback.format_exc()}")
+        finally:
+            phase.finished = time.perf_counter()
+            PHASE_SECONDS.labels(phase.name).set(phase.finished - phase.started)
+        return phase.status == "ok" or not phase.required
+
+    async def run(self):
+        self.started = time.perf_counter()
+        tasks = {}
+        # Phases can only depend on earlier ones, so creation order is a valid schedule
+        for name, phase in self.phases.items():
+            tasks[name] = asyncio.ensure_future(self._run_phase(phase, tasks))
+        await asyncio.gather(*tasks.values())
+
+        output.info(self.report())
+        failed = [p.name for p in self.phases.values() if p.required and p.status != "ok"]
+        if failed:
+            raise RuntimeError(f"Startup failed in phase(s): {', '.join(failed)}")
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.started
+        lines = [f"Startup finished in {total * 1000:.0f} ms", f"  {'phase':<14} {'start':>8} {'took':>8}  status"]
+        for phase in self.phases.values():
+            if phase.started is None:
+                lines.append(f"  {phase.name:<14} {'-':>8} {'-':>8}  {phase.status}")
+                continue
+            offset = (phase.started - self.started) * 1000
+            took = (phase.finished - phase.started) * 1000
+            lines.append(f"  {phase.name:<14} {offset:>6.0f}ms {took:>6.0f}ms  {phase.status}")
+        return "\n".join(lines)
@@ -0,0 +1,93 @@
+import asyncio
+
+from utils import parsing, output, metrics, mysql_module
+from utils.amount import Payout
+
+config = parsing.parse_json("config.json").get("tips", {})
+
+GROUP_COMMIT = config.get("group_commit", False)
+WINDOW_MS = config.get("window_ms", 5)
+MAX_BATCH = config.get("max_batch", 200)
+
+BATCH_SIZE = metrics.registry.histogram(
+    "mwcbot_tip_batch_size", "Transfers committed per group-commit transaction", [],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+
+class TipBatcher:
+    """
+    Group commit for tips. Transfers requested within WINDOW_MS of the first
+    one are applied by a single Mysql.transfer_batch transaction, and each
+    caller's future resolves with its own result once that commits. A batch
+    is flushed early when it reaches MAX_BATCH. The commit runs in a worker
+    thread, and if the batch transaction fails its transfers are retried one
+    by one, so only the bad ones fail. With group_commit off every transfer
+    is its own transaction.
+    """
+
+    def __init__(self, enabled: bool = GROUP_COMMIT, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: list[tuple[tuple, asyncio.Future]] = []
+        self._timer = None
+        self._commits: set[asyncio.Task] = set()  # strong refs until each commit finishes
+
+    async def transfer(self, from_snowflake: int, payouts: list[Payout]) -> bool:
+        mysql = mysql_module.Mysql()
+        if not self.enabled:
+            return mysql.transfer(from_snowflake, payouts)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((from_snowflake, payouts), future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """Hand the pending transfers to a commit task; never blocks the loop."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._commit(batch))
+        self._commits.add(task)
+        task.add_done_callback(self._commits.discard)
+
+    async def _commit(self, batch: list[tuple[tuple, asyncio.Future]]):
+        BATCH_SIZE.labels().observe(len(batch))
+        results = await asyncio.to_thread(self._apply, [request for request, _ in batch])
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _apply(requests: list[tuple]) -> list:
+        """Runs in a worker thread. Returns each transfer's result, or the exception it raised."""
+        mysql = mysql_module.Mysql()
+        try:
+            return mysql.transfer_batch(requests)
+        except Exception as e:
+            output.error(f"Tip batch of {len(requests)} failed, retrying one by one: {type(e).__name__}: {e}")
+
+        results = []
+        for from_snowflake, payouts in requests:
+            try:
+                results.append(mysql.transfer(from_snowflake, payouts))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+batcher = TipBatcher()